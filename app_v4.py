@@ -1,51 +1,124 @@
 # app.py
 
+import time
+INICIO_EXECUCAO = time.perf_counter()
+
+import os
+import threading
 import streamlit as st
 import json
-import pandas as pd
-import os
-from inference import load_model, classify_oficio
-#from sklearn.metrics import classification_report, confusion_matrix
-from sklearn.metrics import confusion_matrix, precision_score, recall_score, f1_score
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-LABELS = [
-    {"label": "Bloqueio", "value": 1, "subpasta": "bloqueio", "tpOficio": "03"},
-    {"label": "Não-Bloqueio", "value": 0, "subpasta": "nao_bloqueio", "tpOficio": "00"}
-]
-SUBPASTA_TO_LABEL = {lbl['subpasta']: lbl for lbl in LABELS}
-FUNCIONALIDADES = ["CLASSIFICAR", "TESTAR MODELO", "RELATÓRIOS"]
+from desempenho import LIMIAR_BLOQUEIO, pipeline_em_etapas, registro, resumo_latencias
+from paginacao import escolher_pagina
+# Dependências pesadas (pandas, sklearn, matplotlib, seaborn, OCR e o modelo)
+# são importadas só dentro da aba que as usa, para a partida a frio ser rápida
+
+FUNCIONALIDADES = ["CLASSIFICAR", "TESTAR MODELO", "RELATÓRIOS", "DESEMPENHO"]
+MAX_AVALIACOES_SESSAO = 5
+TAMANHO_PAGINA_RELATORIO = 20
+# Com CLASSIFICADOR_AQUECER_MODELO=1 o modelo é carregado em segundo plano já na primeira visita
+AQUECER_MODELO = os.environ.get("CLASSIFICADOR_AQUECER_MODELO", "0") == "1"
+# Saída antecipada, servidor de inferência e quase-duplicatas dependem do pipeline em
+# etapas (desempenho.pipeline_em_etapas); sem ele as variáveis abaixo são ignoradas
+# Com CLASSIFICADOR_SAIDA_ANTECIPADA=<margem> o CLASSIFICAR lê só as páginas necessárias
+SAIDA_ANTECIPADA = float(os.environ["CLASSIFICADOR_SAIDA_ANTECIPADA"]) if os.environ.get("CLASSIFICADOR_SAIDA_ANTECIPADA") else None
+# Com CLASSIFICADOR_SERVIDOR_INFERENCIA=<url> a inferência vai para o servidor_inferencia.py
+# (micro-lotes entre todas as sessões); fora do ar, cai para o modelo em processo
+SERVIDOR_INFERENCIA = os.environ.get("CLASSIFICADOR_SERVIDOR_INFERENCIA") if pipeline_em_etapas() else None
+# Com CLASSIFICADOR_REAPROVEITAR_DUPLICATAS=1 o CLASSIFICAR copia o resultado de um ofício quase
+# idêntico a outro já classificado. Desligado por padrão: ofícios de bloqueio e de desbloqueio do
+# mesmo template ficam quase idênticos, e a inferência que se economiza é a parte barata
+REAPROVEITAR_DUPLICATAS = os.environ.get("CLASSIFICADOR_REAPROVEITAR_DUPLICATAS", "0") == "1"
 
 st.set_page_config(page_title="Classificador de Ofícios - V4")
 
+if os.environ.get("CLASSIFICADOR_SERVIDOR_INFERENCIA") and not SERVIDOR_INFERENCIA:
+    # O servidor só atende o pipeline em etapas (textos limpos): sem ele, a variável não tem efeito
+    st.sidebar.warning(
+        "CLASSIFICADOR_SERVIDOR_INFERENCIA ignorado: o servidor de inferência exige o pipeline em etapas "
+        "(selo do paridade.py ou CLASSIFICADOR_PIPELINE_ETAPAS=1). A inferência roda no próprio processo."
+    )
+
 @st.cache_resource
 def get_model():
-    return load_model()
-
-modelo = get_model()
-
-def listar_arquivos_pdf_com_rotulo(pasta_base):
-    arquivos = []
-    for root, dirs, files in os.walk(pasta_base):
-        # identifica subpasta (bloqueio, nao_bloqueio, ...)
-        for subpasta, info in SUBPASTA_TO_LABEL.items():
-            if f"/{subpasta}" in root.replace("\\", "/").lower():
-                for fname in files:
-                    if fname.lower().endswith('.pdf'):
-                        arquivos.append({
-                            "caminho": os.path.join(root, fname),
-                            "arquivo": fname,
-                            "rotulo": info['value'],
-                            "tpOficio": info['tpOficio'],
-                            "descricao": info['label']
-                        })
-    return arquivos
+    if SERVIDOR_INFERENCIA:
+        from servidor_inferencia import ClienteInferencia
+        return ClienteInferencia(SERVIDOR_INFERENCIA)
+    # Usa o formato compacto mapeado em memória se CLASSIFICADOR_MODELO_COMPACTO estiver definido
+    from modelo_compacto import carregar_modelo
+    return carregar_modelo()
+
+@st.cache_resource
+def get_versao_modelo(_modelo):
+    from cache_resultados import versao_modelo
+    return versao_modelo(_modelo)
+
+@st.cache_resource
+def get_cache():
+    from cache_resultados import CacheResultados
+    return CacheResultados()
+
+@st.cache_resource
+def get_indice_duplicatas():
+    # None se CLASSIFICADOR_INDICE_DUPLICATAS=0. Só vale com o pipeline em etapas (o índice usa o texto extraído)
+    from duplicatas import indice_padrao
+    return indice_padrao()
+
+@st.cache_resource
+def get_fila_trabalhos():
+    from trabalhos import FilaTrabalhos
+    return FilaTrabalhos(origem=FUNCIONALIDADES[1])
+
+@st.cache_resource
+def get_registro_experimentos():
+    from registro_experimentos import registro_padrao
+    return registro_padrao()
+
+@st.cache_resource
+def aquecer_modelo():
+    thread = threading.Thread(target=get_model, daemon=True)
+    thread.start()
+    return thread
+
+@st.cache_resource
+def get_inicializacao():
+    return {}
+
+def preparar_modelo():
+    # Só CLASSIFICAR e TESTAR MODELO chamam: o modelo é carregado no primeiro uso
+    modelo = get_model()
+    cache = get_cache()
+    # Troca de modelo invalida o cache automaticamente. O modelo do servidor de inferência pode
+    # trocar com o app no ar: a versão dele é relida a cada lote (ClienteInferencia.versao)
+    if SERVIDOR_INFERENCIA:
+        from cache_resultados import versao_modelo
+        cache.usar_modelo(versao_modelo(modelo))
+        if not cache.etapas:
+            # Modelo do servidor sem selo de paridade: classify_oficio com o modelo do processo
+            st.sidebar.warning(
+                f"Servidor {SERVIDOR_INFERENCIA} ignorado: o selo do paridade.py não vale para o modelo dele. "
+                "A inferência roda no próprio processo."
+            )
+            modelo = modelo.modelo_local()
+            cache.usar_modelo(get_versao_modelo(modelo))
+    else:
+        cache.usar_modelo(get_versao_modelo(modelo))
+    return modelo, cache
+
+def exibir_estatisticas_cache(cache):
+    estatisticas_cache = cache.estatisticas()
+    with st.sidebar.expander("Cache de classificações"):
+        st.caption(f"Acertos: {estatisticas_cache['acertos']} | Falhas: {estatisticas_cache['falhas']}")
+        st.caption(f"Taxa de acerto: {estatisticas_cache['taxa_acerto']*100:.1f}%")
+        st.caption(f"Itens em memória: {estatisticas_cache['itens_memoria']}")
+
+if AQUECER_MODELO:
+    aquecer_modelo()
 
 # -------------- ABA DE NAVEGAÇÃO ---------------
 aba = st.sidebar.radio(
     "QUAL FUNCIONALIDADE DESEJA EXECUTAR?",
-    FUNCIONALIDADES[2]
+    FUNCIONALIDADES,
+    index=2
 )
 
 # -------------- CLASSIFICAÇÃO DIÁRIA ---------------
@@ -58,17 +131,50 @@ if aba == FUNCIONALIDADES[0]:
         accept_multiple_files=True
     )
     if uploaded_files:
+        from classificacao_lote import classificar_lote, MAX_WORKERS
+
+        modelo, cache = preparar_modelo()
         results = []
-        with st.spinner('Classificando seu(s) ofício(s)...'):
-            for arquivo in uploaded_files:
-                resultado = classify_oficio(arquivo.read(), model=modelo)
-                results.append({
-                    "arquivo": arquivo.name,
-                    "tpOficio": resultado["tpOficio"]
-                })
+        barra = st.progress(0.0, text='Classificando seu(s) ofício(s)...')
+
+        def atualizar_progresso(concluidos, total):
+            barra.progress(concluidos / total, text=f'Classificando seu(s) ofício(s)... {concluidos}/{total}')
+
+        resultados = classificar_lote(
+            (arquivo.getvalue() for arquivo in uploaded_files),
+            model=modelo,
+            max_workers=min(MAX_WORKERS, len(uploaded_files)),
+            ao_progredir=atualizar_progresso,
+            total=len(uploaded_files),
+            cache=cache,
+            ao_medir=lambda indice, evento: registro.registrar(
+                evento, arquivo=uploaded_files[indice].name, origem=FUNCIONALIDADES[0]
+            ),
+            saida_antecipada=SAIDA_ANTECIPADA if cache.etapas else None,
+            # Quase-duplicatas de ofícios já classificados reaproveitam o resultado
+            indice_duplicatas=get_indice_duplicatas() if cache.etapas and REAPROVEITAR_DUPLICATAS else None
+        )
+        barra.empty()
+        for arquivo, resultado in zip(uploaded_files, resultados):
+            item = {
+                "arquivo": arquivo.name,
+                "tpOficio": resultado["tpOficio"]
+            }
+            if resultado.get("prob_bloqueio") is not None:
+                item["prob_bloqueio"] = round(resultado["prob_bloqueio"], 4)
+            if resultado.get("duplicata_de"):
+                item["duplicata_de"] = resultado["duplicata_de"]
+                item["similaridade"] = round(resultado["similaridade"], 4)
+            if "erro" in resultado:
+                item["erro"] = resultado["erro"]
+            results.append(item)
+        erros = sum(1 for r in results if "erro" in r)
+        if erros:
+            st.warning(f'{erros} arquivo(s) não puderam ser classificados. Veja o campo "erro" no resultado.')
         st.success(f'Classificação concluída! Total de arquivos: {len(results)}')
         st.markdown("**Resultado (cole este JSON onde quiser):**")
         st.code(json.dumps(results, ensure_ascii=False, indent=2), language='json')
+        exibir_estatisticas_cache(cache)
 
 # -------------- TESTE DO MODELO (com upload de arquivos rotulados) ---------------
 if aba == FUNCIONALIDADES[1]:
@@ -97,230 +203,538 @@ if aba == FUNCIONALIDADES[1]:
         key="zip_files"
     )
 
-    import tempfile
-    import zipfile
+    import pandas as pd
+    from metricas import (
+        calcular_metricas, intervalos_bootstrap, matriz_confusao,
+        metricas_no_limiar, varrer_limiares
+    )
+    from trabalhos import montar_avaliacao
+
+    # As avaliações rodam em segundo plano, numa fila com checkpoint por arquivo:
+    # fechar a aba ou reiniciar o servidor não perde o que já foi processado
+    fila = get_fila_trabalhos()
+    if fila.pendentes():
+        # Trabalhos que sobraram de uma execução anterior recomeçam sozinhos
+        fila.iniciar(*preparar_modelo())
 
     if uploaded_zip is not None:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            zip_path = os.path.join(tmpdir, "upload.zip")
-            with open(zip_path, "wb") as f:
-                f.write(uploaded_zip.getbuffer())
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(tmpdir)
-            # Acha o primeiro diretório do ZIP (dados/)
-            for root, dirs, files in os.walk(tmpdir):
-                if len(dirs) > 0:
-                    pasta_base = os.path.join(root, dirs[0])
-                    break
-            arquivos = listar_arquivos_pdf_com_rotulo(pasta_base)
-
-            if len(arquivos) == 0:
-                st.warning("Nenhum PDF encontrado na estrutura esperada!")
+        from avaliacao import abrir_zip, hash_arquivo, listar_membros_pdf_com_rotulo
+
+        modelo, cache = preparar_modelo()
+        exibir_estatisticas_cache(cache)
+
+        hashes_upload = st.session_state.setdefault("hashes_upload", {})
+        novo_upload = uploaded_zip.file_id not in hashes_upload
+        if novo_upload:
+            hashes_upload[uploaded_zip.file_id] = hash_arquivo(uploaded_zip)
+        hash_zip = hashes_upload[uploaded_zip.file_id]
+
+        # Lê só o diretório central do ZIP: rótulos vêm do caminho de cada membro
+        with abrir_zip(uploaded_zip) as zip_ref:
+            arquivos = listar_membros_pdf_com_rotulo(zip_ref)
+
+        if len(arquivos) == 0:
+            st.warning("Nenhum PDF encontrado na estrutura esperada!")
+        else:
+            concluido = fila.ultimo_concluido(hash_zip, cache.versao)
+            if concluido is None:
+                st.info(f"{len(arquivos)} arquivos encontrados. Clique abaixo para enviar a avaliação para a fila.")
             else:
-                st.info(f"{len(arquivos)} arquivos encontrados. Clique abaixo para testar o modelo.")
-                if st.button("Testar modelo", key="run_test_model"):
-                    y_true = []
-                    y_pred = []
-                    nomes_arquivos = []
-                    desc_esperado = []
-                    desc_predito = []
-                    tp_oficio_esperado = []
-                    tp_oficio_predito = []
-
-                    with st.spinner('Processando arquivos e avaliando...'):
-                        for arqinfo in arquivos:
-                            try:
-                                with open(arqinfo["caminho"], "rb") as f:
-                                    pdf_bytes = f.read()
-                                resultado = classify_oficio(pdf_bytes, model=modelo)
-                                pred_rotulo = 1 if resultado["tpOficio"] == "03" else 0
-                                pred_desc = "Bloqueio" if resultado["tpOficio"] == "03" else "Não-Bloqueio"
-
-                                nomes_arquivos.append(arqinfo["arquivo"])
-                                y_true.append(arqinfo["rotulo"])
-                                desc_esperado.append(arqinfo["descricao"])
-                                tp_oficio_esperado.append(arqinfo["tpOficio"])
-                                desc_predito.append(pred_desc)
-                                tp_oficio_predito.append(resultado["tpOficio"])
-                                y_pred.append(pred_rotulo)
-                            except Exception as e:
-                                st.warning(f"Erro ao processar {arqinfo['arquivo']}: {e}")
-
-                    # Exibe resultados por arquivo
-                    resultado_df = pd.DataFrame({
-                        "Ofício": nomes_arquivos,
-                        "Esperado": desc_esperado,
-                        "Predito": desc_predito,
-                        "tpOficio_esperado": tp_oficio_esperado,
-                        "tpOficio_predito": tp_oficio_predito
-                    })
-                    st.markdown("#### Resultados individuais (por ofício):")
-                    st.dataframe(resultado_df, use_container_width=True)
-
-                    min_amostras_classe = 5
-                    contagem_por_classe = pd.Series(y_true).value_counts()
-                    
-                    y_true_int = [int(x) for x in y_true]
-                    y_pred_int = [int(x) for x in y_pred]
-
-                    # Calculando métricas
-                    # Classe positiva é bloqueio (1), negativa é não bloqueio (0)
-                    sensibilidade = recall_score(y_true_int, y_pred_int, pos_label=1)
-                    especificidade = recall_score(y_true_int, y_pred_int, pos_label=0)
-                    precisao = precision_score(y_true_int, y_pred_int, pos_label=1)
-                    f1 = f1_score(y_true_int, y_pred_int, pos_label=1)
-
-                    st.markdown("#### Métricas de Classificação:")
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.metric(
-                            label="Sensibilidade", 
-                            value=f"{sensibilidade*100:.2f}%",
-                            border=True
-                        )
-                        with st.expander("O que é Sensibilidade?"):
-                            st.markdown(
-                                "Sensibilidade (Recall) é a probabilidade do modelo acertar que aquele ofício é um bloqueio de fato, ou seja, de todos os bloqueios reais, quantos o modelo acertou."
-                            )
-
-                        st.metric(
-                            label="Precisão", 
-                            value=f"{precisao*100:.2f}%",
-                            border=True
-                        )
-                        with st.expander("O que é Precisão?"):
-                            st.markdown(
-                                "Precisão é, de todos os ofícios que o modelo inferiu ser bloqueio, qual o percentual que realmente eram bloqueios."
-                            )
-
-                    with col2:
-                        st.metric(
-                            label="Especificidade", 
-                            value=f"{especificidade*100:.2f}%",
-                            border=True
-                        )
-                        with st.expander("O que é Especificidade?"):
-                            st.markdown(
-                                "Especificidade é a probabilidade do modelo acertar que aquele ofício NÃO é um bloqueio de fato, ou seja, de todos os não bloqueios reais, quantos o modelo acertou."
-                            )
-                        st.metric(
-                            label="F1 Score", 
-                            value=f"{f1*100:.2f}%",
-                            border=True
-                        )
-                        with st.expander("O que é F1 Score?"):
-                            st.markdown(
-                                "F1 Score é a média harmônica entre Precisão e Sensibilidade. Mede o equilíbrio entre acertar os bloqueios e não gerar muitos falsos positivos."
-                            )
-                        # Matriz de confusão
-                    if contagem_por_classe.min() < min_amostras_classe:
-                        st.warning("A matriz de confusão pode não ser representativa devido ao baixo número de amostras em uma ou mais classes.")
-                    else:
-                        st.markdown("#### Matriz de Confusão")
-                        with st.expander("Visualizar..."):
-                            labels = sorted(list(set(y_true_int) | set(y_pred_int)))
-                            cm = confusion_matrix(y_true_int, y_pred_int, labels=labels)
-                            fig, ax = plt.subplots()
-                            sns.heatmap(cm, annot=True, fmt="d", cmap="Blues", xticklabels=labels, yticklabels=labels, ax=ax)
-                            ax.set_xlabel('Predito')
-                            ax.set_ylabel('Esperado')
-                            st.pyplot(fig)
+                st.info(f"{len(arquivos)} arquivos encontrados. Já existe uma avaliação deste ZIP com este modelo (selecionada abaixo); clique abaixo para reprocessar.")
+                if novo_upload:
+                    st.session_state["trabalho_selecionado"] = concluido
+            comparar_saida, margem_saida = False, None
+            if cache.etapas:
+                from pipeline import MARGEM_SAIDA_ANTECIPADA
+
+                comparar_saida = st.checkbox(
+                    "Comparar com a saída antecipada (para de ler páginas quando o modelo já tem certeza)",
+                    key="comparar_saida_antecipada"
+                )
+                margem_saida = st.slider(
+                    "Margem de confiança para parar",
+                    min_value=0.05, max_value=0.5, value=MARGEM_SAIDA_ANTECIPADA, step=0.05,
+                    disabled=not comparar_saida,
+                    key="margem_saida_antecipada"
+                )
+            indice_duplicatas = get_indice_duplicatas() if cache.etapas else None
+            verificar_duplicatas = st.checkbox(
+                "Verificar quase-duplicatas (dentro da massa e contra o corpus de treino)",
+                value=indice_duplicatas is not None,
+                disabled=indice_duplicatas is None,
+                key="verificar_duplicatas"
+            )
+            if st.button("Testar modelo", key="run_test_model"):
+                fila.iniciar(modelo, cache)
+                st.session_state["trabalho_selecionado"] = fila.enviar(
+                    uploaded_zip, uploaded_zip.name, hash_zip,
+                    {
+                        "comparar_saida": comparar_saida,
+                        "margem_saida": margem_saida,
+                        "verificar_duplicatas": verificar_duplicatas and indice_duplicatas is not None
+                    }
+                )
+
+    avaliacao = None
+    trabalhos = fila.listar()
+    if trabalhos:
+        from datetime import datetime
+
+        st.markdown("### Avaliações")
+        descricao_estado = {
+            "na_fila": "na fila", "executando": "em execução", "concluido": "concluída", "erro": "com erro"
+        }
+        por_id = {t["id"]: t for t in trabalhos}
+        if st.session_state.get("trabalho_selecionado") not in por_id:
+            st.session_state.pop("trabalho_selecionado", None)
+        id_trabalho = st.selectbox(
+            "Avaliação",
+            list(por_id),
+            format_func=lambda i: (
+                f"{por_id[i]['nome']} — {descricao_estado[por_id[i]['estado']]} "
+                f"({por_id[i]['concluidos']}/{por_id[i]['total'] or '?'}) — "
+                f"{datetime.fromtimestamp(por_id[i]['criado']):%d/%m %H:%M}"
+            ),
+            key="trabalho_selecionado"
+        )
+        trabalho = por_id[id_trabalho]
+
+        @st.fragment(run_every=2)
+        def acompanhar_trabalho(id_trabalho):
+            # Atualiza só este trecho da tela enquanto o trabalho roda
+            trabalho = fila.obter(id_trabalho)
+            if trabalho is None or trabalho["estado"] in ("concluido", "erro"):
+                st.rerun()
+            if trabalho["estado"] == "na_fila":
+                st.info(f"Na fila, aguardando {max(fila.pendentes() - 1, 0)} avaliação(ões) anteriores.")
+            total = trabalho["total"] or 0
+            if total:
+                st.progress(
+                    trabalho["concluidos"] / total,
+                    text=f"Processando arquivos e avaliando... {trabalho['concluidos']}/{total}"
+                )
+            parcial = montar_avaliacao(fila.predicoes(id_trabalho))
+            if parcial["y_true"]:
+                metricas_parciais = calcular_metricas(parcial["y_true"], parcial["y_pred"])
+                st.markdown(f"#### Métricas parciais ({len(parcial['y_true'])} ofícios)")
+                colunas = st.columns(5)
+                for coluna, (nome, rotulo) in zip(colunas, (
+                    ("acuracia", "Acurácia"), ("sensibilidade", "Sensibilidade"), ("especificidade", "Especificidade"),
+                    ("precisao", "Precisão"), ("f1score", "F1 Score")
+                )):
+                    coluna.metric(rotulo, f"{metricas_parciais[nome]*100:.2f}%", border=True)
+
+        if trabalho["estado"] in ("na_fila", "executando"):
+            acompanhar_trabalho(id_trabalho)
+        elif trabalho["estado"] == "erro":
+            st.error(f"A avaliação parou com erro: {trabalho['erro']}")
+            if st.button("Retomar de onde parou", key="retomar_trabalho"):
+                fila.iniciar(*preparar_modelo())
+                fila.retomar(id_trabalho)
+                st.rerun()
+        else:
+            # Avaliação concluída: montada do banco uma vez e guardada na sessão
+            avaliacoes = st.session_state.setdefault("avaliacoes", {})
+            if id_trabalho not in avaliacoes:
+                avaliacoes[id_trabalho] = montar_avaliacao(fila.predicoes(id_trabalho), trabalho["extras"])
+                # Mantém só as avaliações mais recentes na sessão
+                while len(avaliacoes) > MAX_AVALIACOES_SESSAO:
+                    avaliacoes.pop(next(iter(avaliacoes)))
+            avaliacao = avaliacoes[id_trabalho]
+            st.caption(f"Modelo {trabalho['versao']} | {trabalho['total']} arquivos em {trabalho['terminado'] - trabalho['iniciado']:.0f} s")
+            for arquivo, erro in avaliacao["erros"]:
+                st.warning(f"Erro ao processar {arquivo}: {erro}")
+        if trabalho["estado"] != "executando" and st.button("Remover esta avaliação", key="remover_trabalho"):
+            fila.remover(id_trabalho)
+            st.session_state.get("avaliacoes", {}).pop(id_trabalho, None)
+            st.rerun()
+
+    if avaliacao is not None:
+        nomes_arquivos = avaliacao["nomes_arquivos"]
+        desc_esperado = avaliacao["desc_esperado"]
+        desc_predito = avaliacao["desc_predito"]
+        tp_oficio_esperado = avaliacao["tp_oficio_esperado"]
+        tp_oficio_predito = avaliacao["tp_oficio_predito"]
+        y_true = avaliacao["y_true"]
+        y_pred = avaliacao["y_pred"]
+
+        # Exibe resultados por arquivo
+        resultado_df = pd.DataFrame({
+            "Ofício": nomes_arquivos,
+            "Esperado": desc_esperado,
+            "Predito": desc_predito,
+            "tpOficio_esperado": tp_oficio_esperado,
+            "tpOficio_predito": tp_oficio_predito
+        })
+        st.markdown("#### Resultados individuais (por ofício):")
+        st.dataframe(resultado_df, use_container_width=True)
+
+        min_amostras_classe = 5
+        contagem_por_classe = pd.Series(y_true).value_counts()
+        
+        y_true_int = [int(x) for x in y_true]
+        y_pred_int = [int(x) for x in y_pred]
+
+        # Calculando métricas (uma matriz de confusão, todas as métricas e os intervalos a partir dela)
+        metricas = calcular_metricas(y_true_int, y_pred_int)
+        intervalos = intervalos_bootstrap(y_true_int, y_pred_int)
+        sensibilidade = metricas["sensibilidade"]
+        especificidade = metricas["especificidade"]
+        precisao = metricas["precisao"]
+        acuracia = metricas["acuracia"]
+        f1 = metricas["f1score"]
+
+        def legenda_intervalo(nome):
+            inferior, superior = intervalos[nome]
+            st.caption(f"IC 95% (bootstrap): {inferior*100:.1f}% – {superior*100:.1f}%")
+
+        st.markdown("#### Métricas de Classificação:")
+        st.metric(
+            label="Acurácia",
+            value=f"{acuracia*100:.2f}%",
+            border=True
+        )
+        legenda_intervalo("acuracia")
+        with st.expander("O que é Acurácia?"):
+            st.markdown(
+                "Acurácia é o percentual de ofícios, bloqueios ou não, que o modelo classificou corretamente."
+            )
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric(
+                label="Sensibilidade", 
+                value=f"{sensibilidade*100:.2f}%",
+                border=True
+            )
+            legenda_intervalo("sensibilidade")
+            with st.expander("O que é Sensibilidade?"):
+                st.markdown(
+                    "Sensibilidade (Recall) é a probabilidade do modelo acertar que aquele ofício é um bloqueio de fato, ou seja, de todos os bloqueios reais, quantos o modelo acertou."
+                )
+
+            st.metric(
+                label="Precisão", 
+                value=f"{precisao*100:.2f}%",
+                border=True
+            )
+            legenda_intervalo("precisao")
+            with st.expander("O que é Precisão?"):
+                st.markdown(
+                    "Precisão é, de todos os ofícios que o modelo inferiu ser bloqueio, qual o percentual que realmente eram bloqueios."
+                )
+
+        with col2:
+            st.metric(
+                label="Especificidade", 
+                value=f"{especificidade*100:.2f}%",
+                border=True
+            )
+            legenda_intervalo("especificidade")
+            with st.expander("O que é Especificidade?"):
+                st.markdown(
+                    "Especificidade é a probabilidade do modelo acertar que aquele ofício NÃO é um bloqueio de fato, ou seja, de todos os não bloqueios reais, quantos o modelo acertou."
+                )
+            st.metric(
+                label="F1 Score", 
+                value=f"{f1*100:.2f}%",
+                border=True
+            )
+            legenda_intervalo("f1score")
+            with st.expander("O que é F1 Score?"):
+                st.markdown(
+                    "F1 Score é a média harmônica entre Precisão e Sensibilidade. Mede o equilíbrio entre acertar os bloqueios e não gerar muitos falsos positivos."
+                )
+
+        if avaliacao.get("comparacao_saida"):
+            st.markdown("#### Saída antecipada x documento inteiro")
+            comparacao_df = pd.DataFrame(avaliacao["comparacao_saida"]).T.rename(columns={
+                "sensibilidade": "Sensibilidade",
+                "especificidade": "Especificidade",
+                "precisao": "Precisão",
+                "acuracia": "Acurácia",
+                "f1score": "F1 Score",
+                "latencia_media_s": "Latência média (s)",
+                "latencia_p95_s": "Latência p95 (s)",
+                "paginas_lidas_media": "Páginas lidas (média)",
+                "docs_por_segundo": "Docs/s"
+            })
+            st.dataframe(comparacao_df.style.format("{:.3f}"), use_container_width=True)
+
+        if avaliacao.get("vazamento"):
+            vazamento = avaliacao["vazamento"]
+            no_teste = sum(1 for v in vazamento if v["duplicata_teste"] is not None)
+            no_treino = [v["duplicata_treino"] is not None for v in vazamento]
+            st.markdown("#### Quase-duplicatas (vazamento)")
+            col1, col2 = st.columns(2)
+            col1.metric("Com quase-duplicata na massa", f"{no_teste} de {len(vazamento)}", border=True)
+            col2.metric("Com quase-duplicata no treino", f"{sum(no_treino)} de {len(vazamento)}", border=True)
+            if any(no_treino) and not all(no_treino):
+                # Métricas só sobre os ofícios sem par no treino: o quanto o modelo generaliza
+                inedito_true = [y for y, vazado in zip(y_true_int, no_treino) if not vazado]
+                inedito_pred = [y for y, vazado in zip(y_pred_int, no_treino) if not vazado]
+                ineditas = calcular_metricas(inedito_true, inedito_pred)
+                st.caption(
+                    "Sem os ofícios com par no treino: "
+                    f"sensibilidade {ineditas['sensibilidade']*100:.2f}%, "
+                    f"especificidade {ineditas['especificidade']*100:.2f}%, "
+                    f"F1 {ineditas['f1score']*100:.2f}%."
+                )
+            pares = [
+                {
+                    "Ofício": nomes_arquivos[i],
+                    "Par na massa": nomes_arquivos[v["duplicata_teste"]] if v["duplicata_teste"] is not None else None,
+                    "Similaridade (massa)": v["similaridade_teste"],
+                    "Par no treino (hash)": v["duplicata_treino"],
+                    "Similaridade (treino)": v["similaridade_treino"]
+                }
+                for i, v in enumerate(vazamento)
+                if v["duplicata_teste"] is not None or v["duplicata_treino"] is not None
+            ]
+            if pares:
+                with st.expander("Ver pares encontrados"):
+                    st.dataframe(pd.DataFrame(pares), use_container_width=True)
+
+        # Matriz de confusão
+        if contagem_por_classe.min() < min_amostras_classe:
+            st.warning("A matriz de confusão pode não ser representativa devido ao baixo número de amostras em uma ou mais classes.")
+        else:
+            st.markdown("#### Matriz de Confusão")
+            with st.expander("Visualizar..."):
+                import matplotlib.pyplot as plt
+                import seaborn as sns
+
+                labels = [0, 1]
+                cm = matriz_confusao(y_true_int, y_pred_int)
+                fig, ax = plt.subplots()
+                sns.heatmap(cm, annot=True, fmt="d", cmap="Blues", xticklabels=labels, yticklabels=labels, ax=ax)
+                ax.set_xlabel('Predito')
+                ax.set_ylabel('Esperado')
+                st.pyplot(fig)
+
+        # Curvas ROC e precisão-sensibilidade: todos os limiares saem das probabilidades guardadas,
+        # então mover o slider só consulta a varredura (sem nova inferência)
+        probs_bloqueio = avaliacao.get("probs_bloqueio") or []
+        if probs_bloqueio and None not in probs_bloqueio and len(set(y_true_int)) == 2:
+            varredura = varrer_limiares(y_true_int, probs_bloqueio)
+            st.markdown("#### Limiar de decisão")
+            limiar = st.slider(
+                "Limiar de probabilidade para bloqueio",
+                min_value=0.0, max_value=1.0, value=LIMIAR_BLOQUEIO, step=0.01,
+                key="limiar_bloqueio_avaliacao"
+            )
+            no_limiar = metricas_no_limiar(varredura, limiar)
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Sensibilidade", f"{no_limiar['sensibilidade']*100:.2f}%", border=True)
+            col2.metric("Especificidade", f"{no_limiar['especificidade']*100:.2f}%", border=True)
+            col3.metric("Precisão", f"{no_limiar['precisao']*100:.2f}%", border=True)
+            col1.metric("Acurácia", f"{no_limiar['acuracia']*100:.2f}%", border=True)
+            col2.metric("F1 Score", f"{no_limiar['f1score']*100:.2f}%", border=True)
+            col3.metric("Taxa de falsos positivos", f"{no_limiar['taxa_falsos_positivos']*100:.2f}%", border=True)
+
+            with st.expander("Curvas ROC e Precisão x Sensibilidade"):
+                import matplotlib.pyplot as plt
+
+                fig, (ax_roc, ax_pr) = plt.subplots(1, 2, figsize=(10, 4))
+                ax_roc.plot(varredura["taxa_falsos_positivos"], varredura["sensibilidade"])
+                ax_roc.plot([0, 1], [0, 1], linestyle="--", color="gray")
+                ax_roc.scatter([no_limiar["taxa_falsos_positivos"]], [no_limiar["sensibilidade"]], color="red", zorder=3)
+                ax_roc.set_xlabel("Taxa de falsos positivos")
+                ax_roc.set_ylabel("Sensibilidade")
+                ax_roc.set_title(f"ROC (AUC = {varredura['auc_roc']:.3f})")
+                # O primeiro ponto (nenhum bloqueio predito) não tem precisão definida
+                ax_pr.plot(varredura["sensibilidade"][1:], varredura["precisao"][1:])
+                ax_pr.scatter([no_limiar["sensibilidade"]], [no_limiar["precisao"]], color="red", zorder=3)
+                ax_pr.set_xlabel("Sensibilidade")
+                ax_pr.set_ylabel("Precisão")
+                ax_pr.set_title(f"Precisão x Sensibilidade (AP = {varredura['precisao_media']:.3f})")
+                st.pyplot(fig)
+        elif probs_bloqueio and len(set(y_true_int)) == 2:
+            st.caption(
+                "Varredura de limiar indisponível: parte dos resultados não traz a probabilidade de bloqueio "
+                "(o classify_oficio não a expôs para algum documento)."
+            )
 
 if aba == FUNCIONALIDADES[2]:
-# Carrega experimentos já ajustados
-    with open("relatorio_experimentos.json", "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-        # CONTEXTO RESUMIDO
-        contexto = """
-        O processo de atendimento a ordens judiciais de bloqueio financeiro é operacionalizado pela JD, que atua na estruturação e análise de ofícios encaminhados por diversos tribunais. O desafio envolve lidar com documentos em PDF altamente heterogêneos, com grande variedade de formatos, vocabulário jurídico complexo e estrutura textual não padronizada. Atualmente, todo o fluxo é majoritariamente manual, com participação intensa de advogados especializados. A empresa buscou soluções baseadas em IA para aumentar a produtividade e reduzir o tempo de processamento, testando modelos capazes de identificar e classificar automaticamente ofícios, em busca de um desempenho que permitisse automatização confiável do processo.
-        """
-
-        st.title("Relatório Executivo — Plataforma de IA JD para Classificação de Ofícios Jurídicos")
-        st.markdown(f"##### Contexto do Problema")
-        st.markdown(contexto)
-
-        # SUMÁRIO
-        st.markdown("### Sumário")
-        st.markdown("""
-        1. Estratégias e Soluções Testadas
-        2. Pipeline de Automação
-        3. Resultados: Números e Diagnóstico
-        """)
-
-        st.header("1. Estratégias e Soluções Testadas")
-        st.markdown("A seguir, apresentamos os métodos avaliados para solucionar o desafio da JD. Cada solução traz sua abordagem, principais resultados e orientações para evolução do projeto:")
-
-        # Agrupando por grupo/modelo
-        grupos = {}
-        for exp in data['experimentos']:
-            if exp['grupo'] not in grupos:
-                grupos[exp['grupo']] = []
-            grupos[exp['grupo']].append(exp)
-
-        for grupo, exps in grupos.items():
-            with st.expander(f"🧩 {grupo}", expanded=True):
-                for idx, exp in enumerate(exps):
-                    with st.container():
-                        st.markdown(f"##### {exp['nome']}")
-                        st.markdown(f"*<b>Descrição:</b> {exp['observacoes']}*", unsafe_allow_html=True)
-
-                        # Pipeline visual
-                        with st.expander("🔎 Pipeline da solução", expanded=False):
-                            st.markdown(" > ".join([f"**{step}**" for step in exp['pipeline']]), unsafe_allow_html=True)
-                            if exp['hiperparametros']:
-                                st.markdown(f"**Hiperparâmetros:** `{exp['hiperparametros']}`")
-
-                        # Métricas em tabela
-                        metricas = exp['resultados']
-                        tabela = pd.DataFrame([{
-                            "Sensibilidade": metricas['sensibilidade'],
-                            "Especificidade": metricas['especificidade'],
-                            "Precisão": metricas['precisao'],
-                            "Acurácia": metricas['acuracia'],
-                            "F1 Score": metricas['f1score']
-                        }])
-                        st.dataframe(tabela.style.format("{:.2%}"), use_container_width=True)
-
-                        # Orientações
-                        st.markdown("**Orientações por métrica:**")
-                        for metrica, orientacoes in exp['orientacoes'].items():
-                            st.markdown(f"**{metrica.capitalize()}:**")
-                            st.markdown("\n".join([f"- {o}" for o in orientacoes]))
+    import pandas as pd
+
+    # Experimentos vêm do registro indexado (o JSON é importado na primeira abertura);
+    # cada rerun faz só as consultas da página exibida
+    registro_exp = get_registro_experimentos()
+
+    # CONTEXTO RESUMIDO
+    contexto = """
+    O processo de atendimento a ordens judiciais de bloqueio financeiro é operacionalizado pela JD, que atua na estruturação e análise de ofícios encaminhados por diversos tribunais. O desafio envolve lidar com documentos em PDF altamente heterogêneos, com grande variedade de formatos, vocabulário jurídico complexo e estrutura textual não padronizada. Atualmente, todo o fluxo é majoritariamente manual, com participação intensa de advogados especializados. A empresa buscou soluções baseadas em IA para aumentar a produtividade e reduzir o tempo de processamento, testando modelos capazes de identificar e classificar automaticamente ofícios, em busca de um desempenho que permitisse automatização confiável do processo.
+    """
+
+    st.title("Relatório Executivo — Plataforma de IA JD para Classificação de Ofícios Jurídicos")
+    st.markdown(f"##### Contexto do Problema")
+    st.markdown(contexto)
+
+    # SUMÁRIO
+    st.markdown("### Sumário")
+    st.markdown("""
+    1. Estratégias e Soluções Testadas
+    2. Pipeline de Automação
+    3. Resultados: Números e Diagnóstico
+    """)
+
+    st.header("1. Estratégias e Soluções Testadas")
+    st.markdown("A seguir, apresentamos os métodos avaliados para solucionar o desafio da JD. Cada solução traz sua abordagem, principais resultados e orientações para evolução do projeto:")
+
+    col1, col2, col3 = st.columns(3)
+    todos = "Todos"
+    filtro_grupo = col1.selectbox("Grupo", [todos] + registro_exp.grupos(), key="relatorio_grupo")
+    filtro_modelo = col2.selectbox("Modelo", [todos] + registro_exp.modelos(), key="relatorio_modelo")
+    filtro_desde = col3.date_input("Executados desde", value=None, key="relatorio_desde")
+    filtros = {
+        "grupo": None if filtro_grupo == todos else filtro_grupo,
+        "modelo": None if filtro_modelo == todos else filtro_modelo,
+        "desde": filtro_desde.isoformat() if filtro_desde else None
+    }
+    _, total_exp = registro_exp.consultar(tamanho=0, **filtros)
+    pagina = escolher_pagina(total_exp, TAMANHO_PAGINA_RELATORIO, "relatorio_pagina")
+    experimentos, _ = registro_exp.consultar(pagina=pagina, tamanho=TAMANHO_PAGINA_RELATORIO, **filtros)
+
+    # Agrupando a página por grupo, na ordem em que aparecem
+    grupos = {}
+    for exp in experimentos:
+        grupos.setdefault(exp['grupo'], []).append(exp)
+
+    for grupo, exps in grupos.items():
+        with st.expander(f"🧩 {grupo}", expanded=True):
+            for idx, exp in enumerate(exps):
+                with st.container():
+                    st.markdown(f"##### {exp['nome']}")
+                    if exp['data']:
+                        st.caption(f"Executado em {exp['data']}")
+                    st.markdown(f"*<b>Descrição:</b> {exp['observacoes']}*", unsafe_allow_html=True)
+
+                    # Pipeline visual
+                    with st.expander("🔎 Pipeline da solução", expanded=False):
+                        st.markdown(" > ".join([f"**{step}**" for step in exp['pipeline']]), unsafe_allow_html=True)
+                        if exp['hiperparametros']:
+                            st.markdown(f"**Hiperparâmetros:** `{exp['hiperparametros']}`")
+
+                    # Métricas em tabela
+                    metricas = exp['resultados']
+                    tabela = pd.DataFrame([{
+                        "Sensibilidade": metricas['sensibilidade'],
+                        "Especificidade": metricas['especificidade'],
+                        "Precisão": metricas['precisao'],
+                        "Acurácia": metricas['acuracia'],
+                        "F1 Score": metricas['f1score']
+                    }])
+                    st.dataframe(tabela.style.format("{:.2%}"), use_container_width=True)
+
+                    # Orientações
+                    st.markdown("**Orientações por métrica:**")
+                    for metrica, orientacoes in exp['orientacoes'].items():
+                        if not orientacoes:
+                            continue
+                        if isinstance(orientacoes, str):
+                            orientacoes = [orientacoes]
+                        st.markdown(f"**{metrica.capitalize()}:**")
+                        st.markdown("\n".join([f"- {o}" for o in orientacoes]))
+                    if exp['impacto']:
                         st.markdown(f"**Impacto no negócio:** {exp['impacto']}")
 
-                        st.markdown("---")
-
-        st.header("2. Pipeline de Automação")
-        st.markdown("""
-        O pipeline foi estruturado desde a extração do texto até a classificação final, abrangendo:
-        - Entrada: PDF original do tribunal.
-        - Extração e limpeza do texto (OCR, normalização, stopwords, tokenização, embeddings, compactação).
-        - Extração de features: palavras, posições, palavras-chave.
-        - Construção do dataset: treino/teste balanceado.
-        - Treinamento do modelo (Random Forest, SVM, LogisticRegression, MLP, XGBoost).
-        - Validação do modelo: sensibilidade, especificidade, precisão, acurácia e F1Score.
-        """)
-
-        st.header("3. Resultados: Números e Diagnóstico")
-        tabela_resultados = []
-        for exp in data['experimentos']:
-            tabela_resultados.append({
-                "Modelo": exp['nome'],
-                "Acurácia (%)": f"{exp['resultados']['acuracia']*100:.0f}",
-                "Precisão (%)": f"{exp['resultados']['precisao']*100:.0f}",
-                "F1-score (%)": f"{exp['resultados']['f1score']*100:.0f}"
-            })
-
-        st.table(pd.DataFrame(tabela_resultados))
-
-        # Diagnóstico final (visual: generalização vs memorização)
-        st.markdown("#### Diagnóstico: Generalização x Memorização")
-        st.markdown("""
-        O modelo apresenta **alto desempenho na base conhecida**, mas sua habilidade de generalizar para novas massas ainda é limitada. 
-        O maior risco reside na especialização excessiva nos padrões da base original — é fundamental evoluir o modelo para cenários mais diversos e robustos.
-
-        **Diagnóstico visual:**  
-        `Generalização` &nbsp;&nbsp;&nbsp; <span style='color:#4caf50;font-weight:bold;'>─────────────●─────────────</span> &nbsp;&nbsp;&nbsp; `Memorização`
-
-        """, unsafe_allow_html=True)
\ No newline at end of file
+                    st.markdown("---")
+
+    st.header("2. Pipeline de Automação")
+    st.markdown("""
+    O pipeline foi estruturado desde a extração do texto até a classificação final, abrangendo:
+    - Entrada: PDF original do tribunal.
+    - Extração e limpeza do texto (OCR, normalização, stopwords, tokenização, embeddings, compactação).
+    - Extração de features: palavras, posições, palavras-chave.
+    - Construção do dataset: treino/teste balanceado.
+    - Treinamento do modelo (Random Forest, SVM, LogisticRegression, MLP, XGBoost).
+    - Validação do modelo: sensibilidade, especificidade, precisão, acurácia e F1Score.
+    """)
+
+    st.header("3. Resultados: Números e Diagnóstico")
+    tabela_resultados = []
+    for exp in experimentos:
+        tabela_resultados.append({
+            "Modelo": exp['nome'],
+            "Acurácia (%)": f"{exp['resultados']['acuracia']*100:.0f}",
+            "Precisão (%)": f"{exp['resultados']['precisao']*100:.0f}",
+            "F1-score (%)": f"{exp['resultados']['f1score']*100:.0f}"
+        })
+
+    st.table(pd.DataFrame(tabela_resultados))
+
+    # Diagnóstico final (visual: generalização vs memorização)
+    st.markdown("#### Diagnóstico: Generalização x Memorização")
+    st.markdown("""
+    O modelo apresenta **alto desempenho na base conhecida**, mas sua habilidade de generalizar para novas massas ainda é limitada. 
+    O maior risco reside na especialização excessiva nos padrões da base original — é fundamental evoluir o modelo para cenários mais diversos e robustos.
+
+    **Diagnóstico visual:**  
+    `Generalização` &nbsp;&nbsp;&nbsp; <span style='color:#4caf50;font-weight:bold;'>─────────────●─────────────</span> &nbsp;&nbsp;&nbsp; `Memorização`
+
+    """, unsafe_allow_html=True)
+
+# -------------- DESEMPENHO EM PRODUÇÃO ---------------
+if aba == FUNCIONALIDADES[3]:
+    import pandas as pd
+
+    st.markdown("<h1 style='text-align: center;'>Desempenho do pipeline de classificação</h1>", unsafe_allow_html=True)
+    if SERVIDOR_INFERENCIA:
+        estado_servidor = get_model().estado()
+        st.markdown("#### Servidor de inferência")
+        if estado_servidor is None:
+            st.warning(f"Servidor {SERVIDOR_INFERENCIA} fora do ar: a inferência está rodando no próprio processo.")
+        else:
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Fila (textos)", estado_servidor["fila"], border=True)
+            col2.metric("Docs/s (último minuto)", f"{estado_servidor['docs_por_segundo']:.1f}", border=True)
+            col3.metric("Lote médio", f"{estado_servidor['tamanho_medio_lote']:.1f}", border=True)
+            col4.metric("Requisições", estado_servidor["requisicoes"], border=True)
+            st.caption(f"Modelo {estado_servidor['versao']} | {estado_servidor['documentos']} documentos em {estado_servidor['lotes']} lotes")
+    eventos = registro.eventos()
+    if len(eventos) == 0:
+        st.info("Nenhum documento processado desde que o servidor subiu. Classifique ou teste ofícios para ver as medições.")
+    else:
+        st.caption(f"{len(eventos)} documentos mais recentes (buffer em memória, os mais antigos são descartados).")
+        if not any(evento["etapas_s"] for evento in eventos):
+            st.caption("Predições do classify_oficio: só o tempo total de cada documento é medido. O tempo por etapa vem com o pipeline em etapas (ver paridade.py).")
+        latencias = resumo_latencias(eventos)
+
+        st.markdown("#### Latência por documento")
+        col1, col2, col3 = st.columns(3)
+        for coluna, p in zip((col1, col2, col3), ("p50", "p95", "p99")):
+            coluna.metric(label=p.upper(), value=f"{latencias['total'][p]:.2f} s", border=True)
+
+        st.markdown("#### Latência por etapa (s)")
+        st.dataframe(pd.DataFrame(latencias).T, use_container_width=True)
+
+        eventos_df = pd.DataFrame(eventos)
+        eventos_df["momento"] = pd.to_datetime(eventos_df["momento"], unit="s")
+
+        st.markdown("#### Vazão ao longo do tempo (documentos por minuto)")
+        vazao = eventos_df.set_index("momento").resample("1min")["duracao_s"].count()
+        st.line_chart(vazao)
+
+        st.markdown("#### Documentos mais lentos")
+        mais_lentos = eventos_df.nlargest(20, "duracao_s")[
+            ["arquivo", "origem", "duracao_s", "paginas", "bytes", "pico_rss_mb", "momento"]
+        ]
+        st.dataframe(mais_lentos, use_container_width=True, hide_index=True)
+
+        st.download_button(
+            "Exportar eventos (JSON)",
+            data=registro.exportar_json(),
+            file_name="desempenho_classificador.json",
+            mime="application/json"
+        )
+
+# -------------- TEMPO DE INICIALIZAÇÃO ---------------
+# A primeira execução do script no processo é a partida a frio
+tempo_execucao = time.perf_counter() - INICIO_EXECUCAO
+inicializacao = get_inicializacao()
+if "partida_a_frio_s" not in inicializacao:
+    inicializacao["partida_a_frio_s"] = tempo_execucao
+    print(f"[app_v4] partida a frio: {tempo_execucao:.3f} s (aba {aba})", flush=True)
+st.sidebar.caption(
+    f"Partida a frio: {inicializacao['partida_a_frio_s']:.2f} s | Esta execução: {tempo_execucao:.2f} s"
+)
@@ -0,0 +1,133 @@
+# avaliacao.py
+#
+# Rótulos e listagem da massa de dados rotulada usada no TESTAR MODELO.
+# A massa pode vir como pasta ou como ZIP; em ambos os casos o rótulo é
+# deduzido da subpasta ("bloqueio"/"03" ou "nao_bloqueio"/"00").
+
+import hashlib
+import io
+import os
+import statistics
+import time
+import zipfile
+
+from metricas import calcular_metricas
+
+LABELS = [
+    {"label": "Bloqueio", "value": 1, "subpasta": "bloqueio", "tpOficio": "03"},
+    {"label": "Não-Bloqueio", "value": 0, "subpasta": "nao_bloqueio", "tpOficio": "00"}
+]
+SUBPASTA_TO_LABEL = {lbl['subpasta']: lbl for lbl in LABELS}
+# Aceita também o código do tpOficio como nome de pasta, como nas instruções da tela
+NOME_PASTA_TO_LABEL = {
+    **SUBPASTA_TO_LABEL,
+    **{lbl['tpOficio']: lbl for lbl in LABELS}
+}
+
+
+def rotulo_do_caminho(caminho):
+    # A pasta rotulada mais próxima do arquivo define o rótulo
+    partes = caminho.replace("\\", "/").lower().split("/")
+    for parte in reversed(partes[:-1]):
+        if parte in NOME_PASTA_TO_LABEL:
+            return NOME_PASTA_TO_LABEL[parte]
+    return None
+
+
+def _item_rotulado(caminho, fname, info):
+    return {
+        "caminho": caminho,
+        "arquivo": fname,
+        "rotulo": info['value'],
+        "tpOficio": info['tpOficio'],
+        "descricao": info['label']
+    }
+
+
+def listar_arquivos_pdf_com_rotulo(pasta_base):
+    arquivos = []
+    for root, dirs, files in os.walk(pasta_base):
+        for fname in files:
+            if fname.lower().endswith('.pdf'):
+                caminho = os.path.join(root, fname)
+                info = rotulo_do_caminho(os.path.relpath(caminho, pasta_base))
+                if info is not None:
+                    arquivos.append(_item_rotulado(caminho, fname, info))
+    return arquivos
+
+
+def listar_membros_pdf_com_rotulo(zip_ref):
+    # Lê apenas o diretório central do ZIP; nada é extraído para o disco.
+    # Em cada item, "caminho" é o nome do membro dentro do ZIP.
+    arquivos = []
+    for membro in zip_ref.infolist():
+        nome = membro.filename
+        if membro.is_dir() or nome.startswith("__MACOSX/"):
+            continue
+        fname = nome.rsplit("/", 1)[-1]
+        if fname.lower().endswith('.pdf'):
+            info = rotulo_do_caminho(nome)
+            if info is not None:
+                arquivos.append(_item_rotulado(nome, fname, info))
+    return arquivos
+
+
+def ler_pdfs_do_zip(zip_ref, arquivos):
+    # Gerador: descompacta um membro por vez, direto da memória/arquivo do upload
+    for arqinfo in arquivos:
+        yield zip_ref.read(arqinfo["caminho"])
+
+
+def abrir_zip(arquivo):
+    # Aceita caminho, bytes ou objeto tipo arquivo (ex.: UploadedFile do Streamlit)
+    if isinstance(arquivo, (bytes, bytearray)):
+        arquivo = io.BytesIO(arquivo)
+    return zipfile.ZipFile(arquivo, 'r')
+
+
+def hash_arquivo(arquivo, tamanho_bloco=1 << 20):
+    # SHA-256 em blocos, sem copiar o arquivo inteiro para a memória
+    h = hashlib.sha256()
+    arquivo.seek(0)
+    for bloco in iter(lambda: arquivo.read(tamanho_bloco), b""):
+        h.update(bloco)
+    arquivo.seek(0)
+    return h.hexdigest()
+
+
+def comparar_saida_antecipada(ler_pdfs, arquivos, model, margem, max_workers=None, pool=None):
+    # Roda a massa pelo pipeline em etapas no modo documento inteiro e no modo saída antecipada, sem
+    # cache de resultados nem armazém de textos, para medir o custo real de cada um.
+    # `ler_pdfs()` devolve um iterável novo com os bytes dos PDFs, na ordem de `arquivos`.
+    from classificacao_lote import classificar_lote
+    from desempenho import percentil
+
+    modos = {}
+    for nome, margem_modo in (("Documento inteiro", None), ("Saída antecipada", margem)):
+        eventos = []
+
+        def guardar_evento(indice, evento):
+            eventos.append(evento)
+
+        inicio = time.perf_counter()
+        resultados = classificar_lote(
+            ler_pdfs(), model=model, max_workers=max_workers, total=len(arquivos),
+            ao_medir=guardar_evento, saida_antecipada=margem_modo, usar_armazem=False, etapas=True, pool=pool
+        )
+        duracao = time.perf_counter() - inicio
+        validos = [(a, r) for a, r in zip(arquivos, resultados) if "erro" not in r]
+        metricas = calcular_metricas(
+            [a["rotulo"] for a, _ in validos],
+            [1 if r["tpOficio"] == "03" else 0 for _, r in validos]
+        )
+        latencias = [e["duracao_s"] for e in eventos]
+        modos[nome] = {
+            **metricas,
+            "latencia_media_s": statistics.fmean(latencias) if latencias else 0.0,
+            "latencia_p95_s": percentil(latencias, 95),
+            "paginas_lidas_media": statistics.fmean(
+                e.get("paginas_usadas", e["paginas"]) for e in eventos
+            ) if eventos else 0.0,
+            "docs_por_segundo": len(arquivos) / duracao if duracao else 0.0,
+        }
+    return modos
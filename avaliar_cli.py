@@ -0,0 +1,134 @@
+# avaliar_cli.py
+#
+# Avaliação do modelo sem a interface do Streamlit, para rodadas noturnas
+# sobre bases grandes. Aceita uma pasta ou um ZIP com a mesma estrutura do
+# TESTAR MODELO (subpastas "bloqueio"/"03" e "nao_bloqueio"/"00").
+#
+# Exemplo:
+#   python avaliar_cli.py massa_nova.zip --predicoes predicoes.parquet --resumo resumo.json
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from avaliacao import (
+    abrir_zip,
+    ler_pdfs_do_zip,
+    listar_arquivos_pdf_com_rotulo,
+    listar_membros_pdf_com_rotulo,
+)
+from cache_resultados import CacheResultados, versao_modelo
+from classificacao_lote import MAX_WORKERS, classificar_lote
+from modelo_compacto import carregar_modelo
+from registro_experimentos import montar_experimento, registro_padrao
+
+
+def _ler_pdfs_da_pasta(arquivos):
+    for arqinfo in arquivos:
+        with open(arqinfo["caminho"], "rb") as f:
+            yield f.read()
+
+
+def _progresso(concluidos, total):
+    print(f"\r{concluidos}/{total} arquivos", end="", file=sys.stderr, flush=True)
+
+
+def avaliar(entrada, workers=MAX_WORKERS, usar_cache=False):
+    modelo = carregar_modelo()
+    versao = versao_modelo(modelo)
+    cache = None
+    if usar_cache:
+        cache = CacheResultados()
+        cache.usar_modelo(versao)
+
+    inicio = time.perf_counter()
+    if os.path.isdir(entrada):
+        arquivos = listar_arquivos_pdf_com_rotulo(entrada)
+        resultados = classificar_lote(
+            _ler_pdfs_da_pasta(arquivos), model=modelo, max_workers=workers,
+            ao_progredir=_progresso, total=len(arquivos), cache=cache
+        )
+    else:
+        with abrir_zip(entrada) as zip_ref:
+            arquivos = listar_membros_pdf_com_rotulo(zip_ref)
+            resultados = classificar_lote(
+                ler_pdfs_do_zip(zip_ref, arquivos), model=modelo, max_workers=workers,
+                ao_progredir=_progresso, total=len(arquivos), cache=cache
+            )
+    duracao = time.perf_counter() - inicio
+    print(file=sys.stderr)
+
+    predicoes = []
+    for arqinfo, resultado in zip(arquivos, resultados):
+        predicoes.append({
+            "arquivo": arqinfo["arquivo"],
+            "caminho": arqinfo["caminho"],
+            "rotulo": arqinfo["rotulo"],
+            "tpOficio_esperado": arqinfo["tpOficio"],
+            "tpOficio_predito": resultado["tpOficio"],
+            "predito": None if "erro" in resultado else (1 if resultado["tpOficio"] == "03" else 0),
+            "erro": resultado.get("erro")
+        })
+    return pd.DataFrame(predicoes), {"versao_modelo": versao, "duracao_s": duracao}
+
+
+def montar_resumo(predicoes, execucao, grupo, nome):
+    # Mesmo formato de um item de "experimentos" do relatorio_experimentos.json
+    validas = predicoes[predicoes["erro"].isna()]
+    return montar_experimento(
+        grupo, nome, validas["rotulo"], validas["predito"],
+        {
+            **execucao,
+            "total_arquivos": int(len(predicoes)),
+            "erros": int(predicoes["erro"].notna().sum()),
+            "docs_por_segundo": len(predicoes) / execucao["duracao_s"] if execucao["duracao_s"] else 0.0
+        },
+        f"Avaliação automática via linha de comando em {execucao['data']}."
+    )
+
+
+def salvar_predicoes(predicoes, caminho):
+    if caminho.lower().endswith(".parquet"):
+        predicoes.to_parquet(caminho, index=False)
+    else:
+        predicoes.to_csv(caminho, index=False, encoding="utf-8")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Avalia o classificador de ofícios sobre uma pasta ou ZIP rotulado.")
+    parser.add_argument("entrada", help="Pasta ou arquivo .zip com as subpastas rotuladas")
+    parser.add_argument("--predicoes", default="predicoes.csv", help="Saída por arquivo (.csv ou .parquet)")
+    parser.add_argument("--resumo", default="resumo.json", help="Resumo com as métricas no formato do relatório")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Processos em paralelo (padrão: todos os núcleos)")
+    parser.add_argument("--cache", action="store_true", help="Usa o cache de resultados por hash do PDF")
+    parser.add_argument("--grupo", default="Avaliação Automática", help="Grupo do experimento no resumo")
+    parser.add_argument("--nome", default="Avaliação noturna do modelo em produção (XGBoost + TF-IDF)", help="Nome do experimento no resumo")
+    parser.add_argument("--registrar", action="store_true", help="Grava o resumo no registro de experimentos (relatórios)")
+    args = parser.parse_args(argv)
+
+    predicoes, execucao = avaliar(args.entrada, workers=args.workers, usar_cache=args.cache)
+    if predicoes.empty:
+        print("Nenhum PDF encontrado na estrutura esperada!", file=sys.stderr)
+        return 1
+    execucao["data"] = datetime.now().isoformat(timespec="seconds")
+    execucao["entrada"] = os.path.abspath(args.entrada)
+
+    salvar_predicoes(predicoes, args.predicoes)
+    resumo = montar_resumo(predicoes, execucao, args.grupo, args.nome)
+    with open(args.resumo, "w", encoding="utf-8") as f:
+        json.dump(resumo, f, ensure_ascii=False, indent=2)
+    if args.registrar:
+        registro_padrao().registrar(resumo, origem="cli")
+
+    for metrica, valor in resumo["resultados"].items():
+        print(f"{metrica}: {valor*100:.2f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
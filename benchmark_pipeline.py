@@ -0,0 +1,223 @@
+# benchmark_pipeline.py
+#
+# Benchmark reprodutível do pipeline de classificação. Gera localmente um
+# corpus sintético de ofícios (PDFs com camada de texto e PDFs só imagem,
+# com 1, 5 e 20 páginas) e mede:
+#   - o tempo do load_model;
+#   - o tempo do classify_oficio por documento (o caminho de produção por padrão);
+#   - o tempo de cada etapa do pipeline em etapas (extração, limpeza, vetorização, inferência);
+#   - a vazão ponta a ponta (docs/s) do classificar_lote no modo padrão, com 1, 2, 4 e N workers.
+# Cada medida é a mediana de REPETICOES rodadas, para o limite de regressão não oscilar.
+#
+# Uso:
+#   python benchmark_pipeline.py --gravar-baseline     # grava benchmark_baseline.json
+#   python benchmark_pipeline.py --tolerancia 0.2      # falha se regredir mais de 20%
+
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from PIL import Image, ImageDraw, ImageFont
+
+from classificacao_lote import classificar_lote, encerrar_pool
+from desempenho import medir_documento
+from modelo_compacto import carregar_modelo
+from pipeline import ETAPAS, classificar_por_etapas
+
+CAMINHO_BASELINE = "benchmark_baseline.json"
+PAGINAS_CORPUS = (1, 5, 20)
+DOCS_POR_TIPO = 3
+LINHAS_POR_PAGINA = 40
+REPETICOES = 5
+
+VOCABULARIO = {
+    "bloqueio": [
+        "determino o bloqueio de valores", "via sisbajud", "ate o limite de",
+        "conta corrente e aplicacoes financeiras", "penhora on line", "executado",
+        "ordem de indisponibilidade", "transferencia para conta judicial",
+    ],
+    "nao_bloqueio": [
+        "solicito informacoes", "encaminho copia", "desbloqueio", "extrato bancario",
+        "cadastro do cliente", "oficio para ciencia", "prestacao de contas", "prazo de dez dias",
+    ],
+}
+COMUNS = [
+    "poder judiciario", "tribunal de justica", "processo numero", "vara civel",
+    "excelentissimo senhor", "atenciosamente", "juiz de direito", "comarca de",
+]
+
+
+def _linhas(rng, classe, quantidade):
+    frases = VOCABULARIO[classe] + COMUNS
+    return [" ".join(rng.choice(frases) for _ in range(4)) for _ in range(quantidade)]
+
+
+def pdf_com_texto(paginas):
+    # PDF com camada de texto (não passa pelo OCR)
+    buffer = io.BytesIO()
+    with PdfPages(buffer) as pdf:
+        for linhas in paginas:
+            fig = plt.figure(figsize=(8.27, 11.69))
+            for i, linha in enumerate(linhas):
+                fig.text(0.05, 0.97 - i * 0.024, linha, fontsize=8)
+            pdf.savefig(fig)
+            plt.close(fig)
+    return buffer.getvalue()
+
+
+def pdf_so_imagem(paginas):
+    # PDF escaneado: cada página é só uma imagem, exige OCR
+    try:
+        fonte = ImageFont.load_default(size=32)
+    except TypeError:  # Pillow < 10.1 só tem a fonte bitmap pequena
+        fonte = ImageFont.load_default()
+    imagens = []
+    for linhas in paginas:
+        imagem = Image.new("L", (1654, 2339), 255)
+        desenho = ImageDraw.Draw(imagem)
+        for i, linha in enumerate(linhas):
+            desenho.text((80, 80 + i * 55), linha, fill=0, font=fonte)
+        imagens.append(imagem)
+    buffer = io.BytesIO()
+    imagens[0].save(buffer, "PDF", resolution=200.0, save_all=True, append_images=imagens[1:])
+    return buffer.getvalue()
+
+
+def gerar_corpus(semente=42):
+    rng = random.Random(semente)
+    corpus = []
+    for tipo, gerar in (("texto", pdf_com_texto), ("imagem", pdf_so_imagem)):
+        for n_paginas in PAGINAS_CORPUS:
+            for i in range(DOCS_POR_TIPO):
+                classe = "bloqueio" if i % 2 == 0 else "nao_bloqueio"
+                paginas = [_linhas(rng, classe, LINHAS_POR_PAGINA) for _ in range(n_paginas)]
+                corpus.append({"grupo": f"{tipo}_{n_paginas}p", "pdf": gerar(paginas)})
+    return corpus
+
+
+def medir_load_model(repeticoes=REPETICOES):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        modelo = carregar_modelo()
+        tempos.append(time.perf_counter() - inicio)
+    return modelo, statistics.median(tempos)
+
+
+def medir_classify_oficio(corpus, repeticoes=REPETICOES):
+    # Mediana, por grupo do corpus, do classify_oficio de cada documento em todas as rodadas
+    from inference import load_model
+
+    modelo = load_model()
+    por_grupo = {}
+    for _ in range(repeticoes):
+        for doc in corpus:
+            _, evento = medir_documento(doc["pdf"], modelo)
+            por_grupo.setdefault(doc["grupo"], []).append(evento["duracao_s"])
+    return {grupo: statistics.median(valores) for grupo, valores in por_grupo.items()}
+
+
+def medir_etapas(corpus, modelo, repeticoes=REPETICOES):
+    # Mediana, por grupo do corpus, do tempo de cada etapa em todas as rodadas
+    por_grupo = {}
+    for _ in range(repeticoes):
+        for doc in corpus:
+            tempos = {}
+            classificar_por_etapas(doc["pdf"], modelo, tempos)
+            medidas = por_grupo.setdefault(doc["grupo"], {etapa: [] for etapa in ETAPAS})
+            for etapa in ETAPAS:
+                medidas[etapa].append(tempos[etapa])
+    return {
+        grupo: {etapa: statistics.median(valores) for etapa, valores in medidas.items()}
+        for grupo, medidas in por_grupo.items()
+    }
+
+
+def medir_vazao(corpus, workers, repeticoes=REPETICOES):
+    # classificar_lote no modo padrão (o mesmo do CLASSIFICAR e do TESTAR MODELO), sem modelo
+    # passado: cada um carrega o que a produção carregaria. Mediana das rodadas.
+    pdfs = [doc["pdf"] for doc in corpus]
+    vazao = {}
+    for n in workers:
+        # Aquecimento: sobe o pool e carrega o modelo nos workers fora da medição.
+        # Sem o armazém de textos: senão o aquecimento (e a rodada anterior) pulariam o OCR
+        classificar_lote(pdfs[:n], max_workers=n, usar_armazem=False)
+        rodadas = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            classificar_lote(pdfs, max_workers=n, usar_armazem=False)
+            rodadas.append(len(pdfs) / (time.perf_counter() - inicio))
+        vazao[str(n)] = statistics.median(rodadas)
+    encerrar_pool()
+    return vazao
+
+
+def executar(workers, repeticoes=REPETICOES):
+    corpus = gerar_corpus()
+    modelo, tempo_load = medir_load_model(repeticoes)
+    return {
+        "load_model_s": tempo_load,
+        "classify_oficio_s": medir_classify_oficio(corpus, repeticoes),
+        "etapas_s": medir_etapas(corpus, modelo, repeticoes),
+        "docs_por_segundo": medir_vazao(corpus, workers, repeticoes),
+    }
+
+
+def comparar(atual, baseline, tolerancia):
+    # Tempos não podem subir, e vazões não podem cair, além da tolerância
+    regressoes = []
+
+    def tempo(nome, valor, referencia):
+        if referencia and valor > referencia * (1 + tolerancia):
+            regressoes.append(f"{nome}: {valor:.4f}s (baseline {referencia:.4f}s)")
+
+    tempo("load_model", atual["load_model_s"], baseline.get("load_model_s"))
+    for grupo, valor in atual["classify_oficio_s"].items():
+        tempo(f"{grupo}/classify_oficio", valor, baseline.get("classify_oficio_s", {}).get(grupo))
+    for grupo, etapas in atual["etapas_s"].items():
+        for etapa, valor in etapas.items():
+            tempo(f"{grupo}/{etapa}", valor, baseline.get("etapas_s", {}).get(grupo, {}).get(etapa))
+    for n, valor in atual["docs_por_segundo"].items():
+        referencia = baseline.get("docs_por_segundo", {}).get(n)
+        if referencia and valor < referencia * (1 - tolerancia):
+            regressoes.append(f"vazao com {n} workers: {valor:.2f} docs/s (baseline {referencia:.2f})")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark por etapa do pipeline de classificação de ofícios.")
+    parser.add_argument("--baseline", default=CAMINHO_BASELINE, help="Arquivo de baseline")
+    parser.add_argument("--gravar-baseline", action="store_true", help="Grava o resultado como nova baseline")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Regressão máxima aceita (0.2 = 20%%)")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES, help="Rodadas por medida (vale a mediana)")
+    args = parser.parse_args(argv)
+
+    atual = executar(args.workers, args.repeticoes)
+    print(json.dumps(atual, indent=2))
+
+    if args.gravar_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(atual, f, indent=2)
+        print(f"Baseline gravada em {args.baseline}", file=sys.stderr)
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressoes = comparar(atual, baseline, args.tolerancia)
+    for regressao in regressoes:
+        print(f"REGRESSÃO {regressao}", file=sys.stderr)
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
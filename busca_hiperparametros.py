@@ -0,0 +1,450 @@
+# busca_hiperparametros.py
+#
+# Busca em grade dos experimentos de Machine Learning Clássico do
+# relatorio_experimentos.json (RandomForest, LogisticRegression, SVM, MLP e
+# XGBoost, cada um cruzado com tfidf__max_features e tfidf__ngram_range).
+#
+# Um GridSearchCV sobre Pipeline(TF-IDF, classificador) refaria o TF-IDF em
+# cada combinação de cada classificador. Aqui as matrizes são calculadas
+# antes, uma vez por configuração de TF-IDF e partição, e todos os
+# classificadores treinam sobre elas:
+#   - a tokenização (a parte cara) é feita uma vez por ngram_range e
+#     partição; cada max_features só escolhe, nas mesmas contagens, as
+#     colunas mais frequentes no treino (o mesmo critério do TfidfVectorizer);
+#   - as matrizes ficam em .cache/busca/, por hash do corpus, e uma nova
+#     busca sobre o mesmo corpus não tokeniza nada;
+#   - os ajustes (classificador x combinação x TF-IDF x partição) são
+#     distribuídos entre os núcleos pelo joblib.
+#
+# A melhor combinação de cada classificador na validação cruzada é
+# retreinada no treino inteiro e medida no teste separado no início; o
+# resultado sai no formato de um item de "experimentos".
+#
+# Uso (pasta ou ZIP rotulado, ou tabela .csv/.parquet com colunas texto e rotulo):
+#   python busca_hiperparametros.py dados_treino/ --saida busca.json --registrar
+
+import argparse
+import hashlib
+import importlib
+import itertools
+import json
+import os
+import sys
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+
+from metricas import METRICAS, calcular_metricas, intervalos_bootstrap, intervalos_wilson
+from registro_experimentos import GRUPO_TESTE_REAL
+
+PASTA_BUSCA = os.path.join(os.environ.get("CLASSIFICADOR_CACHE_DIR", ".cache"), "busca")
+CAMINHO_GRADES = "relatorio_experimentos.json"
+GRUPO_BUSCA = "Busca de Hiperparâmetros"
+SEMENTE = 42
+# Nome no "modelo" do relatório -> (módulo, classe, parâmetros fixos)
+# n_jobs=1: o paralelismo é entre os ajustes, não dentro de cada um
+FAMILIAS = {
+    "RandomForest": ("sklearn.ensemble", "RandomForestClassifier", {"random_state": SEMENTE, "n_jobs": 1}),
+    "LogisticRegression": ("sklearn.linear_model", "LogisticRegression", {"max_iter": 1000}),
+    "SVM": ("sklearn.svm", "SVC", {"random_state": SEMENTE}),
+    "MLP": ("sklearn.neural_network", "MLPClassifier", {"random_state": SEMENTE}),
+    "XGBoost": ("xgboost", "XGBClassifier", {"random_state": SEMENTE, "n_jobs": 1}),
+}
+# No JSON estes parâmetros já são listas quando têm um valor só
+PARAMETROS_TUPLA = ("tfidf__ngram_range", "hidden_layer_sizes")
+
+
+def criar_classificador(familia, parametros):
+    modulo, classe, fixos = FAMILIAS[familia]
+    return getattr(importlib.import_module(modulo), classe)(**fixos, **parametros)
+
+
+def _valores(nome, valor):
+    # Uma grade é uma lista de valores; um valor fixo vem sozinho
+    if nome in PARAMETROS_TUPLA:
+        if valor and isinstance(valor[0], list):
+            return [tuple(v) for v in valor]
+        return [tuple(valor)]
+    return list(valor) if isinstance(valor, list) else [valor]
+
+
+def _produto(grade):
+    nomes = list(grade)
+    return [dict(zip(nomes, valores)) for valores in itertools.product(*grade.values())]
+
+
+def carregar_grades(caminho=CAMINHO_GRADES, familias=None):
+    """Experimentos TF-IDF + classificador do relatório com as grades já expandidas.
+
+    Cada item: {"experimento", "familia", "combinacoes", "configuracoes_tfidf"},
+    com as configurações de TF-IDF como pares (max_features, ngram_range).
+    """
+    with open(caminho, "r", encoding="utf-8") as f:
+        experimentos = json.load(f)["experimentos"]
+    grades = []
+    for experimento in experimentos:
+        modelo = experimento.get("modelo", [])
+        if len(modelo) != 2 or modelo[0] != "TF-IDF" or modelo[1] not in FAMILIAS:
+            continue
+        # O teste real reaplica o modelo treinado; não é uma busca
+        if experimento["grupo"] == GRUPO_TESTE_REAL or (familias and modelo[1] not in familias):
+            continue
+        grade = {nome: _valores(nome, valor) for nome, valor in experimento["hiperparametros"].items()}
+        max_features = grade.pop("tfidf__max_features", [None])
+        ngram_range = grade.pop("tfidf__ngram_range", [(1, 1)])
+        grades.append({
+            "experimento": experimento,
+            "familia": modelo[1],
+            "combinacoes": _produto(grade),
+            "configuracoes_tfidf": list(itertools.product(max_features, ngram_range)),
+        })
+    return grades
+
+
+def _contagens(textos_treino, textos_avaliacao, ngram_range):
+    # Vocabulário completo do treino, sem limite: os max_features saem destas contagens
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    vetorizador = CountVectorizer(ngram_range=ngram_range)
+    return vetorizador.fit_transform(textos_treino), vetorizador.transform(textos_avaliacao)
+
+
+def _tfidf(contagens_treino, contagens_avaliacao, max_features):
+    # Igual ao TfidfVectorizer(max_features=...) ajustado só no treino
+    from sklearn.feature_extraction.text import TfidfTransformer
+
+    if max_features is not None and contagens_treino.shape[1] > max_features:
+        frequencias = np.asarray(contagens_treino.sum(axis=0)).ravel()
+        # Mesma ordenação do CountVectorizer._limit_features, empates inclusive
+        manter = np.zeros(len(frequencias), dtype=bool)
+        manter[(-frequencias).argsort()[:max_features]] = True
+        colunas = np.flatnonzero(manter)
+        contagens_treino, contagens_avaliacao = contagens_treino[:, colunas], contagens_avaliacao[:, colunas]
+    transformador = TfidfTransformer()
+    return transformador.fit_transform(contagens_treino), transformador.transform(contagens_avaliacao)
+
+
+class MatrizesTfidf:
+    """Matrizes TF-IDF (treino, avaliação) de cada configuração em cada partição, calculadas uma vez.
+
+    `particoes` mapeia o nome da partição para (índices de treino, índices de
+    avaliação) sobre `textos`. Com `pasta`, as matrizes também ficam em disco.
+    """
+
+    def __init__(self, textos, rotulos, particoes, pasta=PASTA_BUSCA, workers=1):
+        self.textos = textos
+        self.rotulos = np.asarray(rotulos, dtype=np.int64)
+        self.particoes = particoes
+        self.pasta = pasta
+        self.workers = workers
+        self._matrizes = {}
+        corpus = hashlib.sha256()
+        for texto, rotulo in zip(textos, self.rotulos):
+            corpus.update(hashlib.sha256(texto.encode("utf-8")).digest())
+            corpus.update(bytes([rotulo]))
+        self.chave_corpus = corpus.hexdigest()
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+
+    def _caminhos(self, max_features, ngram_range, particao):
+        treino, avaliacao = self.particoes[particao]
+        chave = hashlib.sha256(self.chave_corpus.encode("ascii"))
+        chave.update(repr((max_features, tuple(ngram_range))).encode("ascii"))
+        chave.update(np.asarray(treino, dtype=np.int64).tobytes())
+        chave.update(np.asarray(avaliacao, dtype=np.int64).tobytes())
+        base = os.path.join(self.pasta, chave.hexdigest()[:32])
+        return base + "_treino.npz", base + "_avaliacao.npz"
+
+    def preparar(self, configuracoes):
+        """Calcula (ou lê do disco) as matrizes de todas as configurações em todas as partições."""
+        from joblib import Parallel, delayed
+        from scipy import sparse
+
+        faltando = {}
+        for max_features, ngram_range in configuracoes:
+            for particao in self.particoes:
+                chave = (max_features, tuple(ngram_range), particao)
+                if chave in self._matrizes:
+                    continue
+                if self.pasta:
+                    caminho_treino, caminho_avaliacao = self._caminhos(*chave)
+                    if os.path.exists(caminho_treino) and os.path.exists(caminho_avaliacao):
+                        self._matrizes[chave] = (sparse.load_npz(caminho_treino), sparse.load_npz(caminho_avaliacao))
+                        continue
+                faltando.setdefault((tuple(ngram_range), particao), []).append(max_features)
+        if not faltando:
+            return
+
+        # Uma tokenização por (ngram_range, partição), em paralelo
+        tarefas = list(faltando)
+        contagens = Parallel(n_jobs=self.workers)(
+            delayed(_contagens)(
+                [self.textos[i] for i in self.particoes[particao][0]],
+                [self.textos[i] for i in self.particoes[particao][1]],
+                ngram_range,
+            )
+            for ngram_range, particao in tarefas
+        )
+        for (ngram_range, particao), (contagens_treino, contagens_avaliacao) in zip(tarefas, contagens):
+            for max_features in faltando[(ngram_range, particao)]:
+                chave = (max_features, ngram_range, particao)
+                matrizes = _tfidf(contagens_treino, contagens_avaliacao, max_features)
+                self._matrizes[chave] = matrizes
+                if self.pasta:
+                    for caminho, matriz in zip(self._caminhos(*chave), matrizes):
+                        sparse.save_npz(caminho, matriz, compressed=False)
+
+    def obter(self, max_features, ngram_range, particao):
+        # (X_treino, y_treino, X_avaliacao, y_avaliacao)
+        X_treino, X_avaliacao = self._matrizes[(max_features, tuple(ngram_range), particao)]
+        treino, avaliacao = self.particoes[particao]
+        return X_treino, self.rotulos[treino], X_avaliacao, self.rotulos[avaliacao]
+
+
+def particionar(rotulos, particoes=5, tamanho_teste=0.2, semente=SEMENTE):
+    """Separa o teste e divide o restante em `particoes` dobras estratificadas.
+
+    Devolve {"dobra_0": (treino, validação), ..., "final": (treino, teste)}.
+    """
+    from sklearn.model_selection import StratifiedKFold, train_test_split
+
+    indices = np.arange(len(rotulos))
+    treino, teste = train_test_split(indices, test_size=tamanho_teste, stratify=rotulos, random_state=semente)
+    dobras = StratifiedKFold(n_splits=particoes, shuffle=True, random_state=semente)
+    resultado = {
+        f"dobra_{i}": (treino[t], treino[v])
+        for i, (t, v) in enumerate(dobras.split(treino, np.asarray(rotulos)[treino]))
+    }
+    resultado["final"] = (treino, teste)
+    return resultado
+
+
+def _ajustar(familia, parametros, X_treino, y_treino, X_avaliacao, y_avaliacao):
+    # Roda nos processos do joblib; devolve as métricas na avaliação, as predições e o tempo
+    from sklearn.exceptions import ConvergenceWarning
+
+    inicio = time.perf_counter()
+    with warnings.catch_warnings():
+        # As grades do relatório incluem MLP com max_iter=200
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        classificador = criar_classificador(familia, parametros).fit(X_treino, y_treino)
+    predito = np.asarray(classificador.predict(X_avaliacao), dtype=np.int64)
+    return calcular_metricas(y_avaliacao, predito), predito, time.perf_counter() - inicio
+
+
+def _descrever(combinacao):
+    return ", ".join(f"{nome}={valor}" for nome, valor in combinacao.items())
+
+
+def buscar(textos, rotulos, grades, workers=1, particoes=5, tamanho_teste=0.2, metrica="f1score",
+           semente=SEMENTE, pasta=PASTA_BUSCA, grupo=GRUPO_BUSCA):
+    """Roda a busca de todas as grades e devolve (experimentos, candidatos).
+
+    `candidatos` tem uma linha por combinação avaliada, com a média de cada
+    métrica nas dobras da validação cruzada.
+    """
+    from joblib import Parallel, delayed
+
+    inicio = time.perf_counter()
+    divisao = particionar(rotulos, particoes, tamanho_teste, semente)
+    dobras = [nome for nome in divisao if nome != "final"]
+    matrizes = MatrizesTfidf(textos, rotulos, divisao, pasta, workers)
+    configuracoes = sorted({c for g in grades for c in g["configuracoes_tfidf"]}, key=repr)
+    matrizes.preparar(configuracoes)
+    duracao_tfidf = time.perf_counter() - inicio
+    print(f"{len(configuracoes)} configurações de TF-IDF x {len(divisao)} partições em {duracao_tfidf:.1f}s",
+          file=sys.stderr)
+
+    # Cada candidato é (grade, combinação do classificador, configuração de TF-IDF)
+    candidatos = [
+        (g, combinacao, configuracao)
+        for g in grades for configuracao in g["configuracoes_tfidf"] for combinacao in g["combinacoes"]
+    ]
+    tarefas = [(c, dobra) for c in range(len(candidatos)) for dobra in dobras]
+    print(f"{len(candidatos)} combinações, {len(tarefas)} ajustes em {workers} processos", file=sys.stderr)
+    saidas = Parallel(n_jobs=workers, return_as="generator")(
+        delayed(_ajustar)(candidatos[c][0]["familia"], candidatos[c][1], *matrizes.obter(*candidatos[c][2], dobra))
+        for c, dobra in tarefas
+    )
+    por_candidato = [[] for _ in candidatos]
+    duracao_ajustes = [0.0 for _ in candidatos]
+    for concluidos, ((c, _), (resultados, _, segundos)) in enumerate(zip(tarefas, saidas), start=1):
+        por_candidato[c].append(resultados)
+        duracao_ajustes[c] += segundos
+        print(f"\r{concluidos}/{len(tarefas)} ajustes", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+
+    tabela = []
+    for (g, combinacao, (max_features, ngram_range)), resultados, segundos in zip(candidatos, por_candidato, duracao_ajustes):
+        tabela.append({
+            "familia": g["familia"],
+            "combinacao": combinacao,
+            "tfidf__max_features": max_features,
+            "tfidf__ngram_range": ngram_range,
+            **{m: float(np.mean([r[m] for r in resultados])) for m in METRICAS},
+            f"{metrica}_desvio": float(np.std([r[metrica] for r in resultados])),
+            "duracao_s": segundos,
+        })
+
+    # Melhor de cada classificador (a primeira em caso de empate), retreinada no treino inteiro
+    melhores = []
+    for g in grades:
+        linhas = [i for i, linha in enumerate(tabela) if linha["familia"] == g["familia"]]
+        melhores.append(max(linhas, key=lambda i: tabela[i][metrica]))
+    finais = Parallel(n_jobs=workers)(
+        delayed(_ajustar)(candidatos[i][0]["familia"], candidatos[i][1], *matrizes.obter(*candidatos[i][2], "final"))
+        for i in melhores
+    )
+
+    data = datetime.now().isoformat(timespec="seconds")
+    y_teste = matrizes.rotulos[divisao["final"][1]]
+    experimentos = []
+    for g, i, (resultados, predito, segundos) in zip(grades, melhores, finais):
+        linha = tabela[i]
+        original = g["experimento"]
+        melhor = {
+            **linha["combinacao"],
+            "tfidf__max_features": linha["tfidf__max_features"],
+            "tfidf__ngram_range": linha["tfidf__ngram_range"],
+        }
+        experimentos.append({
+            "grupo": grupo,
+            "nome": f"{original['nome']} (busca reproduzida)",
+            "paradigma": original.get("paradigma", "Machine Learning"),
+            "modelo": original["modelo"],
+            "pipeline": original["pipeline"],
+            "hiperparametros": original["hiperparametros"],
+            "resultados": {k: float(v) for k, v in resultados.items()},
+            "observacoes": (
+                f"Melhor combinação na validação cruzada ({len(dobras)} dobras, {metrica} médio "
+                f"{linha[metrica]:.4f} ± {linha[f'{metrica}_desvio']:.4f}): {_descrever(melhor)}. "
+                f"Resultados no teste separado ({len(y_teste)} ofícios)."
+            ),
+            "orientacoes": {k: "" for k in resultados},
+            "impacto": "",
+            "execucao": {
+                "data": data,
+                "melhores_hiperparametros": melhor,
+                "validacao_cruzada": {
+                    "dobras": len(dobras),
+                    "metrica": metrica,
+                    "media": linha[metrica],
+                    "desvio": linha[f"{metrica}_desvio"],
+                },
+                "combinacoes_avaliadas": len(g["combinacoes"]) * len(g["configuracoes_tfidf"]),
+                "documentos_treino": len(divisao["final"][0]),
+                "documentos_teste": len(y_teste),
+                "duracao_treino_final_s": segundos,
+                "semente": semente,
+                "corpus": matrizes.chave_corpus,
+                "intervalos_95": {
+                    "bootstrap": intervalos_bootstrap(y_teste, predito),
+                    "wilson": intervalos_wilson(y_teste, predito)
+                }
+            }
+        })
+    duracao = time.perf_counter() - inicio
+    for experimento in experimentos:
+        experimento["execucao"]["duracao_busca_s"] = duracao
+    return experimentos, tabela
+
+
+def ler_corpus(entrada, workers=1):
+    """Textos limpos e rótulos do corpus: pasta ou ZIP rotulado, ou tabela com colunas texto e rotulo.
+
+    Documentos sem texto ou com erro na extração ficam de fora.
+    """
+    if entrada.lower().endswith((".csv", ".parquet")):
+        import pandas as pd
+
+        tabela = pd.read_parquet(entrada) if entrada.lower().endswith(".parquet") else pd.read_csv(entrada)
+        tabela = tabela.dropna(subset=["texto", "rotulo"])
+        return tabela["texto"].astype(str).tolist(), tabela["rotulo"].astype(int).tolist()
+
+    from avaliacao import abrir_zip, ler_pdfs_do_zip, listar_arquivos_pdf_com_rotulo, listar_membros_pdf_com_rotulo
+    from classificacao_lote import extrair_textos
+
+    def extrair(arquivos, pdfs):
+        textos = [None] * len(arquivos)
+        for concluidos, (i, texto) in enumerate(extrair_textos(pdfs, workers), start=1):
+            if isinstance(texto, Exception):
+                print(f"\nErro ao extrair {arquivos[i]['caminho']}: {type(texto).__name__}: {texto}", file=sys.stderr)
+            elif texto.strip():
+                textos[i] = texto
+            print(f"\r{concluidos}/{len(arquivos)} arquivos", end="", file=sys.stderr, flush=True)
+        print(file=sys.stderr)
+        manter = [i for i, texto in enumerate(textos) if texto is not None]
+        return [textos[i] for i in manter], [arquivos[i]["rotulo"] for i in manter]
+
+    if os.path.isdir(entrada):
+        arquivos = listar_arquivos_pdf_com_rotulo(entrada)
+
+        def ler():
+            for arqinfo in arquivos:
+                with open(arqinfo["caminho"], "rb") as f:
+                    yield f.read()
+
+        return extrair(arquivos, ler())
+    with abrir_zip(entrada) as zip_ref:
+        arquivos = listar_membros_pdf_com_rotulo(zip_ref)
+        return extrair(arquivos, ler_pdfs_do_zip(zip_ref, arquivos))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Busca em grade dos experimentos TF-IDF + classificador do relatório.")
+    parser.add_argument("entrada", help="Pasta ou .zip com as subpastas rotuladas, ou .csv/.parquet com colunas texto e rotulo")
+    parser.add_argument("--grades", default=CAMINHO_GRADES, help="JSON com os experimentos e as grades de hiperparâmetros")
+    parser.add_argument("--modelos", nargs="+", choices=sorted(FAMILIAS), help="Só estes classificadores (padrão: todos)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processos em paralelo")
+    parser.add_argument("--particoes", type=int, default=5, help="Dobras da validação cruzada")
+    parser.add_argument("--teste", type=float, default=0.2, help="Fração separada para o teste final")
+    parser.add_argument("--metrica", default="f1score", choices=METRICAS, help="Métrica que escolhe a melhor combinação")
+    parser.add_argument("--semente", type=int, default=SEMENTE)
+    parser.add_argument("--sem-cache", action="store_true", help="Não lê nem grava as matrizes TF-IDF em disco")
+    parser.add_argument("--grupo", default=GRUPO_BUSCA, help="Grupo dos experimentos gerados")
+    parser.add_argument("--saida", default="busca.json", help="Experimentos no formato do relatório")
+    parser.add_argument("--candidatos", help="Todas as combinações avaliadas (.csv ou .parquet)")
+    parser.add_argument("--registrar", action="store_true", help="Grava os experimentos no registro (relatórios)")
+    args = parser.parse_args(argv)
+
+    grades = carregar_grades(args.grades, args.modelos)
+    if not grades:
+        print("Nenhum experimento TF-IDF + classificador encontrado nas grades!", file=sys.stderr)
+        return 1
+    textos, rotulos = ler_corpus(args.entrada, args.workers)
+    if len(set(rotulos)) < 2:
+        print("O corpus precisa ter documentos das duas classes!", file=sys.stderr)
+        return 1
+
+    experimentos, tabela = buscar(
+        textos, rotulos, grades, workers=args.workers, particoes=args.particoes, tamanho_teste=args.teste,
+        metrica=args.metrica, semente=args.semente, pasta=None if args.sem_cache else PASTA_BUSCA, grupo=args.grupo,
+    )
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump({"experimentos": experimentos}, f, ensure_ascii=False, indent=2)
+    if args.candidatos:
+        import pandas as pd
+
+        candidatos = pd.DataFrame([{**linha, "combinacao": _descrever(linha["combinacao"])} for linha in tabela])
+        candidatos["tfidf__ngram_range"] = candidatos["tfidf__ngram_range"].astype(str)
+        if args.candidatos.lower().endswith(".parquet"):
+            candidatos.to_parquet(args.candidatos, index=False)
+        else:
+            candidatos.to_csv(args.candidatos, index=False)
+    if args.registrar:
+        from registro_experimentos import registro_padrao
+
+        for experimento in experimentos:
+            registro_padrao().registrar(experimento, origem="busca")
+
+    for experimento in experimentos:
+        resultados = experimento["resultados"]
+        print(f"{experimento['modelo'][1]}: " + ", ".join(f"{m} {resultados[m]*100:.2f}%" for m in METRICAS))
+        print(f"    {_descrever(experimento['execucao']['melhores_hiperparametros'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
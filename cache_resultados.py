@@ -0,0 +1,171 @@
+# cache_resultados.py
+#
+# Cache de resultados da classificação endereçado pelo conteúdo do PDF.
+# A chave é o SHA-256 dos bytes do PDF mais a versão do modelo e do formato
+# do resultado: o mesmo ofício reenviado (ou repetido em um ZIP de teste) não
+# passa de novo por OCR e inferência. Fica em memória (LRU) com cópia em SQLite no disco, para
+# sobreviver a reinícios do Streamlit.
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+PASTA_CACHE = os.environ.get("CLASSIFICADOR_CACHE_DIR", ".cache")
+CAPACIDADE_MEMORIA = int(os.environ.get("CLASSIFICADOR_CACHE_ITENS", "10000"))
+# Versão do formato do resultado guardado: incremente ao mudar os campos
+# (ex.: quando entrou o prob_bloqueio, e quando o classify_oficio passou a trazê-lo),
+# para não servir linhas antigas sem eles
+VERSAO_RESULTADO = 3
+# Resultados de versões (modelo, formato, pipeline) sem uso há mais que isso são apagados.
+# Trocar de versão não apaga nada: réplicas e o avaliar_cli podem usar versões diferentes ao mesmo tempo
+RETENCAO_DIAS = float(os.environ.get("CLASSIFICADOR_CACHE_RETENCAO_DIAS", "30"))
+
+
+def hash_pdf(pdf_bytes):
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def versao_modelo(model):
+    # Usa a versão declarada pelo artefato, se houver; senão, o hash do
+    # modelo serializado (muda sempre que um novo modelo é carregado)
+    for atributo in ("versao", "version", "__version__"):
+        valor = getattr(model, atributo, None)
+        if isinstance(valor, (str, int, float)) and valor:
+            return str(valor)
+    try:
+        return hashlib.sha256(pickle.dumps(model)).hexdigest()[:16]
+    except Exception:
+        return f"processo-{os.getpid()}-{id(model)}"
+
+
+class CacheResultados:
+    def __init__(self, pasta=PASTA_CACHE, capacidade=CAPACIDADE_MEMORIA):
+        os.makedirs(pasta, exist_ok=True)
+        self.capacidade = capacidade
+        self.versao = None
+        self.etapas = False
+        self.acertos = 0
+        self.falhas = 0
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        # timeout alto e WAL: réplicas do app e o avaliar_cli --cache usam o mesmo arquivo
+        self._conn = sqlite3.connect(
+            os.path.join(pasta, "resultados.sqlite3"), timeout=60, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS resultados ("
+            " hash_pdf TEXT NOT NULL,"
+            " versao TEXT NOT NULL,"
+            " resultado TEXT NOT NULL,"
+            " PRIMARY KEY (hash_pdf, versao))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_resultados_versao ON resultados (versao)")
+        # Último uso de cada versão, para a limpeza por idade
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS versoes (versao TEXT PRIMARY KEY, usada REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def usar_modelo(self, versao):
+        # Um modelo novo (ou formato de resultado novo) deixa de ler o que foi calculado antes. O pipeline
+        # em etapas conta como outra versão: os resultados dele não se misturam aos do classify_oficio.
+        # `etapas` guarda a escolha do pipeline para este modelo (ver desempenho.pipeline_em_etapas)
+        from desempenho import pipeline_em_etapas
+
+        self.etapas = pipeline_em_etapas(versao)
+        versao = f"{versao}+r{VERSAO_RESULTADO}"
+        if self.etapas:
+            versao = f"{versao}+etapas"
+        with self._lock:
+            agora = time.time()
+            # Chamado a cada lote: mantém a versão em uso fora da limpeza das outras réplicas
+            self._conn.execute("INSERT OR REPLACE INTO versoes VALUES (?, ?)", (versao, agora))
+            if versao != self.versao:
+                self.versao = versao
+                self._memoria.clear()
+                self._limpar_versoes_antigas(agora)
+            self._conn.commit()
+
+    def _limpar_versoes_antigas(self, agora):
+        # Versões gravadas antes da tabela de uso entram nela agora e envelhecem a partir daqui
+        self._conn.execute("INSERT OR IGNORE INTO versoes SELECT DISTINCT versao, ? FROM resultados", (agora,))
+        antigas = [
+            v for (v,) in self._conn.execute(
+                "SELECT versao FROM versoes WHERE usada < ?", (agora - RETENCAO_DIAS * 86400,)
+            )
+        ]
+        for antiga in antigas:
+            self._conn.execute("DELETE FROM resultados WHERE versao = ?", (antiga,))
+            self._conn.execute("DELETE FROM versoes WHERE versao = ?", (antiga,))
+
+    def obter(self, chave, contar=True):
+        # contar=False: consultas internas (ex.: o resultado de uma quase-duplicata) não
+        # entram na taxa de acerto, que mede os PDFs enviados
+        resultado = self._obter(chave)
+        if contar:
+            with self._lock:
+                if resultado is None:
+                    self.falhas += 1
+                else:
+                    self.acertos += 1
+        return resultado
+
+    def _obter(self, chave):
+        with self._lock:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                return self._memoria[chave]
+            linha = self._conn.execute(
+                "SELECT resultado FROM resultados WHERE hash_pdf = ? AND versao = ?",
+                (chave, self.versao),
+            ).fetchone()
+            if linha is None:
+                return None
+            resultado = json.loads(linha[0])
+            if "duplicata_de" in resultado:
+                # Gravado por versões que guardavam o resultado reaproveitado: não vale como resultado do PDF
+                return None
+            self._lembrar(chave, resultado)
+            return resultado
+
+    def guardar(self, chave, resultado):
+        # Erros não são guardados: o arquivo é reprocessado na próxima vez. Resultados
+        # reaproveitados de uma quase-duplicata também não: são de outro PDF, e as avaliações
+        # (TESTAR MODELO) que leem este cache precisam da inferência do próprio documento
+        if "erro" in resultado or "duplicata_de" in resultado:
+            return
+        with self._lock:
+            self._lembrar(chave, resultado)
+            try:
+                conteudo = json.dumps(resultado, ensure_ascii=False)
+            except TypeError:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resultados VALUES (?, ?, ?)",
+                (chave, self.versao, conteudo),
+            )
+            self._conn.commit()
+
+    def _lembrar(self, chave, resultado):
+        self._memoria[chave] = resultado
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.capacidade:
+            self._memoria.popitem(last=False)
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+                "itens_memoria": len(self._memoria),
+            }
+
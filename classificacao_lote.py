@@ -0,0 +1,450 @@
+# classificacao_lote.py
+#
+# Classificação em lote de ofícios sobre um pool de processos, medindo cada
+# documento (desempenho.py). Por padrão cada worker roda o classify_oficio
+# com o próprio modelo (load_model, carregado uma vez por worker).
+# Com o pipeline em etapas (desempenho.pipeline_em_etapas), só a extração e a
+# limpeza do texto (a parte cara, por documento) rodam no pool; os textos
+# limpos voltam para o processo principal, que vetoriza o lote em uma única
+# matriz esparsa e o pontua com uma única chamada ao modelo.
+# O pool é reaproveitado entre as chamadas, então o custo de subir os
+# processos só é pago no primeiro lote.
+
+import atexit
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from cache_resultados import hash_pdf, versao_modelo
+from desempenho import (
+    evento_incremental, medir_documento, medir_extracao, medir_incremental, medir_pagina, pipeline_em_etapas, ratear_lote,
+)
+from duplicatas import assinatura_minhash
+from modelo_compacto import carregar_modelo
+
+# Número de processos do pool (padrão: todos os núcleos disponíveis)
+MAX_WORKERS = int(os.environ.get("CLASSIFICADOR_WORKERS", os.cpu_count() or 1))
+# Textos acumulados antes de cada chamada de vetorização + inferência
+TAMANHO_LOTE_INFERENCIA = int(os.environ.get("CLASSIFICADOR_LOTE_INFERENCIA", "256"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_modelo_oficio = None
+
+
+def _preparar_etapas_no_worker(threads_ocr=None):
+    # O pipeline em etapas (e o OCR) só é importado nos workers que o usam
+    from pipeline import configurar_ocr
+
+    if threads_ocr is not None:
+        configurar_ocr(threads_ocr)
+
+
+def _threads_ocr(em_paralelo):
+    # Os núcleos ficam divididos entre os documentos em voo da chamada: um lote com menos
+    # documentos que núcleos usa o resto no OCR das páginas de cada um
+    return max(1, (os.cpu_count() or 1) // max(1, em_paralelo))
+
+
+def _classificar_no_worker(pdf_bytes):
+    # O modelo é carregado fora da medição do documento
+    global _modelo_oficio
+    if _modelo_oficio is None:
+        from inference import load_model
+        _modelo_oficio = load_model()
+    return medir_documento(pdf_bytes, _modelo_oficio)
+
+
+def _extrair_no_worker(pdf_bytes, usar_armazem, threads_ocr):
+    _preparar_etapas_no_worker(threads_ocr)
+    return medir_extracao(pdf_bytes, usar_armazem)
+
+
+def _extrair_pagina_no_worker(caminho, chave, numero, usar_armazem):
+    # Saída antecipada: o worker só extrai; quem pontua é o processo principal, com o modelo dele
+    _preparar_etapas_no_worker()
+    return medir_pagina(caminho, chave, numero, usar_armazem)
+
+
+def _gravar_temporario(pdf_bytes):
+    # Saída antecipada no pool: o PDF vai uma vez para o disco e as páginas pedem só o caminho
+    descritor, caminho = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(descritor, "wb") as f:
+        f.write(pdf_bytes)
+    return caminho
+
+
+def criar_pool(processos):
+    """Pool de processos no formato que classificar_lote espera (ver o parâmetro `pool`)."""
+    # "spawn" evita herdar as threads do servidor do Streamlit via fork
+    return ProcessPoolExecutor(
+        max_workers=processos,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def _obter_pool():
+    # Pool de tamanho fixo (MAX_WORKERS), compartilhado por todas as chamadas, inclusive de
+    # threads diferentes. Cada chamada limita os próprios arquivos em voo (max_workers):
+    # lotes simultâneos de tamanhos diferentes não derrubam o pool um do outro.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = criar_pool(MAX_WORKERS)
+        return _pool
+
+
+def _descartar_pool(pool):
+    # Um worker morto (ex.: OOM num scan grande) quebra o pool para sempre: o compartilhado é
+    # descartado e a próxima chamada sobe outro. Pools de quem chamou ficam com quem chamou.
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def encerrar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def extrair_textos(pdfs, max_workers=None, usar_armazem=True):
+    """Gerador de (índice, texto limpo) de cada PDF, sem classificar, na ordem de conclusão.
+
+    Usado para montar corpus (índice de duplicatas, busca de hiperparâmetros).
+    Se a extração de um documento falha, a exceção vem no lugar do texto.
+    """
+    max_workers = max_workers or MAX_WORKERS
+    if max_workers <= 1:
+        for indice, pdf_bytes in enumerate(pdfs):
+            try:
+                texto, _ = medir_extracao(pdf_bytes, usar_armazem)
+            except Exception as e:
+                texto = e
+            yield indice, texto
+        return
+
+    pool = _obter_pool()
+    pendentes = {}
+    quebrado = None
+
+    def coletar(futuros):
+        nonlocal quebrado
+        for futuro in futuros:
+            indice = pendentes.pop(futuro)
+            try:
+                texto, _ = futuro.result()
+            except BrokenProcessPool as e:
+                quebrado = texto = e
+                _descartar_pool(pool)
+            except Exception as e:
+                texto = e
+            yield indice, texto
+
+    for indice, pdf_bytes in enumerate(pdfs):
+        if quebrado is None:
+            try:
+                pendentes[pool.submit(_extrair_no_worker, pdf_bytes, usar_armazem)] = indice
+            except BrokenProcessPool as e:
+                quebrado = e
+                _descartar_pool(pool)
+        if quebrado is not None:
+            # Pool quebrado: os arquivos que faltam vêm com o erro, sem abortar o gerador
+            yield indice, quebrado
+            continue
+        # Limita os arquivos em voo para não carregar o corpus inteiro na memória
+        if len(pendentes) >= max_workers:
+            feitos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+            yield from coletar(feitos)
+    while pendentes:
+        feitos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+        yield from coletar(feitos)
+
+
+def _resultado_erro(e):
+    return {"tpOficio": None, "erro": f"{type(e).__name__}: {e}"}
+
+
+def classificar_lote(pdfs, model=None, max_workers=None, ao_progredir=None, total=None, cache=None, ao_medir=None,
+                     saida_antecipada=None, usar_armazem=True, indice_duplicatas=None, ao_concluir=None, etapas=None,
+                     pool=None):
+    """Classifica vários PDFs e devolve os resultados na mesma ordem de entrada.
+
+    `pdfs` é qualquer iterável de bytes (pode ser um gerador, que é consumido
+    aos poucos). Um erro em um arquivo não interrompe o lote: o resultado
+    daquele arquivo vem como {"tpOficio": None, "erro": "..."}. Se um worker
+    morre, o pool quebra: os arquivos em voo e os que faltam vêm com o erro e
+    o pool compartilhado é trocado na próxima chamada.
+    `max_workers` é quantos arquivos desta chamada ficam em voo no pool
+    compartilhado (que tem sempre MAX_WORKERS processos).
+    `etapas` escolhe o pipeline em etapas (padrão: a escolha do `cache` para o
+    modelo em uso ou, sem cache, desempenho.pipeline_em_etapas).
+    Sem ele, cada documento passa pelo classify_oficio; no pool, os workers
+    usam o modelo do load_model() e `model` só vale com max_workers=1.
+    As opções abaixo de armazém, saída antecipada e quase-duplicatas exigem
+    o pipeline em etapas.
+    `ao_progredir(concluidos, total)` é chamado a cada arquivo extraído.
+    Com `cache` (CacheResultados), PDFs já vistos não são reprocessados.
+    `ao_medir(indice, evento)` recebe o evento de desempenho de cada arquivo
+    processado (os vindos do cache não geram evento).
+    Com `saida_antecipada` (margem, ver pipeline.classificar_incremental), cada
+    documento é classificado página a página e o resultado traz "paginas_usadas";
+    no pool, cada PDF é gravado uma vez em um arquivo temporário, os workers
+    extraem uma página por vez a partir dele e as páginas são pontuadas neste
+    processo, com `model`.
+    `usar_armazem=False` ignora o armazém de textos extraídos (medições limpas).
+    Com `indice_duplicatas` (IndiceDuplicatas) e `cache`, um documento quase
+    idêntico a outro já classificado reaproveita o resultado dele sem passar
+    pela inferência (o resultado traz "duplicata_de" e "similaridade" e não é
+    guardado no cache); só documentos que passaram pela inferência entram no
+    índice. Não se aplica à saída antecipada.
+    `ao_concluir(indice, resultado)` recebe cada resultado assim que ele fica
+    pronto (inclusive os do cache e os erros), para gravar checkpoints.
+    `pool` (ver criar_pool) substitui o pool compartilhado do módulo, para quem
+    não deve disputar os processos com os demais lotes (a fila de trabalhos).
+    """
+    max_workers = max_workers or MAX_WORKERS
+    if etapas is None:
+        etapas = cache.etapas if cache is not None else pipeline_em_etapas(
+            None if model is None else versao_modelo(model)
+        )
+    if saida_antecipada is not None and not etapas:
+        raise ValueError("A saída antecipada exige o pipeline em etapas (ver paridade.py).")
+    modelo = model
+    if modelo is None and (etapas or max_workers <= 1):
+        modelo = carregar_modelo()
+    if total is None and hasattr(pdfs, "__len__"):
+        total = len(pdfs)
+    resultados = {}
+    chaves = {}
+    hashes = {}
+    # Só documentos inteiros entram no índice (a saída antecipada lê só parte do texto)
+    usar_duplicatas = etapas and indice_duplicatas is not None and cache is not None and saida_antecipada is None
+    assinaturas = {}
+    # Textos já extraídos esperando a próxima inferência em lote: (indice, texto, evento)
+    aguardando = []
+    extraidos = 0
+
+    def progredir():
+        nonlocal extraidos
+        extraidos += 1
+        if ao_progredir is not None:
+            ao_progredir(extraidos, total)
+
+    def concluir(indice, resultado, evento=None):
+        if evento is not None and ao_medir is not None:
+            ao_medir(indice, evento)
+        resultados[indice] = resultado
+        if cache is not None:
+            cache.guardar(chaves.pop(indice), resultado)
+        if ao_concluir is not None:
+            ao_concluir(indice, resultado)
+
+    def inferir():
+        if not aguardando:
+            return
+        from pipeline import classificar_textos
+
+        tempos = {}
+        try:
+            classificados = classificar_textos([texto for _, texto, _ in aguardando], modelo, tempos)
+        except Exception as e:
+            classificados = [_resultado_erro(e)] * len(aguardando)
+        ratear_lote([evento for _, _, evento in aguardando], tempos)
+        for (indice, _, evento), resultado in zip(aguardando, classificados):
+            concluir(indice, resultado, evento)
+            indexar(indice, resultado)
+        aguardando.clear()
+
+    def indexar(indice, resultado):
+        assinatura = assinaturas.pop(indice, None)
+        if assinatura is not None and "erro" not in resultado:
+            indice_duplicatas.adicionar(hashes[indice], assinatura)
+
+    def reaproveitar(indice, texto, evento):
+        # Quase-duplicata de um documento com resultado no cache: dispensa a inferência
+        assinatura = assinatura_minhash(texto)
+        if assinatura is None:
+            return False
+        assinaturas[indice] = assinatura
+        encontrado = indice_duplicatas.buscar(assinatura, excluir=hashes[indice])
+        if encontrado is None:
+            return False
+        anterior = cache.obter(encontrado[0], contar=False)
+        if anterior is None:
+            return False
+        # O reaproveitado não entra no cache (ver CacheResultados.guardar) nem no índice
+        assinaturas.pop(indice)
+        resultado = {**anterior, "duplicata_de": encontrado[0], "similaridade": encontrado[1]}
+        concluir(indice, resultado, evento)
+        return True
+
+    def extraido(indice, texto, evento):
+        if usar_duplicatas and reaproveitar(indice, texto, evento):
+            progredir()
+            return
+        aguardando.append((indice, texto, evento))
+        progredir()
+        if len(aguardando) >= TAMANHO_LOTE_INFERENCIA:
+            inferir()
+
+    def falhou(indice, e):
+        concluir(indice, _resultado_erro(e))
+        progredir()
+
+    def buscar_no_cache(indice, pdf_bytes):
+        if cache is None:
+            return False
+        chave = hashes[indice] = hash_pdf(pdf_bytes)
+        if saida_antecipada is not None:
+            # Resultados com saída antecipada não se misturam aos do documento inteiro
+            chave = f"{chave}:saida{saida_antecipada}"
+        resultado = cache.obter(chave)
+        if resultado is None:
+            chaves[indice] = chave
+            return False
+        resultados[indice] = resultado
+        if ao_concluir is not None:
+            ao_concluir(indice, resultado)
+        progredir()
+        return True
+
+    quantidade = 0
+    if max_workers <= 1:
+        for indice, pdf_bytes in enumerate(pdfs):
+            quantidade += 1
+            if buscar_no_cache(indice, pdf_bytes):
+                continue
+            try:
+                if not etapas or saida_antecipada is not None:
+                    if etapas:
+                        resultado, evento = medir_incremental(pdf_bytes, modelo, saida_antecipada, usar_armazem)
+                    else:
+                        resultado, evento = medir_documento(pdf_bytes, modelo)
+                    concluir(indice, resultado, evento)
+                    progredir()
+                    continue
+                texto, evento = medir_extracao(pdf_bytes, usar_armazem)
+            except Exception as e:
+                falhou(indice, e)
+                continue
+            extraido(indice, texto, evento)
+        inferir()
+        return [resultados[i] for i in range(quantidade)]
+
+    if pool is None:
+        pool = _obter_pool()
+    # Arquivos em voo desta chamada: é isso, e não o tamanho do pool, que limita
+    # o paralelismo de cada lote (e a memória ocupada por ele)
+    limite_em_voo = max_workers
+    threads_ocr = _threads_ocr(min(limite_em_voo, total) if total else limite_em_voo)
+    pendentes = {}
+    # Pool quebrado no meio do lote: os arquivos em voo e os que faltam viram erro
+    quebrado = None
+
+    def submeter(indice, funcao, *args):
+        nonlocal quebrado
+        if quebrado is None:
+            try:
+                pendentes[pool.submit(funcao, *args)] = indice
+                return True
+            except BrokenProcessPool as e:
+                quebrado = e
+                _descartar_pool(pool)
+        descartar_incremental(indice)
+        falhou(indice, quebrado)
+        return False
+    # Saída antecipada: documentos com páginas em extração,
+    # {indice: {"pdf", "arquivo", "chave", "textos", "tempos"}}
+    incrementais = {}
+
+    def descartar_incremental(indice):
+        estado = incrementais.pop(indice, None)
+        if estado is not None:
+            os.remove(estado["arquivo"])
+        return estado
+
+    def pedir_pagina(indice):
+        estado = incrementais[indice]
+        submeter(
+            indice, _extrair_pagina_no_worker, estado["arquivo"], estado["chave"], len(estado["textos"]), usar_armazem
+        )
+
+    def pagina_extraida(indice, texto, paginas, tempos_pagina):
+        # Pontua o texto acumulado e decide entre pedir a próxima página e concluir o documento
+        from pipeline import pontuar_paginas
+
+        estado = incrementais[indice]
+        for etapa, segundos in tempos_pagina.items():
+            estado["tempos"][etapa] = estado["tempos"].get(etapa, 0.0) + segundos
+        if texto is not None:
+            estado["textos"].append(texto)
+        resultado, parar = pontuar_paginas(estado["textos"], modelo, saida_antecipada, estado["tempos"])
+        if not parar and len(estado["textos"]) < paginas:
+            pedir_pagina(indice)
+            return
+        descartar_incremental(indice)
+        usadas = len(estado["textos"])
+        evento = evento_incremental(estado["pdf"], estado["tempos"], paginas, usadas)
+        concluir(indice, {**resultado, "paginas": paginas, "paginas_usadas": usadas}, evento)
+        progredir()
+
+    def coletar(futuros):
+        nonlocal quebrado
+        for futuro in futuros:
+            indice = pendentes.pop(futuro)
+            try:
+                saida = futuro.result()
+                if saida_antecipada is not None:
+                    pagina_extraida(indice, *saida)
+                    continue
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool) and quebrado is None:
+                    quebrado = e
+                    _descartar_pool(pool)
+                descartar_incremental(indice)
+                falhou(indice, e)
+                continue
+            if etapas:
+                extraido(indice, *saida)
+            else:
+                # classify_oficio: o worker devolve o resultado pronto
+                concluir(indice, *saida)
+                progredir()
+
+    try:
+        for indice, pdf_bytes in enumerate(pdfs):
+            quantidade += 1
+            if buscar_no_cache(indice, pdf_bytes):
+                continue
+            if saida_antecipada is not None:
+                incrementais[indice] = {
+                    "pdf": pdf_bytes, "arquivo": _gravar_temporario(pdf_bytes), "chave": hash_pdf(pdf_bytes),
+                    "textos": [], "tempos": {},
+                }
+                pedir_pagina(indice)
+            elif not etapas:
+                submeter(indice, _classificar_no_worker, pdf_bytes)
+            else:
+                submeter(indice, _extrair_no_worker, pdf_bytes, usar_armazem, threads_ocr)
+            # Na saída antecipada um documento pode voltar a ocupar a vaga (próxima página)
+            while len(pendentes) >= limite_em_voo:
+                feitos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                coletar(feitos)
+        while pendentes:
+            feitos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+            coletar(feitos)
+    finally:
+        # Um erro fora dos arquivos (ex.: na leitura do ZIP) não deixa PDFs temporários para trás
+        for indice in list(incrementais):
+            descartar_incremental(indice)
+    inferir()
+    return [resultados[i] for i in range(quantidade)]
@@ -0,0 +1 @@
+# Presente na raiz para o pytest incluir os módulos do projeto no sys.path ao rodar tests/
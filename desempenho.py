@@ -0,0 +1,218 @@
+# desempenho.py
+#
+# Instrumentação do pipeline: cada documento classificado gera um evento
+# com o tempo total, o tempo de cada etapa, número de páginas, tamanho em
+# bytes e pico de memória (RSS) do processo. Os eventos ficam em um buffer
+# circular em memória, de tamanho fixo, lido pela aba DESEMPENHO.
+
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import deque
+
+MAX_EVENTOS = int(os.environ.get("CLASSIFICADOR_MAX_EVENTOS", "5000"))
+PERCENTIS = (50, 95, 99)
+# Quem produz as predições: o classify_oficio do modelo treinado (só o tempo total é medido)
+# ou o pipeline em etapas do pipeline.py (tempo por etapa, inferência em lote, armazém de
+# textos, saída antecipada, quase-duplicatas e servidor de inferência; requer PyMuPDF e
+# pytesseract). CLASSIFICADOR_PIPELINE_ETAPAS=1 força o pipeline em etapas e =0 o
+# classify_oficio; sem a variável, vale o selo do paridade.py.
+MODO_PIPELINE = os.environ.get("CLASSIFICADOR_PIPELINE_ETAPAS", "auto")
+LIMIAR_BLOQUEIO = 0.5
+CLASSES_BLOQUEIO = ("1", "03", "bloqueio")
+
+
+def pipeline_em_etapas(versao=None):
+    # No modo automático, o pipeline em etapas só é usado depois de conferido contra o
+    # classify_oficio para este pipeline.py e, se `versao` for dada, para este modelo
+    if MODO_PIPELINE in ("0", "1"):
+        return MODO_PIPELINE == "1"
+    from paridade import paridade_aprovada
+    return paridade_aprovada(versao)
+
+
+def pico_rss_mb():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KiB, macOS em bytes
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+def _evento(pdf_bytes, inicio, tempos, paginas):
+    return {
+        "momento": time.time(),
+        "duracao_s": time.perf_counter() - inicio,
+        "etapas_s": tempos,
+        "paginas": paginas,
+        "bytes": len(pdf_bytes),
+        "pico_rss_mb": pico_rss_mb(),
+        "pid": os.getpid()
+    }
+
+
+def indice_bloqueio(classificador):
+    # Coluna do predict_proba que é a classe bloqueio
+    classes = [str(c).lower() for c in classificador.classes_]
+    for i, classe in enumerate(classes):
+        if classe in CLASSES_BLOQUEIO:
+            return i
+    return len(classes) - 1
+
+
+class ModeloObservado:
+    """Repassa tudo ao modelo e guarda a probabilidade de bloqueio da última predição.
+
+    O classify_oficio só devolve o tpOficio; com o modelo embrulhado, a
+    probabilidade sai da mesma entrada que ele mandou ao modelo.
+    """
+
+    def __init__(self, model):
+        self._modelo = model
+        self.prob_bloqueio = None
+
+    def __getattr__(self, nome):
+        return getattr(self._modelo, nome)
+
+    def __getitem__(self, indice):
+        return self._modelo[indice]
+
+    def predict_proba(self, X):
+        probs = self._modelo.predict_proba(X)
+        self._anotar(probs)
+        return probs
+
+    def predict(self, X):
+        previsto = self._modelo.predict(X)
+        self._anotar(self._modelo.predict_proba(X))
+        return previsto
+
+    def _anotar(self, probs):
+        # Só uma predição de uma linha identifica o documento
+        self.prob_bloqueio = float(probs[0, indice_bloqueio(self._modelo)]) if len(probs) == 1 else None
+
+
+def medir_documento(pdf_bytes, model):
+    # Classificação pelo classify_oficio; devolve (resultado, evento).
+    # O classify_oficio não expõe as etapas nem o número de páginas: o evento traz só o tempo total.
+    from inference import classify_oficio
+
+    observado = ModeloObservado(model)
+    inicio = time.perf_counter()
+    resultado = classify_oficio(pdf_bytes, model=observado)
+    evento = _evento(pdf_bytes, inicio, {}, None)
+    prob = observado.prob_bloqueio
+    # Só vale se a probabilidade explica o tpOficio devolvido (senão a varredura de limiar mentiria)
+    if "prob_bloqueio" not in resultado and prob is not None \
+            and (prob >= LIMIAR_BLOQUEIO) == (resultado.get("tpOficio") == "03"):
+        resultado = {**resultado, "prob_bloqueio": prob}
+    return resultado, evento
+
+
+def medir_extracao(pdf_bytes, usar_armazem=True):
+    # Extração e limpeza de um documento; devolve (texto limpo, evento).
+    # O tempo de vetorização/inferência, feito em lote, é somado depois por ratear_lote.
+    # Import tardio: quem só lê os eventos (aba DESEMPENHO) não carrega o OCR
+    from pipeline import preparar_texto
+    from textos_extraidos import armazem_padrao
+
+    tempos = {}
+    inicio = time.perf_counter()
+    texto, paginas = preparar_texto(pdf_bytes, tempos, armazem_padrao() if usar_armazem else None)
+    return texto, _evento(pdf_bytes, inicio, tempos, paginas)
+
+
+def medir_incremental(pdf_bytes, model, margem, usar_armazem=True):
+    # Classificação com saída antecipada de um documento; devolve (resultado, evento)
+    from pipeline import classificar_incremental
+    from textos_extraidos import armazem_padrao
+
+    tempos = {}
+    inicio = time.perf_counter()
+    resultado = classificar_incremental(
+        pdf_bytes, model, margem, tempos, armazem_padrao() if usar_armazem else None
+    )
+    evento = _evento(pdf_bytes, inicio, tempos, resultado["paginas"])
+    evento["paginas_usadas"] = resultado["paginas_usadas"]
+    return resultado, evento
+
+
+def medir_pagina(caminho, chave, numero, usar_armazem=True):
+    # Extração de uma página do PDF gravado em `caminho` (saída antecipada no pool); devolve
+    # (texto, nº de páginas, tempos). A pontuação das páginas fica com quem chamou, que tem o modelo.
+    from pipeline import extrair_pagina
+    from textos_extraidos import armazem_padrao
+
+    tempos = {}
+    texto, paginas = extrair_pagina(caminho, chave, numero, tempos, armazem_padrao() if usar_armazem else None)
+    return texto, paginas, tempos
+
+
+def evento_incremental(pdf_bytes, tempos, paginas, paginas_usadas):
+    # Evento da saída antecipada no pool: as páginas são extraídas nos workers e pontuadas no
+    # processo principal, então a duração é a soma das etapas (sem a espera na fila do pool)
+    evento = _evento(pdf_bytes, time.perf_counter(), tempos, paginas)
+    evento["duracao_s"] = sum(tempos.values())
+    evento["paginas_usadas"] = paginas_usadas
+    return evento
+
+
+def ratear_lote(eventos, tempos_lote):
+    # Divide igualmente entre os documentos o tempo das etapas feitas em lote
+    if not eventos:
+        return
+    for etapa, segundos in tempos_lote.items():
+        parcela = segundos / len(eventos)
+        for evento in eventos:
+            evento["etapas_s"][etapa] = evento["etapas_s"].get(etapa, 0.0) + parcela
+            evento["duracao_s"] += parcela
+
+
+class RegistroDesempenho:
+    def __init__(self, capacidade=MAX_EVENTOS):
+        self._eventos = deque(maxlen=capacidade)
+        self._lock = threading.Lock()
+
+    def registrar(self, evento, **contexto):
+        # contexto: arquivo, origem ("CLASSIFICAR", "TESTAR MODELO", ...)
+        with self._lock:
+            self._eventos.append({**evento, **contexto})
+
+    def eventos(self):
+        with self._lock:
+            return list(self._eventos)
+
+    def limpar(self):
+        with self._lock:
+            self._eventos.clear()
+
+    def exportar_json(self):
+        return json.dumps(self.eventos(), ensure_ascii=False, indent=2)
+
+
+def percentil(valores, p):
+    # Interpolação linear entre os vizinhos mais próximos (mesmo critério do numpy)
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    base = int(posicao)
+    proximo = min(base + 1, len(ordenados) - 1)
+    return ordenados[base] + (ordenados[proximo] - ordenados[base]) * (posicao - base)
+
+
+def resumo_latencias(eventos, percentis=PERCENTIS):
+    # {"total": {"p50": ..., ...}, "extracao": {...}, ...}
+    series = {"total": [e["duracao_s"] for e in eventos]}
+    for evento in eventos:
+        for etapa, segundos in evento.get("etapas_s", {}).items():
+            series.setdefault(etapa, []).append(segundos)
+    return {
+        nome: {f"p{p}": percentil(valores, p) for p in percentis}
+        for nome, valores in series.items()
+    }
+
+
+# Registro único do processo (compartilhado entre as sessões do Streamlit)
+registro = RegistroDesempenho()
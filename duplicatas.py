@@ -0,0 +1,311 @@
+# duplicatas.py
+#
+# Índice de quase-duplicatas (MinHash + LSH) sobre o texto limpo dos ofícios.
+# Os tribunais mandam ofícios muito padronizados; o índice serve para
+# reaproveitar a classificação de um documento quase idêntico a outro já
+# classificado e para medir o vazamento entre a massa de teste e o treino.
+#
+# Cada texto vira o conjunto das suas sequências de TAMANHO_SHINGLE palavras.
+# A assinatura MinHash (NUM_PERMUTACOES mínimos) estima a similaridade de
+# Jaccard entre dois conjuntos pela fração de posições iguais. A assinatura
+# é cortada em BANDAS faixas: só documentos que coincidem em uma faixa
+# inteira viram candidatos e são comparados. As faixas ficam em uma tabela
+# SQLite indexada, então cada busca custa BANDAS consultas ao índice (log n)
+# mais um número limitado de candidatos, e não uma varredura da base.
+#
+# Uso (indexar o corpus de treino, pasta ou ZIP rotulado):
+#   python duplicatas.py indexar-treino dados_treino/
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import zlib
+
+import numpy as np
+
+PASTA_DUPLICATAS = os.environ.get("CLASSIFICADOR_CACHE_DIR", ".cache")
+INDICE_ATIVO = os.environ.get("CLASSIFICADOR_INDICE_DUPLICATAS", "1") == "1"
+# Similaridade de Jaccard estimada a partir da qual dois documentos são quase-duplicatas
+LIMIAR_DUPLICATA = float(os.environ.get("CLASSIFICADOR_LIMIAR_DUPLICATA", "0.9"))
+NUM_PERMUTACOES = 128
+# 16 faixas de 8 linhas: pares com Jaccard acima de ~0.7 quase sempre viram candidatos
+BANDAS = 16
+TAMANHO_SHINGLE = 5
+# Templates muito repetidos lotam as mesmas faixas; poucos candidatos por faixa bastam
+MAX_CANDIDATOS_POR_BANDA = 64
+
+# Hash multiplica-desloca: ((a*x + b) mod 2^64) >> 32, uma permutação por coluna
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, 2**63, size=NUM_PERMUTACOES, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2**63, size=NUM_PERMUTACOES, dtype=np.uint64)
+_BLOCO_SHINGLES = 4096
+
+
+def shingles(texto_limpo, tamanho=TAMANHO_SHINGLE):
+    # Hashes de 32 bits das sequências de `tamanho` palavras (textos curtos viram um shingle só)
+    palavras = texto_limpo.split()
+    if not palavras:
+        return np.empty(0, dtype=np.uint64)
+    passos = max(1, len(palavras) - tamanho + 1)
+    valores = {zlib.crc32(" ".join(palavras[i:i + tamanho]).encode("utf-8")) for i in range(passos)}
+    return np.fromiter(valores, dtype=np.uint64, count=len(valores))
+
+
+def assinatura_minhash(texto_limpo):
+    """Assinatura MinHash (uint32, NUM_PERMUTACOES posições) do texto limpo, ou None se vazio."""
+    valores = shingles(texto_limpo)
+    if valores.size == 0:
+        return None
+    assinatura = np.full(NUM_PERMUTACOES, np.iinfo(np.uint32).max, dtype=np.uint64)
+    # Em blocos, para documentos longos não montarem uma matriz enorme
+    for inicio in range(0, valores.size, _BLOCO_SHINGLES):
+        bloco = valores[inicio:inicio + _BLOCO_SHINGLES, None]
+        permutados = (bloco * _A + _B) >> np.uint64(32)
+        np.minimum(assinatura, permutados.min(axis=0), out=assinatura)
+    return assinatura.astype(np.uint32)
+
+
+def similaridade(assinatura_a, assinatura_b):
+    return float(np.mean(assinatura_a == assinatura_b))
+
+
+def chaves_bandas(assinatura):
+    # Uma chave inteira de 64 bits por faixa (cabe no INTEGER do SQLite)
+    linhas = NUM_PERMUTACOES // BANDAS
+    return [
+        int.from_bytes(hashlib.blake2b(assinatura[b * linhas:(b + 1) * linhas].tobytes(), digest_size=8).digest(), "big", signed=True)
+        for b in range(BANDAS)
+    ]
+
+
+def pares_duplicados(assinaturas, limiar=LIMIAR_DUPLICATA):
+    """Pares (i, j, similaridade) de quase-duplicatas dentro de uma lista de assinaturas.
+
+    Usa as mesmas faixas do índice, em memória; posições com assinatura None são ignoradas.
+    Como na busca do índice, cada documento só é comparado com os primeiros
+    MAX_CANDIDATOS_POR_BANDA de cada faixa: uma massa de ofícios do mesmo template
+    não vira uma comparação de todos contra todos.
+    """
+    baldes = {}
+    for i, assinatura in enumerate(assinaturas):
+        if assinatura is None:
+            continue
+        for banda, chave in enumerate(chaves_bandas(assinatura)):
+            baldes.setdefault((banda, chave), []).append(i)
+    candidatos = {}
+    for membros in baldes.values():
+        for posicao in range(1, len(membros)):
+            candidatos.setdefault(membros[posicao], set()).update(membros[:min(posicao, MAX_CANDIDATOS_POR_BANDA)])
+    pares = []
+    for j in sorted(candidatos):
+        anteriores = np.array(sorted(candidatos[j]))
+        valores = np.mean(np.stack([assinaturas[i] for i in anteriores]) == assinaturas[j], axis=1)
+        for i, valor in zip(anteriores[valores >= limiar], valores[valores >= limiar]):
+            pares.append((int(i), j, float(valor)))
+    pares.sort()
+    return pares
+
+
+class IndiceDuplicatas:
+    def __init__(self, pasta=PASTA_DUPLICATAS):
+        os.makedirs(pasta, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(pasta, "duplicatas.sqlite3"), timeout=60, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # A assinatura só depende do texto: trocar o modelo não invalida o índice
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documentos ("
+            " hash_pdf TEXT PRIMARY KEY,"
+            " assinatura BLOB NOT NULL,"
+            " treino INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS bandas ("
+            " banda INTEGER NOT NULL,"
+            " chave INTEGER NOT NULL,"
+            " hash_pdf TEXT NOT NULL,"
+            " PRIMARY KEY (banda, chave, hash_pdf)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def adicionar(self, hash_pdf, assinatura, treino=False):
+        # Um documento já indexado só ganha a marca de treino, se for o caso
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO documentos VALUES (?, ?, ?)"
+                " ON CONFLICT(hash_pdf) DO UPDATE SET treino = MAX(treino, excluded.treino)",
+                (hash_pdf, assinatura.tobytes(), int(treino)),
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO bandas VALUES (?, ?, ?)",
+                [(banda, chave, hash_pdf) for banda, chave in enumerate(chaves_bandas(assinatura))],
+            )
+            self._conn.commit()
+
+    def assinatura(self, hash_pdf):
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT assinatura FROM documentos WHERE hash_pdf = ?", (hash_pdf,)
+            ).fetchone()
+        return np.frombuffer(linha[0], dtype=np.uint32) if linha else None
+
+    def buscar(self, assinatura, limiar=LIMIAR_DUPLICATA, so_treino=False, excluir=None):
+        """Documento indexado mais parecido: (hash_pdf, similaridade), ou None abaixo do limiar.
+
+        `so_treino` restringe a busca ao corpus de treino; `excluir` ignora um hash
+        (o próprio documento, quando ele já está no índice).
+        """
+        filtro_treino = " AND d.treino = 1" if so_treino else ""
+        with self._lock:
+            candidatos = {}
+            for banda, chave in enumerate(chaves_bandas(assinatura)):
+                linhas = self._conn.execute(
+                    "SELECT d.hash_pdf, d.assinatura FROM bandas b JOIN documentos d ON d.hash_pdf = b.hash_pdf"
+                    f" WHERE b.banda = ? AND b.chave = ?{filtro_treino} LIMIT ?",
+                    (banda, chave, MAX_CANDIDATOS_POR_BANDA),
+                ).fetchall()
+                candidatos.update(linhas)
+        candidatos.pop(excluir, None)
+        melhor = None
+        for hash_candidato, bruto in candidatos.items():
+            valor = similaridade(assinatura, np.frombuffer(bruto, dtype=np.uint32))
+            if valor >= limiar and (melhor is None or valor > melhor[1]):
+                melhor = (hash_candidato, valor)
+        return melhor
+
+    def estatisticas(self):
+        with self._lock:
+            total, treino = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(treino), 0) FROM documentos"
+            ).fetchone()
+        return {"documentos": total, "treino": treino}
+
+
+_indice = None
+
+
+def indice_padrao():
+    # Um índice por processo; só o processo principal consulta e grava
+    global _indice
+    if not INDICE_ATIVO:
+        return None
+    if _indice is None:
+        _indice = IndiceDuplicatas()
+    return _indice
+
+
+def assinaturas_dos_pdfs(pdfs, indice):
+    """(hash_pdf, assinatura) de cada PDF, tirando do índice o que já foi assinado.
+
+    Os que faltam passam pela extração (o armazém de textos evita repetir o OCR)
+    e são acrescentados ao índice.
+    """
+    from cache_resultados import hash_pdf
+    from desempenho import medir_extracao
+
+    saida = []
+    for pdf_bytes in pdfs:
+        chave = hash_pdf(pdf_bytes)
+        assinatura = indice.assinatura(chave)
+        if assinatura is None:
+            try:
+                texto, _ = medir_extracao(pdf_bytes)
+            except Exception:
+                texto = ""
+            assinatura = assinatura_minhash(texto)
+            if assinatura is not None:
+                indice.adicionar(chave, assinatura)
+        saida.append((chave, assinatura))
+    return saida
+
+
+def verificar_vazamento(assinaturas, indice, limiar=LIMIAR_DUPLICATA):
+    """Quase-duplicatas de cada documento de teste, dentro da massa e contra o treino.
+
+    `assinaturas` é a lista de assinaturas_dos_pdfs. Devolve uma entrada por
+    documento com "duplicata_teste" (posição do par mais parecido na massa),
+    "similaridade_teste", "duplicata_treino" (hash do documento de treino) e
+    "similaridade_treino"; campos sem par ficam None.
+    """
+    vazamento = [
+        {"duplicata_teste": None, "similaridade_teste": None, "duplicata_treino": None, "similaridade_treino": None}
+        for _ in assinaturas
+    ]
+    for i, j, valor in pares_duplicados([assinatura for _, assinatura in assinaturas], limiar):
+        for origem, par in ((i, j), (j, i)):
+            atual = vazamento[origem]["similaridade_teste"]
+            if atual is None or valor > atual:
+                vazamento[origem]["duplicata_teste"] = par
+                vazamento[origem]["similaridade_teste"] = valor
+    for item, (_, assinatura) in zip(vazamento, assinaturas):
+        if assinatura is None:
+            continue
+        # O próprio documento no treino também é vazamento (similaridade 1.0)
+        encontrado = indice.buscar(assinatura, limiar, so_treino=True)
+        if encontrado is not None:
+            item["duplicata_treino"], item["similaridade_treino"] = encontrado
+    return vazamento
+
+
+def indexar_treino(pdfs, indice, workers=1, total=None):
+    # Extrai o texto do corpus de treino em paralelo e grava as assinaturas marcadas como treino
+    from cache_resultados import hash_pdf
+    from classificacao_lote import extrair_textos
+
+    hashes = []
+
+    def ler():
+        # O hash de cada PDF é guardado antes de o arquivo ir para o pool
+        for pdf_bytes in pdfs:
+            hashes.append(hash_pdf(pdf_bytes))
+            yield pdf_bytes
+
+    indexados = 0
+    for concluidos, (i, texto) in enumerate(extrair_textos(ler(), workers), start=1):
+        if isinstance(texto, Exception):
+            print(f"\nErro ao extrair {hashes[i]}: {type(texto).__name__}: {texto}", file=sys.stderr)
+            continue
+        assinatura = assinatura_minhash(texto)
+        if assinatura is not None:
+            indice.adicionar(hashes[i], assinatura, treino=True)
+            indexados += 1
+        print(f"\r{concluidos}/{total or '?'} arquivos", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    return indexados
+
+
+def main(argv=None):
+    from avaliacao import abrir_zip, ler_pdfs_do_zip, listar_arquivos_pdf_com_rotulo, listar_membros_pdf_com_rotulo
+
+    parser = argparse.ArgumentParser(description="Índice de quase-duplicatas dos ofícios.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    treino = sub.add_parser("indexar-treino", help="Acrescenta o corpus de treino (pasta ou ZIP rotulado) ao índice")
+    treino.add_argument("entrada", help="Pasta ou arquivo .zip com as subpastas rotuladas")
+    treino.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processos em paralelo")
+    args = parser.parse_args(argv)
+
+    indice = IndiceDuplicatas()
+    if os.path.isdir(args.entrada):
+        arquivos = listar_arquivos_pdf_com_rotulo(args.entrada)
+
+        def ler():
+            for arqinfo in arquivos:
+                with open(arqinfo["caminho"], "rb") as f:
+                    yield f.read()
+
+        indexados = indexar_treino(ler(), indice, args.workers, len(arquivos))
+    else:
+        with abrir_zip(args.entrada) as zip_ref:
+            arquivos = listar_membros_pdf_com_rotulo(zip_ref)
+            indexados = indexar_treino(ler_pdfs_do_zip(zip_ref, arquivos), indice, args.workers, len(arquivos))
+    print(f"{indexados} documentos de treino indexados; índice com {indice.estatisticas()['documentos']} documentos.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
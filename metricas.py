@@ -0,0 +1,129 @@
+# metricas.py
+#
+# Métricas de classificação em NumPy. A matriz de confusão é montada uma
+# única vez e todas as métricas saem dela (mesmas chaves de "resultados" do
+# relatorio_experimentos.json). Classe positiva é bloqueio (1), negativa é
+# não bloqueio (0).
+#
+# Intervalos de confiança:
+#   - Wilson, para as métricas que são proporções (todas menos o F1);
+#   - bootstrap, para todas. Reamostrar n predições com reposição equivale a
+#     sortear as contagens das 4 células da matriz de uma multinomial, então
+#     10 mil reamostras custam o mesmo para 100 ou 100 mil predições.
+
+import numpy as np
+
+METRICAS = ("sensibilidade", "especificidade", "precisao", "acuracia", "f1score")
+CONFIANCA = 0.95
+REAMOSTRAS_BOOTSTRAP = 10_000
+
+
+def matriz_confusao(y_true, y_pred):
+    # [[VN, FP], [FN, VP]] (linhas: esperado, colunas: predito)
+    y_true = np.asarray(y_true, dtype=np.int64)
+    y_pred = np.asarray(y_pred, dtype=np.int64)
+    return np.bincount(2 * y_true + y_pred, minlength=4).reshape(2, 2)
+
+
+def _dividir(numerador, denominador):
+    # Divisão sem aviso: denominador zero vale 0 (como o zero_division do sklearn)
+    numerador = np.asarray(numerador, dtype=np.float64)
+    denominador = np.asarray(denominador, dtype=np.float64)
+    return np.divide(numerador, denominador, out=np.zeros(np.broadcast(numerador, denominador).shape), where=denominador > 0)
+
+
+def metricas_das_contagens(vn, fp, fn, vp):
+    # Aceita escalares ou arrays (uma reamostra por posição)
+    sensibilidade = _dividir(vp, vp + fn)
+    precisao = _dividir(vp, vp + fp)
+    return {
+        "sensibilidade": sensibilidade,
+        "especificidade": _dividir(vn, vn + fp),
+        "precisao": precisao,
+        "acuracia": _dividir(vp + vn, vp + vn + fp + fn),
+        "f1score": _dividir(2 * vp, 2 * vp + fp + fn),
+    }
+
+
+def calcular_metricas(y_true, y_pred):
+    (vn, fp), (fn, vp) = matriz_confusao(y_true, y_pred)
+    return {nome: float(valor) for nome, valor in metricas_das_contagens(vn, fp, fn, vp).items()}
+
+
+def _z(confianca):
+    from statistics import NormalDist
+    return NormalDist().inv_cdf(0.5 + confianca / 2)
+
+
+def intervalos_wilson(y_true, y_pred, confianca=CONFIANCA):
+    # Intervalo de Wilson para cada métrica que é uma proporção
+    (vn, fp), (fn, vp) = matriz_confusao(y_true, y_pred)
+    proporcoes = {
+        "sensibilidade": (vp, vp + fn),
+        "especificidade": (vn, vn + fp),
+        "precisao": (vp, vp + fp),
+        "acuracia": (vp + vn, vp + vn + fp + fn),
+    }
+    z = _z(confianca)
+    intervalos = {}
+    for nome, (acertos, n) in proporcoes.items():
+        if n == 0:
+            intervalos[nome] = (0.0, 0.0)
+            continue
+        p = acertos / n
+        centro = (p + z * z / (2 * n)) / (1 + z * z / n)
+        margem = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+        intervalos[nome] = (float(centro - margem), float(centro + margem))
+    return intervalos
+
+
+def intervalos_bootstrap(y_true, y_pred, n_reamostras=REAMOSTRAS_BOOTSTRAP, confianca=CONFIANCA, semente=0):
+    # Intervalo percentil de cada métrica sobre reamostras da matriz de confusão
+    contagens = matriz_confusao(y_true, y_pred).ravel()
+    n = int(contagens.sum())
+    if n == 0:
+        return {nome: (0.0, 0.0) for nome in METRICAS}
+    rng = np.random.default_rng(semente)
+    reamostras = rng.multinomial(n, contagens / n, size=n_reamostras)
+    valores = metricas_das_contagens(*reamostras.T)
+    alfa = (1 - confianca) / 2
+    return {
+        nome: tuple(float(v) for v in np.quantile(valores[nome], [alfa, 1 - alfa]))
+        for nome in METRICAS
+    }
+
+
+def varrer_limiares(y_true, probs):
+    """Métricas em todos os limiares de decisão possíveis, em uma passada vetorizada.
+
+    Um documento é predito bloqueio quando prob >= limiar. Os limiares são os
+    valores distintos de `probs` em ordem decrescente, precedidos de +inf
+    (nenhum bloqueio predito). Devolve arrays alinhados: "limiar", as
+    métricas de METRICAS, "taxa_falsos_positivos" (eixo x da curva ROC) e
+    "auc_roc"/"precisao_media" como escalares.
+    """
+    y = np.asarray(y_true, dtype=np.int64)
+    p = np.asarray(probs, dtype=np.float64)
+    ordem = np.argsort(-p, kind="mergesort")
+    p_ordenado, y_ordenado = p[ordem], y[ordem]
+    # Último índice de cada valor distinto: todos os empatados entram juntos
+    fim = np.r_[np.flatnonzero(np.diff(p_ordenado)), len(p_ordenado) - 1].astype(np.int64)
+    vp = np.r_[0, np.cumsum(y_ordenado)[fim]]
+    fp = np.r_[0, np.cumsum(1 - y_ordenado)[fim]]
+    positivos = int(y.sum())
+    negativos = len(y) - positivos
+    varredura = {
+        "limiar": np.r_[np.inf, p_ordenado[fim]],
+        **metricas_das_contagens(negativos - fp, fp, positivos - vp, vp),
+        "taxa_falsos_positivos": _dividir(fp, negativos),
+    }
+    tfp, sens, prec = varredura["taxa_falsos_positivos"], varredura["sensibilidade"], varredura["precisao"]
+    varredura["auc_roc"] = float(np.sum(np.diff(tfp) * (sens[1:] + sens[:-1]) / 2))
+    varredura["precisao_media"] = float(np.sum(np.diff(sens) * prec[1:]))
+    return varredura
+
+
+def metricas_no_limiar(varredura, limiar):
+    # Ponto de operação: o menor limiar da varredura que ainda é >= `limiar`
+    indice = int(np.searchsorted(-varredura["limiar"], -limiar, side="right")) - 1
+    return {nome: float(varredura[nome][indice]) for nome in METRICAS + ("taxa_falsos_positivos",)}
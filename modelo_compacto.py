@@ -0,0 +1,326 @@
+# modelo_compacto.py
+#
+# Formato compacto do modelo (TF-IDF + XGBoost) em buffers numéricos planos,
+# mapeados em memória (np.load(mmap_mode="r") / np.memmap). Várias réplicas do
+# Streamlit no mesmo host compartilham as páginas pelo cache do sistema
+# operacional e o carregamento não desserializa nada além do manifesto.
+# O vocabulário também é consultado direto nos arquivos mapeados (hash do termo
+# em um array ordenado, conferido contra os bytes do termo): nenhum processo
+# monta o dict termo -> coluna. Cada processo guarda só as últimas
+# TERMOS_EM_MEMORIA consultas.
+#
+# Conteúdo da pasta exportada:
+#   manifesto.json            parâmetros do TfidfVectorizer, classes, base_score, versão
+#   vocabulario.bin           termos em UTF-8, concatenados na ordem das colunas
+#   vocabulario_offsets.npy   início de cada termo em vocabulario.bin (int64, n+1)
+#   vocabulario_hash.npy      CRC32 dos termos, em ordem crescente (uint32)
+#   vocabulario_coluna.npy    coluna do termo de cada posição de vocabulario_hash.npy (int64)
+#   idf.npy                   pesos IDF (float64)
+#   arvore_*.npy              nós de todas as árvores, concatenados
+#
+# Uso:
+#   python modelo_compacto.py exportar modelo_compacto/
+#   CLASSIFICADOR_MODELO_COMPACTO=modelo_compacto/ streamlit run app_v4.py
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import random
+import sys
+import zlib
+from collections.abc import Mapping
+from functools import lru_cache
+
+import numpy as np
+
+VERSAO_FORMATO = 3
+# Consultas ao vocabulário lembradas por processo (os termos de um ofício se repetem muito)
+TERMOS_EM_MEMORIA = int(os.environ.get("CLASSIFICADOR_TERMOS_EM_MEMORIA", "200000"))
+PASTA_MODELO_COMPACTO = os.environ.get("CLASSIFICADOR_MODELO_COMPACTO")
+PARAMETROS_TFIDF = (
+    "lowercase", "strip_accents", "analyzer", "token_pattern", "ngram_range",
+    "stop_words", "norm", "use_idf", "smooth_idf", "sublinear_tf", "binary", "dtype",
+)
+
+# expf/logf da biblioteca C, as mesmas que o XGBoost usa: o np.exp/np.log em float32
+# do NumPy diverge em 1 ulp em parte dos valores e a verificação byte a byte falha
+_LIBM = ctypes.CDLL(ctypes.util.find_library("m") or ctypes.util.find_library("ucrtbase"))
+for _nome in ("expf", "logf"):
+    getattr(_LIBM, _nome).restype = ctypes.c_float
+    getattr(_LIBM, _nome).argtypes = [ctypes.c_float]
+
+
+def _sigmoide_xgboost(margem):
+    # Mesma conta do Sigmoid do XGBoost (common/math.h): 1 / (expf(min(-x, 88.7f)) + 1), em float32
+    expoente = np.minimum(-margem, np.float32(88.7))
+    e = np.fromiter((_LIBM.expf(float(x)) for x in expoente), dtype=np.float32, count=len(expoente))
+    return np.float32(1.0) / (e + np.float32(1.0))
+
+
+def _logit_base_score(base_score):
+    # ProbToMargin do XGBoost: -logf(1.0f / base_score - 1.0f), em float32
+    base_score = np.float32(base_score)
+    return -_LIBM.logf(float(np.float32(1.0) / base_score - np.float32(1.0)))
+
+
+class VocabularioMapeado(Mapping):
+    """Termo -> coluna do TF-IDF, consultado nos arquivos mapeados em memória.
+
+    Usado como vocabulary_ do TfidfVectorizer, que só precisa de
+    vocabulario[termo] (KeyError fora do vocabulário) e de len().
+    """
+
+    def __init__(self, termos, offsets, hashes, colunas):
+        self._termos = termos
+        self._offsets = offsets
+        self._hashes = hashes
+        self._colunas = colunas
+        self._procurar = lru_cache(maxsize=TERMOS_EM_MEMORIA)(self._procurar_nos_arquivos)
+
+    def _termo(self, coluna):
+        return self._termos[self._offsets[coluna]:self._offsets[coluna + 1]].tobytes()
+
+    def _procurar_nos_arquivos(self, termo):
+        bruto = termo.encode("utf-8")
+        chave = zlib.crc32(bruto)
+        # Termos diferentes podem ter o mesmo CRC32: confere os bytes de cada candidato
+        posicao = int(np.searchsorted(self._hashes, chave))
+        while posicao < len(self._hashes) and self._hashes[posicao] == chave:
+            coluna = int(self._colunas[posicao])
+            if self._termo(coluna) == bruto:
+                return coluna
+            posicao += 1
+        return None
+
+    def __getitem__(self, termo):
+        coluna = self._procurar(termo)
+        if coluna is None:
+            raise KeyError(termo)
+        return coluna
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __iter__(self):
+        return (self._termo(coluna).decode("utf-8") for coluna in range(len(self)))
+
+
+class ClassificadorCompacto:
+    # Reproduz o predict_proba do XGBClassifier (objetivo binary:logistic)
+    # percorrendo as árvores a partir dos arrays mapeados em memória
+
+    def __init__(self, arvores, base_margin, classes):
+        self.esquerda = arvores["esquerda"]
+        self.direita = arvores["direita"]
+        self.atributo = arvores["atributo"]
+        self.limiar = arvores["limiar"]
+        self.padrao_esquerda = arvores["padrao_esquerda"]
+        self.inicio = arvores["inicio"]
+        self.base_margin = np.float32(base_margin)
+        self.classes_ = np.asarray(classes)
+
+    def _margem(self, X):
+        # O XGBoost trata entradas ausentes da matriz esparsa como "missing"
+        X = X.tocsr()
+        n = X.shape[0]
+        denso = np.full(X.shape, np.nan, dtype=np.float32)
+        linhas = np.repeat(np.arange(n), np.diff(X.indptr))
+        denso[linhas, X.indices] = X.data.astype(np.float32)
+
+        margem = np.full(n, self.base_margin, dtype=np.float32)
+        docs = np.arange(n)
+        for inicio in self.inicio[:-1]:
+            no = np.full(n, inicio, dtype=np.int64)
+            ativos = self.esquerda[no] != -1
+            while ativos.any():
+                atual = no[ativos]
+                valor = denso[docs[ativos], self.atributo[atual]]
+                vai_esquerda = np.where(np.isnan(valor), self.padrao_esquerda[atual] == 1, valor < self.limiar[atual])
+                no[ativos] = inicio + np.where(vai_esquerda, self.esquerda[atual], self.direita[atual])
+                ativos = self.esquerda[no] != -1
+            # Nas folhas o XGBoost guarda o valor da folha em split_conditions
+            margem += self.limiar[no]
+        return margem
+
+    def predict_proba(self, X):
+        prob = _sigmoide_xgboost(self._margem(X))
+        return np.vstack((np.float32(1.0) - prob, prob)).T
+
+    def predict(self, X):
+        return self.classes_[(self.predict_proba(X)[:, 1] > 0.5).astype(int)]
+
+
+class ModeloCompacto:
+    def __init__(self, vetorizador, classificador, versao):
+        self.vetorizador = vetorizador
+        self.classificador = classificador
+        self.versao = versao
+
+
+def _separar_tfidf_xgboost(model):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    if not hasattr(model, "steps") or len(model.steps) != 2:
+        raise ValueError("Formato compacto só suporta o Pipeline [TfidfVectorizer, XGBClassifier].")
+    vetorizador, classificador = model.steps[0][1], model.steps[1][1]
+    if not isinstance(vetorizador, TfidfVectorizer) or not hasattr(classificador, "get_booster"):
+        raise ValueError("Formato compacto só suporta o Pipeline [TfidfVectorizer, XGBClassifier].")
+    return vetorizador, classificador
+
+
+def _base_score(learner):
+    valor = learner["learner_model_param"]["base_score"]
+    return float(str(valor).strip("[]"))
+
+
+def exportar(model, pasta):
+    from cache_resultados import versao_modelo
+
+    vetorizador, classificador = _separar_tfidf_xgboost(model)
+    modelo_json = json.loads(classificador.get_booster().save_raw(raw_format="json"))
+    learner = modelo_json["learner"]
+    objetivo = learner["objective"]["name"]
+    if objetivo != "binary:logistic":
+        raise ValueError(f"Objetivo {objetivo} não suportado pelo formato compacto.")
+
+    os.makedirs(pasta, exist_ok=True)
+    termos = [None] * len(vetorizador.vocabulary_)
+    for termo, coluna in vetorizador.vocabulary_.items():
+        termos[coluna] = termo.encode("utf-8")
+    offsets = np.zeros(len(termos) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(t) for t in termos])
+    with open(os.path.join(pasta, "vocabulario.bin"), "wb") as f:
+        f.write(b"".join(termos))
+    np.save(os.path.join(pasta, "vocabulario_offsets.npy"), offsets)
+    hashes = np.fromiter((zlib.crc32(t) for t in termos), dtype=np.uint32, count=len(termos))
+    ordem = np.argsort(hashes, kind="stable")
+    np.save(os.path.join(pasta, "vocabulario_hash.npy"), hashes[ordem])
+    np.save(os.path.join(pasta, "vocabulario_coluna.npy"), ordem.astype(np.int64))
+    np.save(os.path.join(pasta, "idf.npy"), np.asarray(vetorizador.idf_, dtype=np.float64))
+
+    # Índices de filhos ficam relativos ao início de cada árvore
+    arvores = learner["gradient_booster"]["model"]["trees"]
+    inicio = np.zeros(len(arvores) + 1, dtype=np.int64)
+    inicio[1:] = np.cumsum([len(a["left_children"]) for a in arvores])
+    colunas = {
+        "esquerda": ("left_children", np.int32),
+        "direita": ("right_children", np.int32),
+        "atributo": ("split_indices", np.int32),
+        "limiar": ("split_conditions", np.float32),
+        "padrao_esquerda": ("default_left", np.uint8),
+    }
+    for nome, (chave, dtype) in colunas.items():
+        valores = np.concatenate([np.asarray(a[chave], dtype=dtype) for a in arvores])
+        np.save(os.path.join(pasta, f"arvore_{nome}.npy"), valores)
+    np.save(os.path.join(pasta, "arvore_inicio.npy"), inicio)
+
+    base_score = _base_score(learner)
+    parametros = {p: getattr(vetorizador, p) for p in PARAMETROS_TFIDF}
+    parametros["dtype"] = np.dtype(parametros["dtype"]).name
+    if parametros["stop_words"] is not None and not isinstance(parametros["stop_words"], str):
+        parametros["stop_words"] = sorted(parametros["stop_words"])
+    manifesto = {
+        "versao_formato": VERSAO_FORMATO,
+        "versao": versao_modelo(model),
+        "tfidf": parametros,
+        "classes": [c.item() if hasattr(c, "item") else c for c in classificador.classes_],
+        # base_score é uma probabilidade; a margem inicial é o logit dela, calculado em float32
+        "base_margin": _logit_base_score(base_score),
+    }
+    with open(os.path.join(pasta, "manifesto.json"), "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+
+
+def carregar_modelo_compacto(pasta):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    with open(os.path.join(pasta, "manifesto.json"), "r", encoding="utf-8") as f:
+        manifesto = json.load(f)
+    if manifesto["versao_formato"] != VERSAO_FORMATO:
+        raise ValueError(f"Versão do formato compacto não suportada: {manifesto['versao_formato']}")
+
+    vocabulario = VocabularioMapeado(
+        np.memmap(os.path.join(pasta, "vocabulario.bin"), dtype=np.uint8, mode="r"),
+        *(np.load(os.path.join(pasta, f"vocabulario_{nome}.npy"), mmap_mode="r")
+          for nome in ("offsets", "hash", "coluna")),
+    )
+    parametros = dict(manifesto["tfidf"])
+    parametros["ngram_range"] = tuple(parametros["ngram_range"])
+    parametros["dtype"] = np.dtype(parametros["dtype"])
+    # vocabulary_ atribuído direto (e não pelo construtor): o construtor valida percorrendo o vocabulário inteiro
+    vetorizador = TfidfVectorizer(**parametros)
+    vetorizador.vocabulary_ = vocabulario
+    vetorizador.fixed_vocabulary_ = True
+    vetorizador.idf_ = np.load(os.path.join(pasta, "idf.npy"), mmap_mode="r")
+
+    arvores = {
+        nome: np.load(os.path.join(pasta, f"arvore_{nome}.npy"), mmap_mode="r")
+        for nome in ("esquerda", "direita", "atributo", "limiar", "padrao_esquerda", "inicio")
+    }
+    classificador = ClassificadorCompacto(arvores, manifesto["base_margin"], manifesto["classes"])
+    return ModeloCompacto(vetorizador, classificador, manifesto["versao"])
+
+
+def carregar_modelo():
+    # Ponto único de carga do modelo: formato compacto se configurado, senão o artefato original.
+    # O compacto não tem classify_oficio: só serve ao pipeline em etapas, e a escolha do pipeline
+    # usa a versão do artefato original gravada no manifesto (a mesma do selo do paridade.py).
+    from desempenho import pipeline_em_etapas
+
+    if PASTA_MODELO_COMPACTO:
+        with open(os.path.join(PASTA_MODELO_COMPACTO, "manifesto.json"), "r", encoding="utf-8") as f:
+            versao = json.load(f)["versao"]
+        if pipeline_em_etapas(versao):
+            return carregar_modelo_compacto(PASTA_MODELO_COMPACTO)
+        print("CLASSIFICADOR_MODELO_COMPACTO ignorado: o formato compacto exige o pipeline em etapas "
+              "(ver paridade.py).", file=sys.stderr)
+    from inference import load_model
+    return load_model()
+
+
+def textos_de_verificacao(vetorizador, quantidade=2000, semente=42):
+    # Textos sintéticos montados com o próprio vocabulário, para cobrir os atributos
+    rng = random.Random(semente)
+    termos = sorted(vetorizador.vocabulary_)
+    return [" ".join(rng.choices(termos, k=rng.randint(5, 300))) for _ in range(quantidade)]
+
+
+def verificar(model, compacto, textos):
+    # Compara byte a byte as probabilidades do artefato original e do compacto
+    esperado = model.predict_proba(textos).astype(np.float32)
+    X = compacto.vetorizador.transform(textos)
+    obtido = compacto.classificador.predict_proba(X)
+    return {
+        "documentos": len(textos),
+        "identico": esperado.tobytes() == obtido.tobytes(),
+        "diferenca_maxima": float(np.max(np.abs(esperado - obtido))) if len(textos) else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta o modelo para o formato compacto mapeado em memória.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    exp = sub.add_parser("exportar", help="Converte o artefato de load_model() e verifica as predições")
+    exp.add_argument("pasta", help="Pasta de saída")
+    exp.add_argument("--textos", help="Arquivo com um texto limpo por linha para a verificação")
+    args = parser.parse_args(argv)
+
+    from inference import load_model
+
+    model = load_model()
+    exportar(model, args.pasta)
+    compacto = carregar_modelo_compacto(args.pasta)
+    if args.textos:
+        with open(args.textos, "r", encoding="utf-8") as f:
+            textos = [linha.rstrip("\n") for linha in f]
+    else:
+        textos = textos_de_verificacao(compacto.vetorizador)
+    relatorio = verificar(model, compacto, textos)
+    print(json.dumps(relatorio, indent=2))
+    return 0 if relatorio["identico"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
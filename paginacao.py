@@ -0,0 +1,19 @@
+# paginacao.py
+#
+# Paginação das tabelas dos relatórios, compartilhada pelo streamlit_app.py
+# e pela aba RELATÓRIOS do app_v4.py. As consultas ao registro de
+# experimentos trazem só a página escolhida (LIMIT/OFFSET).
+
+import streamlit as st
+
+
+def escolher_pagina(total, tamanho, key):
+    # Número da página (a partir de 0) escolhido pelo usuário; some quando cabe tudo numa página
+    paginas = max(1, -(-total // tamanho))
+    if paginas == 1:
+        return 0
+    if st.session_state.get(key, 1) > paginas:
+        # Os filtros mudaram e a página guardada não existe mais
+        st.session_state[key] = 1
+    pagina = st.number_input(f"Página (de {paginas}, {total} itens)", min_value=1, max_value=paginas, value=1, key=key)
+    return pagina - 1
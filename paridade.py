@@ -0,0 +1,141 @@
+# paridade.py
+#
+# Selo de paridade do pipeline em etapas. O pipeline.py reimplementa o
+# pré-processamento do classify_oficio; antes de virar o padrão, ele precisa
+# dar o mesmo tpOficio que o classify_oficio em uma massa rotulada. O
+# "verificar" roda os dois caminhos de produção do classificar_lote sobre a
+# massa e grava o selo em .cache/paridade_pipeline.json. O selo vale só para
+# a versão do modelo e do pipeline.py conferidos: trocar qualquer um dos dois
+# volta para o classify_oficio até nova verificação.
+#
+# Exemplo:
+#   python paridade.py verificar massa_rotulada.zip
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+
+from cache_resultados import PASTA_CACHE
+
+CAMINHO_SELO = os.path.join(PASTA_CACHE, "paridade_pipeline.json")
+# Massas menores que isso não aprovam o pipeline, mesmo sem divergências
+MINIMO_DOCUMENTOS = int(os.environ.get("CLASSIFICADOR_PARIDADE_MINIMO", "200"))
+
+
+@functools.lru_cache(maxsize=None)
+def versao_pipeline():
+    # Hash do código do pipeline.py: qualquer mudança nele exige nova verificação
+    caminho = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pipeline.py")
+    with open(caminho, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def ler_selo(caminho=CAMINHO_SELO):
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def paridade_aprovada(versao=None, caminho=CAMINHO_SELO):
+    # Sem `versao`, basta o selo valer para o pipeline.py atual (decisões tomadas antes de carregar o modelo)
+    selo = ler_selo(caminho)
+    if selo is None or not selo.get("aprovado") or selo.get("versao_pipeline") != versao_pipeline():
+        return False
+    return versao is None or selo.get("versao_modelo") == versao
+
+
+def _ler_pdfs_da_pasta(arquivos):
+    for arqinfo in arquivos:
+        with open(arqinfo["caminho"], "rb") as f:
+            yield f.read()
+
+
+def _tipo(resultado):
+    return "erro" if "erro" in resultado else resultado["tpOficio"]
+
+
+def comparar(arquivos, oficio, etapas):
+    # Divergências de tpOficio (um caminho com erro e o outro sem também conta) e acertos de cada caminho
+    divergencias = [
+        {"arquivo": a["arquivo"], "caminho": a["caminho"], "classify_oficio": _tipo(o), "etapas": _tipo(e)}
+        for a, o, e in zip(arquivos, oficio, etapas)
+        if _tipo(o) != _tipo(e)
+    ]
+    return {
+        "documentos": len(arquivos),
+        "divergencias": divergencias,
+        "acertos_classify_oficio": sum(_tipo(o) == a["tpOficio"] for a, o in zip(arquivos, oficio)),
+        "acertos_etapas": sum(_tipo(e) == a["tpOficio"] for a, e in zip(arquivos, etapas)),
+    }
+
+
+def verificar(entrada, workers=None, minimo=MINIMO_DOCUMENTOS, caminho=CAMINHO_SELO):
+    from avaliacao import abrir_zip, ler_pdfs_do_zip, listar_arquivos_pdf_com_rotulo, listar_membros_pdf_com_rotulo
+    from cache_resultados import versao_modelo
+    from classificacao_lote import classificar_lote
+    from inference import load_model
+
+    # O artefato original, o mesmo que os workers do classify_oficio carregam
+    modelo = load_model()
+    resultados = {}
+    for nome, etapas in (("classify_oficio", False), ("etapas", True)):
+        # Sem cache nem armazém: os dois caminhos extraem e classificam cada PDF do zero
+        if os.path.isdir(entrada):
+            arquivos = listar_arquivos_pdf_com_rotulo(entrada)
+            resultados[nome] = classificar_lote(
+                _ler_pdfs_da_pasta(arquivos), model=modelo, max_workers=workers, total=len(arquivos),
+                usar_armazem=False, etapas=etapas
+            )
+        else:
+            with abrir_zip(entrada) as zip_ref:
+                arquivos = listar_membros_pdf_com_rotulo(zip_ref)
+                resultados[nome] = classificar_lote(
+                    ler_pdfs_do_zip(zip_ref, arquivos), model=modelo, max_workers=workers, total=len(arquivos),
+                    usar_armazem=False, etapas=etapas
+                )
+
+    relatorio = comparar(arquivos, resultados["classify_oficio"], resultados["etapas"])
+    selo = {
+        "versao_modelo": versao_modelo(modelo),
+        "versao_pipeline": versao_pipeline(),
+        **relatorio,
+        "aprovado": relatorio["documentos"] >= minimo and not relatorio["divergencias"],
+        "entrada": os.path.abspath(entrada),
+        "data": datetime.now().isoformat(timespec="seconds"),
+    }
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(selo, f, indent=2, ensure_ascii=False)
+    return selo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Confere o pipeline em etapas contra o classify_oficio.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_verificar = sub.add_parser("verificar", help="Roda os dois caminhos sobre uma massa rotulada e grava o selo")
+    p_verificar.add_argument("entrada", help="Pasta ou arquivo .zip com as subpastas rotuladas")
+    p_verificar.add_argument("--workers", type=int, default=None, help="Processos em paralelo (padrão: todos os núcleos)")
+    p_verificar.add_argument("--minimo", type=int, default=MINIMO_DOCUMENTOS, help="Documentos mínimos para aprovar")
+    args = parser.parse_args(argv)
+
+    selo = verificar(args.entrada, workers=args.workers, minimo=args.minimo)
+    for divergencia in selo["divergencias"]:
+        print(f"DIVERGÊNCIA {divergencia['caminho']}: classify_oficio={divergencia['classify_oficio']} "
+              f"etapas={divergencia['etapas']}", file=sys.stderr)
+    documentos = selo["documentos"]
+    print(f"{documentos} documentos, {len(selo['divergencias'])} divergências; acertos: "
+          f"classify_oficio {selo['acertos_classify_oficio']}, etapas {selo['acertos_etapas']}", file=sys.stderr)
+    if documentos < args.minimo:
+        print(f"Massa com menos de {args.minimo} documentos: pipeline não aprovado.", file=sys.stderr)
+    print(f"Selo gravado em {CAMINHO_SELO} ({'aprovado' if selo['aprovado'] else 'reprovado'})", file=sys.stderr)
+    return 0 if selo["aprovado"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
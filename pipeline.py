@@ -0,0 +1,276 @@
+# pipeline.py
+#
+# O classify_oficio dividido em etapas, na ordem descrita no relatório:
+# extração do texto (camada de texto do PDF ou OCR da página renderizada),
+# limpeza e normalização, vetorização TF-IDF e inferência do XGBoost.
+# Separar as etapas permite medir cada uma e reaproveitá-las em lote.
+#
+# O modelo de load_model() é o Pipeline do scikit-learn do treino
+# ("tfidf" + classificador); também são aceitos o ModeloCompacto e uma
+# tupla (vetorizador, classificador).
+
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import fitz  # PyMuPDF
+import pytesseract
+from PIL import Image
+
+from cache_resultados import hash_pdf
+from desempenho import LIMIAR_BLOQUEIO, indice_bloqueio
+
+ETAPAS = ("extracao", "limpeza", "vetorizacao", "inferencia")
+DPI_OCR = 300
+IDIOMA_OCR = "por"
+# Saída antecipada: para quando |prob_bloqueio - LIMIAR_BLOQUEIO| alcança a margem
+MARGEM_SAIDA_ANTECIPADA = 0.35
+# OCR das páginas de um mesmo documento em paralelo (o tesseract roda fora do GIL).
+# O limite de páginas rasterizadas em voo controla a memória de PDFs grandes.
+OCR_THREADS = int(os.environ.get("CLASSIFICADOR_OCR_THREADS", str(min(4, os.cpu_count() or 1))))
+MAX_PAGINAS_RASTERIZADAS = int(os.environ.get("CLASSIFICADOR_MAX_PAGINAS_RASTERIZADAS", str(2 * OCR_THREADS)))
+
+
+@contextmanager
+def cronometrar(etapa, tempos):
+    # Acumula em tempos[etapa] os segundos gastos dentro do bloco
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tempos[etapa] = tempos.get(etapa, 0.0) + time.perf_counter() - inicio
+
+
+def abrir_pdf(pdf_bytes):
+    return fitz.open(stream=pdf_bytes, filetype="pdf")
+
+
+def renderizar_pagina(pagina, dpi=DPI_OCR):
+    pix = pagina.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    return Image.frombytes("L", (pix.width, pix.height), pix.samples)
+
+
+def ocr_imagem(imagem, idioma=IDIOMA_OCR):
+    return pytesseract.image_to_string(imagem, lang=idioma)
+
+
+def configurar_ocr(threads):
+    # Usado pelos workers do pool de documentos, para não multiplicar threads por processos.
+    # CLASSIFICADOR_OCR_THREADS, se definido, continua sendo o teto
+    global OCR_THREADS, MAX_PAGINAS_RASTERIZADAS
+    if os.environ.get("CLASSIFICADOR_OCR_THREADS"):
+        threads = min(threads, int(os.environ["CLASSIFICADOR_OCR_THREADS"]))
+    OCR_THREADS = max(1, threads)
+    MAX_PAGINAS_RASTERIZADAS = 2 * OCR_THREADS
+
+
+def extrair_texto_pagina(pagina, dpi=DPI_OCR, idioma=IDIOMA_OCR):
+    # Páginas com camada de texto dispensam o OCR
+    texto = pagina.get_text()
+    if texto.strip():
+        return texto
+    return ocr_imagem(renderizar_pagina(pagina, dpi), idioma)
+
+
+def _extrair_paginas_documento(doc, dpi, idioma, conhecidas=None):
+    # `conhecidas`: {número: texto} de páginas já extraídas (armazém), que não são lidas de novo
+    conhecidas = {} if conhecidas is None else conhecidas
+    if OCR_THREADS <= 1:
+        return [
+            conhecidas[numero] if numero in conhecidas else extrair_texto_pagina(pagina, dpi, idioma)
+            for numero, pagina in enumerate(doc)
+        ]
+    # O PyMuPDF não é thread-safe: leitura e renderização ficam nesta thread,
+    # só o OCR das imagens vai para o pool. O texto volta na ordem das páginas,
+    # idêntico ao da extração serial.
+    textos = [None] * len(doc)
+    em_voo = {}
+
+    def coletar(futuros):
+        for futuro in futuros:
+            textos[em_voo.pop(futuro)] = futuro.result()
+
+    with ThreadPoolExecutor(max_workers=OCR_THREADS) as executor:
+        for numero, pagina in enumerate(doc):
+            if numero in conhecidas:
+                textos[numero] = conhecidas[numero]
+                continue
+            texto = pagina.get_text()
+            if texto.strip():
+                textos[numero] = texto
+                continue
+            while len(em_voo) >= MAX_PAGINAS_RASTERIZADAS:
+                feitos, _ = wait(em_voo, return_when=FIRST_COMPLETED)
+                coletar(feitos)
+            em_voo[executor.submit(ocr_imagem, renderizar_pagina(pagina, dpi), idioma)] = numero
+        coletar(list(em_voo))
+    return textos
+
+
+_versao_tesseract = None
+
+
+def config_extracao(dpi=DPI_OCR, idioma=IDIOMA_OCR):
+    # Identifica motor e parâmetros da extração (chave do armazém de textos)
+    global _versao_tesseract
+    if _versao_tesseract is None:
+        _versao_tesseract = str(pytesseract.get_tesseract_version())
+    return f"pymupdf-{fitz.VersionBind}+tesseract-{_versao_tesseract}:dpi={dpi}:lang={idioma}"
+
+
+def extrair_paginas(pdf_bytes, dpi=DPI_OCR, idioma=IDIOMA_OCR, armazem=None):
+    # Com `armazem` (ArmazemTextos), páginas já extraídas não passam de novo pelo OCR
+    conhecidas = None
+    if armazem is not None:
+        chave, config = hash_pdf(pdf_bytes), config_extracao(dpi, idioma)
+        paginas = armazem.obter_documento(chave, config)
+        if paginas is not None:
+            return paginas
+        # Documento lido só em parte (saída antecipada): extrai apenas as páginas que faltam
+        conhecidas = armazem.obter_paginas(chave, config)
+    with abrir_pdf(pdf_bytes) as doc:
+        paginas = _extrair_paginas_documento(doc, dpi, idioma, conhecidas)
+    if armazem is not None:
+        armazem.guardar_documento(chave, config, paginas)
+    return paginas
+
+
+def limpar_texto(texto):
+    # Minúsculas, sem acentos, só letras/dígitos e espaços simples
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^a-z0-9\s]", " ", texto)
+    return re.sub(r"\s+", " ", texto).strip()
+
+
+def separar_modelo(model):
+    if hasattr(model, "vetorizador"):  # ModeloCompacto (modelo_compacto.py)
+        return model.vetorizador, model.classificador
+    if hasattr(model, "steps"):
+        return model[:-1], model[-1]
+    vetorizador, classificador = model
+    return vetorizador, classificador
+
+
+def vetorizar(textos_limpos, model):
+    vetorizador, _ = separar_modelo(model)
+    return vetorizador.transform(textos_limpos)
+
+
+def prever_probabilidades(X, model):
+    # Probabilidade de bloqueio de cada linha da matriz X
+    _, classificador = separar_modelo(model)
+    return classificador.predict_proba(X)[:, indice_bloqueio(classificador)]
+
+
+def tp_oficio(prob_bloqueio, limiar=LIMIAR_BLOQUEIO):
+    return "03" if prob_bloqueio >= limiar else "00"
+
+
+def preparar_texto(pdf_bytes, tempos=None, armazem=None):
+    # Etapas por documento (extração e limpeza): devolve (texto limpo, nº de páginas)
+    tempos = {} if tempos is None else tempos
+    with cronometrar("extracao", tempos):
+        paginas = extrair_paginas(pdf_bytes, armazem=armazem)
+    with cronometrar("limpeza", tempos):
+        texto = limpar_texto(" ".join(paginas))
+    return texto, len(paginas)
+
+
+def classificar_textos(textos_limpos, model, tempos=None):
+    """Classifica um lote de textos limpos com uma única vetorização e uma única inferência.
+
+    Todos os textos viram uma só matriz CSR, pontuada por uma chamada ao
+    classificador. Devolve [{"tpOficio", "prob_bloqueio"}, ...] na ordem de entrada.
+    """
+    tempos = {} if tempos is None else tempos
+    if not textos_limpos:
+        return []
+    if hasattr(model, "classificar_textos"):
+        # ClienteInferencia (servidor_inferencia.py): o lote é pontuado pelo servidor
+        return model.classificar_textos(textos_limpos, tempos)
+    with cronometrar("vetorizacao", tempos):
+        X = vetorizar(textos_limpos, model)
+    with cronometrar("inferencia", tempos):
+        probs = prever_probabilidades(X, model)
+    return [{"tpOficio": tp_oficio(float(p)), "prob_bloqueio": float(p)} for p in probs]
+
+
+def classificar_por_etapas(pdf_bytes, model, tempos=None, armazem=None):
+    """Classifica um PDF etapa a etapa, no mesmo formato de classify_oficio.
+
+    Se `tempos` for um dict, recebe os segundos gastos em cada etapa de ETAPAS.
+    """
+    tempos = {} if tempos is None else tempos
+    texto, paginas = preparar_texto(pdf_bytes, tempos, armazem)
+    resultado = classificar_textos([texto], model, tempos)[0]
+    return {**resultado, "paginas": paginas}
+
+
+def _extrair_pagina_documento(doc, chave, numero, tempos, armazem):
+    # `chave` (hash do PDF) só é usada com `armazem`
+    with cronometrar("extracao", tempos):
+        if armazem is not None:
+            config = config_extracao()
+            texto = armazem.obter_pagina(chave, config, numero)
+            if texto is not None:
+                return texto
+        texto = extrair_texto_pagina(doc[numero])
+        if armazem is not None:
+            armazem.guardar_pagina(chave, config, numero, texto, len(doc))
+    return texto
+
+
+# Documento da última extrair_pagina deste processo, ((caminho, chave), doc): as páginas
+# seguintes do mesmo documento não reabrem o PDF
+_documento_aberto = None
+
+
+def extrair_pagina(caminho, chave, numero, tempos=None, armazem=None):
+    # Uma página do PDF gravado em `caminho` (saída antecipada no pool): devolve (texto, nº de páginas
+    # do PDF). `chave` é o hash do PDF. Um PDF sem páginas devolve (None, 0).
+    global _documento_aberto
+    tempos = {} if tempos is None else tempos
+    if _documento_aberto is None or _documento_aberto[0] != (caminho, chave):
+        if _documento_aberto is not None:
+            _documento_aberto[1].close()
+            _documento_aberto = None
+        _documento_aberto = ((caminho, chave), fitz.open(caminho))
+    doc = _documento_aberto[1]
+    if numero >= len(doc):
+        return None, len(doc)
+    return _extrair_pagina_documento(doc, chave, numero, tempos, armazem), len(doc)
+
+
+def pontuar_paginas(textos, model, margem=MARGEM_SAIDA_ANTECIPADA, tempos=None):
+    # Pontua o texto acumulado das páginas já lidas; devolve (resultado, se a extração pode parar)
+    tempos = {} if tempos is None else tempos
+    with cronometrar("limpeza", tempos):
+        limpo = limpar_texto(" ".join(textos))
+    resultado = classificar_textos([limpo], model, tempos)[0]
+    return resultado, abs(resultado["prob_bloqueio"] - LIMIAR_BLOQUEIO) >= margem
+
+
+def classificar_incremental(pdf_bytes, model, margem=MARGEM_SAIDA_ANTECIPADA, tempos=None, armazem=None):
+    """Classifica extraindo as páginas em ordem e parando assim que o modelo tiver certeza.
+
+    Depois de cada página o texto acumulado é pontuado de novo; a extração
+    para quando a probabilidade de bloqueio se afasta do limiar por pelo menos
+    `margem`. O resultado traz "paginas" (total do PDF) e "paginas_usadas".
+    """
+    tempos = {} if tempos is None else tempos
+    textos = []
+    chave = hash_pdf(pdf_bytes) if armazem is not None else None
+    with abrir_pdf(pdf_bytes) as doc:
+        total = len(doc)
+        for numero in range(total):
+            textos.append(_extrair_pagina_documento(doc, chave, numero, tempos, armazem))
+            resultado, parar = pontuar_paginas(textos, model, margem, tempos)
+            if parar:
+                break
+    if not textos:
+        resultado, _ = pontuar_paginas(textos, model, margem, tempos)
+    return {**resultado, "paginas": total, "paginas_usadas": len(textos)}
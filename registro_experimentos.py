@@ -0,0 +1,210 @@
+# registro_experimentos.py
+#
+# Registro dos experimentos em SQLite, no lugar de reler o
+# relatorio_experimentos.json a cada rerun dos relatórios. Cada experimento
+# guarda o item completo do JSON (coluna "dados") e, em colunas próprias e
+# indexadas, o que os relatórios filtram e ordenam: grupo, modelo, data e
+# as métricas. Os componentes do modelo ("TF-IDF", "XGBoost", ...) ficam
+# numa tabela à parte, para filtrar por qualquer um deles.
+#
+# Na primeira abertura o relatorio_experimentos.json é importado; depois
+# disso entram as rodadas do TESTAR MODELO, do avaliar_cli.py e da busca de
+# hiperparâmetros.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from metricas import METRICAS, calcular_metricas, intervalos_bootstrap, intervalos_wilson
+
+CAMINHO_REGISTRO = os.environ.get("CLASSIFICADOR_REGISTRO_EXPERIMENTOS", "experimentos.sqlite3")
+CAMINHO_RELATORIO = "relatorio_experimentos.json"
+GRUPO_TESTE_REAL = "Teste Real com Massa Nova"
+TAMANHO_PAGINA = 20
+# Rodadas do modelo em produção sobre massas novas (não são resultados de treino)
+ORIGENS_AVALIACAO = ("testar", "cli")
+
+
+def _chave(experimento):
+    # Identifica um item importado do JSON: reimportar não duplica nada
+    return hashlib.sha256(f"{experimento['grupo']}\x00{experimento['nome']}".encode("utf-8")).hexdigest()
+
+
+class RegistroExperimentos:
+    def __init__(self, caminho=CAMINHO_REGISTRO, relatorio=CAMINHO_RELATORIO):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS experimentos ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " chave TEXT UNIQUE,"
+            " grupo TEXT NOT NULL,"
+            " nome TEXT NOT NULL,"
+            " modelo TEXT NOT NULL,"
+            " data TEXT,"
+            " origem TEXT NOT NULL,"
+            + "".join(f" {m} REAL NOT NULL," for m in METRICAS)
+            + " dados TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS experimento_modelos ("
+            " modelo TEXT NOT NULL,"
+            " experimento INTEGER NOT NULL REFERENCES experimentos (id),"
+            " PRIMARY KEY (modelo, experimento)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS experimentos_grupo ON experimentos (grupo, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS experimentos_modelo ON experimentos (modelo, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS experimentos_data ON experimentos (data)")
+        self._conn.commit()
+        if relatorio and os.path.exists(relatorio) and self.total() == 0:
+            self.importar_json(relatorio)
+
+    def total(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM experimentos").fetchone()[0]
+
+    def _inserir(self, experimento, origem, data, chave):
+        resultados = experimento.get("resultados", {})
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO experimentos"
+            f" (chave, grupo, nome, modelo, data, origem, {', '.join(METRICAS)}, dados)"
+            f" VALUES ({', '.join('?' * (7 + len(METRICAS)))})",
+            (
+                chave, experimento["grupo"], experimento["nome"], " + ".join(experimento.get("modelo", [])),
+                data, origem, *(float(resultados.get(m, 0.0)) for m in METRICAS),
+                json.dumps(experimento, ensure_ascii=False),
+            ),
+        )
+        if cursor.rowcount:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO experimento_modelos VALUES (?, ?)",
+                [(modelo, cursor.lastrowid) for modelo in experimento.get("modelo", [])],
+            )
+            return cursor.lastrowid
+        return None
+
+    def importar_json(self, caminho=CAMINHO_RELATORIO):
+        """Importa os itens de "experimentos" do JSON (sem data); os já importados são ignorados."""
+        with open(caminho, "r", encoding="utf-8") as f:
+            experimentos = json.load(f)["experimentos"]
+        with self._lock:
+            novos = [self._inserir(exp, "relatorio", None, _chave(exp)) for exp in experimentos]
+            self._conn.commit()
+        return sum(1 for n in novos if n is not None)
+
+    def registrar(self, experimento, origem, data=None):
+        # Rodadas novas: a data vem de execucao["data"], se houver, senão é agora
+        data = data or experimento.get("execucao", {}).get("data") or datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            id_experimento = self._inserir(experimento, origem, data, None)
+            self._conn.commit()
+        return id_experimento
+
+    def _filtros(self, grupo=None, modelo=None, desde=None, ate=None, excluir_grupo=None, acuracia_acima_de=None):
+        condicoes, parametros = [], []
+        if grupo is not None:
+            condicoes.append("grupo = ?")
+            parametros.append(grupo)
+        if excluir_grupo is not None:
+            condicoes.append("grupo != ?")
+            parametros.append(excluir_grupo)
+        if modelo is not None:
+            condicoes.append("id IN (SELECT experimento FROM experimento_modelos WHERE modelo = ?)")
+            parametros.append(modelo)
+        if desde is not None:
+            condicoes.append("data >= ?")
+            parametros.append(desde)
+        if ate is not None:
+            condicoes.append("data < ?")
+            parametros.append(ate)
+        if acuracia_acima_de is not None:
+            condicoes.append("acuracia > ?")
+            parametros.append(acuracia_acima_de)
+        return (" WHERE " + " AND ".join(condicoes)) if condicoes else "", parametros
+
+    def consultar(self, pagina=0, tamanho=TAMANHO_PAGINA, recentes_primeiro=False, **filtros):
+        """Uma página de experimentos e o total que atende aos filtros.
+
+        Filtros: grupo, modelo (qualquer componente, ex. "XGBoost"), desde/ate
+        (datas ISO), excluir_grupo, acuracia_acima_de. A ordem é a de inserção
+        (a do JSON para os importados), ou a inversa com `recentes_primeiro`.
+        """
+        where, parametros = self._filtros(**filtros)
+        ordem = "DESC" if recentes_primeiro else "ASC"
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM experimentos{where}", parametros).fetchone()[0]
+            linhas = self._conn.execute(
+                f"SELECT id, data, origem, dados FROM experimentos{where} ORDER BY id {ordem} LIMIT ? OFFSET ?",
+                (*parametros, tamanho, pagina * tamanho),
+            ).fetchall()
+        experimentos = [
+            {**json.loads(dados), "id": id_experimento, "data": data, "origem": origem}
+            for id_experimento, data, origem, dados in linhas
+        ]
+        return experimentos, total
+
+    def grupos(self):
+        # Na ordem em que cada grupo apareceu pela primeira vez
+        with self._lock:
+            return [g for (g,) in self._conn.execute(
+                "SELECT grupo FROM experimentos GROUP BY grupo ORDER BY MIN(id)"
+            )]
+
+    def modelos(self):
+        with self._lock:
+            return [m for (m,) in self._conn.execute("SELECT DISTINCT modelo FROM experimento_modelos ORDER BY modelo")]
+
+    def melhor_treino(self, modelo):
+        """Experimento de treino com a mesma combinação de modelos e a melhor acurácia."""
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT dados FROM experimentos WHERE modelo = ? AND grupo != ?"
+                f" AND origem NOT IN ({', '.join('?' * len(ORIGENS_AVALIACAO))})"
+                " ORDER BY acuracia DESC, id DESC LIMIT 1",
+                (" + ".join(modelo), GRUPO_TESTE_REAL, *ORIGENS_AVALIACAO),
+            ).fetchone()
+        return json.loads(linha[0]) if linha else None
+
+
+_registro = None
+
+
+def registro_padrao():
+    global _registro
+    if _registro is None:
+        _registro = RegistroExperimentos()
+    return _registro
+
+
+def montar_experimento(grupo, nome, y_true, y_pred, execucao, observacoes):
+    # Rodada do modelo em produção no formato de um item de "experimentos"
+    resultados = calcular_metricas(y_true, y_pred)
+    return {
+        "grupo": grupo,
+        "nome": nome,
+        "paradigma": "Machine Learning Clássico",
+        "modelo": ["TF-IDF", "XGBoost"],
+        "pipeline": [
+            "OCR for text extraction",
+            "Text cleaning & normalization",
+            "TF-IDF vectorization",
+            "Aplicação do modelo treinado",
+            f"Avaliação sobre {len(y_true)} ofícios"
+        ],
+        "hiperparametros": {},
+        "resultados": {k: float(v) for k, v in resultados.items()},
+        "observacoes": observacoes,
+        "orientacoes": {k: "" for k in resultados},
+        "impacto": "",
+        "execucao": {
+            **execucao,
+            "intervalos_95": {
+                "bootstrap": intervalos_bootstrap(y_true, y_pred),
+                "wilson": intervalos_wilson(y_true, y_pred)
+            }
+        }
+    }
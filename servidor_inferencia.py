@@ -0,0 +1,266 @@
+# servidor_inferencia.py
+#
+# Servidor local de inferência, dono do modelo, compartilhado por todas as
+# sessões do Streamlit (e por quantas réplicas estiverem no mesmo host).
+# Os textos limpos chegam por HTTP; pedidos concorrentes são juntados em
+# micro-lotes, cada um com uma única vetorização e uma única inferência
+# (pipeline.classificar_textos). Um lote sai quando alcança TAMANHO_MAX_LOTE
+# textos ou quando o pedido mais antigo esperou ESPERA_MAX_MS.
+#
+# A extração (OCR) continua no pool de processos de quem chama; só a parte
+# que depende do modelo passa pelo servidor.
+#
+# Uso:
+#   python servidor_inferencia.py --porta 8765
+#   CLASSIFICADOR_SERVIDOR_INFERENCIA=http://127.0.0.1:8765 streamlit run app_v4.py
+#
+# GET /estado devolve a versão do modelo, a profundidade da fila e a vazão.
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TAMANHO_MAX_LOTE = int(os.environ.get("CLASSIFICADOR_LOTE_INFERENCIA", "256"))
+ESPERA_MAX_MS = float(os.environ.get("CLASSIFICADOR_ESPERA_LOTE_MS", "20"))
+# Janela da vazão exibida em /estado
+JANELA_VAZAO_S = 60
+# O cliente reaproveita a versão do modelo do servidor por este tempo antes de consultar de novo
+INTERVALO_VERSAO_S = float(os.environ.get("CLASSIFICADOR_INTERVALO_VERSAO_S", "30"))
+
+
+class Microlotes:
+    def __init__(self, model, tamanho_max=TAMANHO_MAX_LOTE, espera_max_ms=ESPERA_MAX_MS):
+        from cache_resultados import versao_modelo
+
+        self.model = model
+        self.versao = versao_modelo(model)
+        self.tamanho_max = tamanho_max
+        self.espera_max_s = espera_max_ms / 1000
+        self._fila = queue.Queue()
+        self._lock = threading.Lock()
+        self._textos_na_fila = 0
+        self._requisicoes = 0
+        self._documentos = 0
+        self._lotes = 0
+        self._erros = 0
+        self._concluidos = deque()  # (momento, documentos) dos lotes recentes
+        self._inicio = time.time()
+        threading.Thread(target=self._laco, daemon=True).start()
+
+    def classificar(self, textos):
+        """Chamado pelas threads das requisições: bloqueia até o lote do pedido ser pontuado."""
+        pedido = {"textos": textos, "pronto": threading.Event(), "resultados": None, "tempos": None, "erro": None}
+        with self._lock:
+            self._textos_na_fila += len(textos)
+            self._requisicoes += 1
+        self._fila.put(pedido)
+        pedido["pronto"].wait()
+        if pedido["erro"] is not None:
+            raise pedido["erro"]
+        return pedido["resultados"], pedido["tempos"]
+
+    def _laco(self):
+        while True:
+            lote = [self._fila.get()]
+            quantidade = len(lote[0]["textos"])
+            prazo = time.monotonic() + self.espera_max_s
+            while quantidade < self.tamanho_max:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    pedido = self._fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                lote.append(pedido)
+                quantidade += len(pedido["textos"])
+            self._executar(lote, quantidade)
+
+    def _executar(self, lote, quantidade):
+        from pipeline import classificar_textos
+
+        with self._lock:
+            self._textos_na_fila -= quantidade
+        tempos = {}
+        try:
+            resultados = classificar_textos([t for pedido in lote for t in pedido["textos"]], self.model, tempos)
+        except Exception as e:
+            with self._lock:
+                self._erros += 1
+            for pedido in lote:
+                pedido["erro"] = e
+                pedido["pronto"].set()
+            return
+        inicio = 0
+        for pedido in lote:
+            n = len(pedido["textos"])
+            pedido["resultados"] = resultados[inicio:inicio + n]
+            # Cada pedido leva a sua parte do tempo do lote
+            pedido["tempos"] = {etapa: segundos * n / quantidade for etapa, segundos in tempos.items()}
+            inicio += n
+            pedido["pronto"].set()
+        agora = time.time()
+        with self._lock:
+            self._documentos += quantidade
+            self._lotes += 1
+            self._concluidos.append((agora, quantidade))
+            while self._concluidos and self._concluidos[0][0] < agora - JANELA_VAZAO_S:
+                self._concluidos.popleft()
+
+    def estado(self):
+        with self._lock:
+            agora = time.time()
+            janela = min(JANELA_VAZAO_S, agora - self._inicio) or 1.0
+            return {
+                "versao": self.versao,
+                "fila": self._textos_na_fila,
+                "requisicoes": self._requisicoes,
+                "documentos": self._documentos,
+                "lotes": self._lotes,
+                "erros": self._erros,
+                "tamanho_medio_lote": self._documentos / self._lotes if self._lotes else 0.0,
+                "docs_por_segundo": sum(n for _, n in self._concluidos) / janela,
+                "no_ar_s": agora - self._inicio,
+            }
+
+
+def criar_servidor(microlotes, host="127.0.0.1", porta=8765):
+    class Tratador(BaseHTTPRequestHandler):
+        def _responder(self, status, corpo):
+            dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self):
+            if self.path == "/estado":
+                self._responder(200, microlotes.estado())
+            else:
+                self._responder(404, {"erro": "caminho desconhecido"})
+
+        def do_POST(self):
+            if self.path != "/classificar":
+                self._responder(404, {"erro": "caminho desconhecido"})
+                return
+            try:
+                corpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                resultados, tempos = microlotes.classificar(list(corpo["textos"]))
+            except Exception as e:
+                self._responder(500, {"erro": f"{type(e).__name__}: {e}"})
+                return
+            self._responder(200, {"resultados": resultados, "tempos": tempos})
+
+        def log_message(self, formato, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, porta), Tratador)
+    servidor.daemon_threads = True
+    return servidor
+
+
+class ClienteInferencia:
+    """Usado no lugar do modelo: pipeline.classificar_textos repassa o lote ao servidor.
+
+    Se o servidor não responde (conexão recusada ou tempo esgotado), a
+    inferência cai para o modelo local (carregado só na primeira falha); uma
+    resposta de erro do servidor sobe como exceção.
+    """
+
+    def __init__(self, url, timeout=120):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._modelo_local = None
+        self._versao = None
+        self._versao_em = 0.0
+        self._lock = threading.Lock()
+
+    def _chamar(self, caminho, corpo=None):
+        dados = None if corpo is None else json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+        requisicao = urllib.request.Request(
+            self.url + caminho, data=dados, headers={"Content-Type": "application/json; charset=utf-8"}
+        )
+        with urllib.request.urlopen(requisicao, timeout=self.timeout) as resposta:
+            return json.loads(resposta.read())
+
+    def modelo_local(self):
+        with self._lock:
+            if self._modelo_local is None:
+                from modelo_compacto import carregar_modelo
+                self._modelo_local = carregar_modelo()
+            return self._modelo_local
+
+    def estado(self):
+        # None se o servidor não está no ar
+        try:
+            return self._chamar("/estado")
+        except OSError:
+            return None
+
+    @property
+    def versao(self):
+        # Lida por cache_resultados.versao_modelo a cada lote: o servidor pode trocar de modelo
+        # sem o app reiniciar, então a versão é consultada de novo a cada INTERVALO_VERSAO_S
+        agora = time.monotonic()
+        if self._versao is not None and agora - self._versao_em < INTERVALO_VERSAO_S:
+            return self._versao
+        estado = self.estado()
+        if estado is not None:
+            self._versao, self._versao_em = estado["versao"], agora
+            return self._versao
+        # Fora do ar: o modelo local vem do mesmo carregar_modelo() do servidor, então vale a
+        # última versão vista. Sem nenhuma, só resta o modelo local (que o lote usará de todo jeito)
+        if self._versao is not None:
+            return self._versao
+        from cache_resultados import versao_modelo
+        return versao_modelo(self.modelo_local())
+
+    def classificar_textos(self, textos_limpos, tempos=None):
+        from pipeline import classificar_textos
+
+        tempos = {} if tempos is None else tempos
+        try:
+            resposta = self._chamar("/classificar", {"textos": textos_limpos})
+        except urllib.error.HTTPError:
+            # O servidor respondeu com erro (ex.: 500 na inferência): não é queda, o erro sobe
+            raise
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            return classificar_textos(textos_limpos, self.modelo_local(), tempos)
+        for etapa, segundos in resposta["tempos"].items():
+            tempos[etapa] = tempos.get(etapa, 0.0) + segundos
+        return resposta["resultados"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local de inferência com micro-lotes.")
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço de escuta (padrão: só a máquina local)")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--lote-max", type=int, default=TAMANHO_MAX_LOTE, help="Textos por micro-lote")
+    parser.add_argument("--espera-max-ms", type=float, default=ESPERA_MAX_MS, help="Espera máxima para completar um lote")
+    args = parser.parse_args(argv)
+
+    from modelo_compacto import carregar_modelo
+
+    microlotes = Microlotes(carregar_modelo(), args.lote_max, args.espera_max_ms)
+    servidor = criar_servidor(microlotes, args.host, args.porta)
+    print(f"Servidor de inferência em http://{args.host}:{args.porta} (modelo {microlotes.versao})", file=sys.stderr)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
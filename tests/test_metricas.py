@@ -0,0 +1,84 @@
+import time
+
+import numpy as np
+import pytest
+from sklearn.metrics import (
+    accuracy_score, average_precision_score, f1_score, precision_score, recall_score, roc_auc_score,
+)
+
+import metricas
+
+
+def _predicoes(n, semente):
+    rng = np.random.default_rng(semente)
+    y_true = rng.integers(0, 2, n)
+    # Probabilidades arredondadas: muitos empates, o caso difícil da varredura
+    probs = np.round(np.clip(0.3 * y_true + rng.uniform(0, 0.7, n), 0, 1), 2)
+    return y_true, probs
+
+
+@pytest.mark.parametrize("semente", range(5))
+def test_calcular_metricas_igual_ao_sklearn(semente):
+    y_true, probs = _predicoes(500, semente)
+    y_pred = (probs >= 0.5).astype(int)
+
+    obtido = metricas.calcular_metricas(y_true, y_pred)
+
+    assert obtido["sensibilidade"] == pytest.approx(recall_score(y_true, y_pred))
+    assert obtido["especificidade"] == pytest.approx(recall_score(y_true, y_pred, pos_label=0))
+    assert obtido["precisao"] == pytest.approx(precision_score(y_true, y_pred))
+    assert obtido["acuracia"] == pytest.approx(accuracy_score(y_true, y_pred))
+    assert obtido["f1score"] == pytest.approx(f1_score(y_true, y_pred))
+
+
+def test_calcular_metricas_sem_positivos_preditos_vale_zero():
+    y_true = [1, 0, 1, 0]
+    y_pred = [0, 0, 0, 0]
+
+    obtido = metricas.calcular_metricas(y_true, y_pred)
+
+    assert obtido["precisao"] == precision_score(y_true, y_pred, zero_division=0) == 0.0
+    assert obtido["f1score"] == f1_score(y_true, y_pred, zero_division=0) == 0.0
+
+
+@pytest.mark.parametrize("semente", range(5))
+def test_varrer_limiares_auc_e_precisao_media_iguais_ao_sklearn(semente):
+    y_true, probs = _predicoes(2000, semente)
+
+    varredura = metricas.varrer_limiares(y_true, probs)
+
+    assert varredura["auc_roc"] == pytest.approx(roc_auc_score(y_true, probs))
+    assert varredura["precisao_media"] == pytest.approx(average_precision_score(y_true, probs))
+
+
+def test_metricas_no_limiar_igual_a_predicao_no_limiar():
+    y_true, probs = _predicoes(1000, 0)
+    varredura = metricas.varrer_limiares(y_true, probs)
+
+    for limiar in (0.1, 0.35, 0.5, 0.505, 0.9):
+        obtido = metricas.metricas_no_limiar(varredura, limiar)
+        esperado = metricas.calcular_metricas(y_true, (probs >= limiar).astype(int))
+        for nome in metricas.METRICAS:
+            assert obtido[nome] == pytest.approx(esperado[nome]), (limiar, nome)
+
+
+def test_intervalos_wilson_valor_conhecido():
+    # 8 acertos em 10: intervalo de Wilson de 95% é (0.4902, 0.9433)
+    intervalos = metricas.intervalos_wilson([1] * 10, [1] * 8 + [0] * 2)
+
+    assert intervalos["sensibilidade"] == pytest.approx((0.4902, 0.9433), abs=1e-4)
+
+
+def test_intervalos_bootstrap_em_menos_de_um_segundo():
+    y_true, probs = _predicoes(100_000, 0)
+    y_pred = (probs >= 0.5).astype(int)
+    pontual = metricas.calcular_metricas(y_true, y_pred)
+
+    inicio = time.perf_counter()
+    intervalos = metricas.intervalos_bootstrap(y_true, y_pred)
+    duracao = time.perf_counter() - inicio
+
+    assert duracao < 1.0
+    for nome in metricas.METRICAS:
+        inferior, superior = intervalos[nome]
+        assert inferior <= pontual[nome] <= superior
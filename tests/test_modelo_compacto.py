@@ -0,0 +1,72 @@
+import random
+
+import numpy as np
+import pytest
+
+pytest.importorskip("xgboost")
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.pipeline import Pipeline
+from xgboost import XGBClassifier
+
+import modelo_compacto
+
+
+def _modelo_treinado():
+    # Corpus sintético com rótulo ruidoso, para gerar árvores com margens variadas
+    rng = random.Random(0)
+    termos = ["oficio", "bloqueio", "conta", "judicial", "valor", "penhora", "cpf", "banco", "prazo", "ordem"]
+    termos += [f"processo{i}" for i in range(40)]
+    textos, rotulos = [], []
+    for _ in range(400):
+        palavras = rng.choices(termos, k=rng.randint(3, 40))
+        textos.append(" ".join(palavras))
+        rotulos.append(int(("bloqueio" in palavras) != (rng.random() < 0.1)))
+    model = Pipeline([
+        ("tfidf", TfidfVectorizer(ngram_range=(1, 2))),
+        ("clf", XGBClassifier(n_estimators=60, max_depth=4)),
+    ])
+    return model.fit(textos, rotulos)
+
+
+def test_exportar_reproduz_predict_proba_byte_a_byte(tmp_path):
+    model = _modelo_treinado()
+    modelo_compacto.exportar(model, tmp_path)
+    compacto = modelo_compacto.carregar_modelo_compacto(tmp_path)
+
+    textos = modelo_compacto.textos_de_verificacao(compacto.vetorizador)
+    relatorio = modelo_compacto.verificar(model, compacto, textos)
+
+    assert relatorio["identico"], relatorio
+    np.testing.assert_array_equal(
+        compacto.classificador.predict(compacto.vetorizador.transform(textos)), model.predict(textos)
+    )
+
+
+def test_vocabulario_consultado_nos_arquivos_mapeados(tmp_path):
+    # "plumless" e "buckeroo" têm o mesmo CRC32: a consulta precisa conferir os bytes do termo
+    textos = ["plumless bloqueio conta", "buckeroo informacao cadastro"] * 10
+    model = Pipeline([
+        ("tfidf", TfidfVectorizer()),
+        ("clf", XGBClassifier(n_estimators=5, max_depth=2)),
+    ]).fit(textos, [1, 0] * 10)
+    modelo_compacto.exportar(model, tmp_path)
+    vocabulario = modelo_compacto.carregar_modelo_compacto(tmp_path).vetorizador.vocabulary_
+
+    assert isinstance(vocabulario, modelo_compacto.VocabularioMapeado)
+    assert len(vocabulario) == len(model.steps[0][1].vocabulary_)
+    assert dict(vocabulario) == model.steps[0][1].vocabulary_
+    assert "inexistente" not in vocabulario
+
+
+def test_sigmoide_igual_a_do_xgboost_em_margens_extremas():
+    import xgboost as xgb
+
+    X = np.random.default_rng(1).normal(size=(50, 3))
+    booster = xgb.train({"objective": "binary:logistic", "max_depth": 2}, xgb.DMatrix(X, (X[:, 0] > 0)), 3)
+    margens_base = np.random.default_rng(0).uniform(-100, 30, 20000).astype(np.float32)
+    dados = xgb.DMatrix(np.zeros((len(margens_base), 3), dtype=np.float32), base_margin=margens_base)
+
+    margem = booster.predict(dados, output_margin=True)
+    esperado = booster.predict(dados)
+
+    assert esperado.tobytes() == modelo_compacto._sigmoide_xgboost(margem).tobytes()
@@ -0,0 +1,121 @@
+# textos_extraidos.py
+#
+# Armazém persistente do texto extraído de cada página (camada de texto ou
+# OCR). A chave é (hash do PDF, número da página, configuração da extração),
+# então trocar o modelo não invalida nada: reavaliar um modelo novo sobre a
+# mesma massa paga só vetorização e inferência. Só uma mudança de motor de
+# OCR, DPI ou idioma gera novas entradas.
+# O texto é guardado comprimido (zlib) em SQLite, que aceita inserções
+# incrementais de vários processos ao mesmo tempo.
+
+import os
+import sqlite3
+import threading
+import zlib
+
+PASTA_TEXTOS = os.environ.get("CLASSIFICADOR_CACHE_DIR", ".cache")
+ARMAZEM_ATIVO = os.environ.get("CLASSIFICADOR_ARMAZEM_TEXTOS", "1") == "1"
+
+
+class ArmazemTextos:
+    def __init__(self, pasta=PASTA_TEXTOS):
+        os.makedirs(pasta, exist_ok=True)
+        self._lock = threading.Lock()
+        # timeout alto: workers do pool gravam no mesmo arquivo em paralelo
+        self._conn = sqlite3.connect(
+            os.path.join(pasta, "textos.sqlite3"), timeout=60, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS paginas ("
+            " hash_pdf TEXT NOT NULL,"
+            " config TEXT NOT NULL,"
+            " pagina INTEGER NOT NULL,"
+            " texto BLOB NOT NULL,"
+            " PRIMARY KEY (hash_pdf, config, pagina))"
+        )
+        # Quantas páginas o documento tem: distingue "extraído por inteiro" de "parcial"
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documentos ("
+            " hash_pdf TEXT NOT NULL,"
+            " config TEXT NOT NULL,"
+            " total_paginas INTEGER NOT NULL,"
+            " PRIMARY KEY (hash_pdf, config))"
+        )
+        self._conn.commit()
+
+    def obter_pagina(self, hash_pdf, config, pagina):
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT texto FROM paginas WHERE hash_pdf = ? AND config = ? AND pagina = ?",
+                (hash_pdf, config, pagina),
+            ).fetchone()
+        return zlib.decompress(linha[0]).decode("utf-8") if linha else None
+
+    def guardar_pagina(self, hash_pdf, config, pagina, texto, total_paginas):
+        # A saída antecipada grava página a página: com o total registrado, o documento lido
+        # até o fim serve depois a extração inteira (obter_documento)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO paginas VALUES (?, ?, ?, ?)",
+                (hash_pdf, config, pagina, zlib.compress(texto.encode("utf-8"))),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documentos VALUES (?, ?, ?)",
+                (hash_pdf, config, total_paginas),
+            )
+            self._conn.commit()
+
+    def obter_paginas(self, hash_pdf, config):
+        # {número da página: texto} das páginas já extraídas, mesmo com o documento incompleto
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT pagina, texto FROM paginas WHERE hash_pdf = ? AND config = ?",
+                (hash_pdf, config),
+            ).fetchall()
+        return {pagina: zlib.decompress(texto).decode("utf-8") for pagina, texto in linhas}
+
+    def obter_documento(self, hash_pdf, config):
+        # Lista de textos por página, ou None se o documento não está completo
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT total_paginas FROM documentos WHERE hash_pdf = ? AND config = ?",
+                (hash_pdf, config),
+            ).fetchone()
+            if linha is None:
+                return None
+            linhas = self._conn.execute(
+                "SELECT texto FROM paginas WHERE hash_pdf = ? AND config = ? ORDER BY pagina",
+                (hash_pdf, config),
+            ).fetchall()
+        if len(linhas) != linha[0]:
+            return None
+        return [zlib.decompress(texto).decode("utf-8") for (texto,) in linhas]
+
+    def guardar_documento(self, hash_pdf, config, paginas):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO paginas VALUES (?, ?, ?, ?)",
+                [
+                    (hash_pdf, config, numero, zlib.compress(texto.encode("utf-8")))
+                    for numero, texto in enumerate(paginas)
+                ],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documentos VALUES (?, ?, ?)",
+                (hash_pdf, config, len(paginas)),
+            )
+            self._conn.commit()
+
+
+_armazem = None
+
+
+def armazem_padrao():
+    # Um armazém por processo (cada worker do pool abre a própria conexão)
+    global _armazem
+    if not ARMAZEM_ATIVO:
+        return None
+    if _armazem is None:
+        _armazem = ArmazemTextos()
+    return _armazem
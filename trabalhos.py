@@ -0,0 +1,411 @@
+# trabalhos.py
+#
+# Fila de avaliações do TESTAR MODELO em segundo plano. Cada ZIP enviado
+# vira um trabalho: o arquivo é copiado para .cache/trabalhos/ e uma thread
+# do servidor processa a fila em ordem de chegada, num pool de processos
+# próprio (as avaliações longas não ocupam os processos do CLASSIFICAR). A predição de cada arquivo é gravada em
+# SQLite assim que fica pronta (checkpoint), então fechar a aba do navegador
+# não interrompe nada e, se o servidor cair, o trabalho recomeça de onde
+# parou. O texto das páginas já extraídas também está no armazém de textos:
+# o que se perde em uma queda é, no máximo, a inferência do lote em curso.
+
+import atexit
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+
+from avaliacao import LABELS
+
+PASTA_TRABALHOS = os.path.join(os.environ.get("CLASSIFICADOR_CACHE_DIR", ".cache"), "trabalhos")
+ESTADOS = ("na_fila", "executando", "concluido", "erro")
+# Processos do pool da fila (padrão: metade de CLASSIFICADOR_WORKERS). Cada processo carrega o
+# próprio modelo: um pool do tamanho do CLASSIFICAR dobraria os processos e a memória de modelos
+WORKERS_FILA = int(os.environ.get("CLASSIFICADOR_WORKERS_FILA", "0"))
+ROTULO_TO_LABEL = {lbl["value"]: lbl for lbl in LABELS}
+
+
+def _dono():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _processo_vivo(dono):
+    host, _, pid = (dono or "").rpartition(":")
+    if host != socket.gethostname():
+        # Processo de outra máquina: não dá para saber, então é mantido
+        return bool(host)
+    if not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class FilaTrabalhos:
+    def __init__(self, pasta=PASTA_TRABALHOS, origem="TESTAR MODELO"):
+        os.makedirs(pasta, exist_ok=True)
+        self.pasta = pasta
+        self.origem = origem
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._thread = None
+        self._modelo = None
+        self._cache = None
+        self._pool = None
+        self._processos = None
+        self._conn = sqlite3.connect(
+            os.path.join(pasta, "trabalhos.sqlite3"), timeout=60, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS trabalhos ("
+            " id TEXT PRIMARY KEY,"
+            " nome TEXT NOT NULL,"
+            " hash_zip TEXT NOT NULL,"
+            " caminho_zip TEXT NOT NULL,"
+            " opcoes TEXT NOT NULL,"
+            " estado TEXT NOT NULL,"
+            " total INTEGER,"
+            " versao TEXT,"
+            " dono TEXT,"
+            " criado REAL NOT NULL,"
+            " iniciado REAL,"
+            " terminado REAL,"
+            " erro TEXT,"
+            " extras TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS trabalhos_estado ON trabalhos (estado, criado)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS predicoes ("
+            " trabalho TEXT NOT NULL,"
+            " indice INTEGER NOT NULL,"
+            " caminho TEXT NOT NULL,"
+            " arquivo TEXT NOT NULL,"
+            " rotulo INTEGER NOT NULL,"
+            " resultado TEXT NOT NULL,"
+            " PRIMARY KEY (trabalho, indice))"
+        )
+        self._conn.commit()
+        self._recuperar_interrompidos()
+
+    def _recuperar_interrompidos(self):
+        # Trabalhos de um processo que morreu voltam para a fila (o checkpoint fica)
+        with self._lock:
+            linhas = self._conn.execute("SELECT id, dono FROM trabalhos WHERE estado = 'executando'").fetchall()
+            for id_trabalho, dono in linhas:
+                if not _processo_vivo(dono):
+                    self._conn.execute(
+                        "UPDATE trabalhos SET estado = 'na_fila', dono = NULL WHERE id = ?", (id_trabalho,)
+                    )
+            self._conn.commit()
+
+    def pendentes(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM trabalhos WHERE estado = 'na_fila'"
+            ).fetchone()[0]
+
+    def iniciar(self, modelo, cache):
+        """Liga a thread da fila (uma por processo) com o modelo e o cache do app."""
+        with self._lock:
+            self._modelo, self._cache = modelo, cache
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._laco, daemon=True)
+                self._thread.start()
+        self._acordar.set()
+
+    def enviar(self, arquivo_zip, nome, hash_zip, opcoes):
+        # Copia o upload para o disco: o trabalho não depende mais da sessão
+        id_trabalho = uuid.uuid4().hex[:12]
+        caminho = os.path.join(self.pasta, f"{id_trabalho}.zip")
+        arquivo_zip.seek(0)
+        with open(caminho, "wb") as destino:
+            shutil.copyfileobj(arquivo_zip, destino, 1 << 20)
+        arquivo_zip.seek(0)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO trabalhos (id, nome, hash_zip, caminho_zip, opcoes, estado, criado)"
+                " VALUES (?, ?, ?, ?, ?, 'na_fila', ?)",
+                (id_trabalho, nome, hash_zip, caminho, json.dumps(opcoes), time.time()),
+            )
+            self._conn.commit()
+        self._acordar.set()
+        return id_trabalho
+
+    def _linha_para_trabalho(self, linha, concluidos):
+        colunas = ("id", "nome", "hash_zip", "caminho_zip", "opcoes", "estado", "total", "versao",
+                   "dono", "criado", "iniciado", "terminado", "erro", "extras")
+        trabalho = dict(zip(colunas, linha))
+        trabalho["opcoes"] = json.loads(trabalho["opcoes"])
+        trabalho["extras"] = json.loads(trabalho["extras"]) if trabalho["extras"] else {}
+        trabalho["concluidos"] = concluidos
+        return trabalho
+
+    def obter(self, id_trabalho):
+        with self._lock:
+            linha = self._conn.execute("SELECT * FROM trabalhos WHERE id = ?", (id_trabalho,)).fetchone()
+            if linha is None:
+                return None
+            concluidos = self._conn.execute(
+                "SELECT COUNT(*) FROM predicoes WHERE trabalho = ?", (id_trabalho,)
+            ).fetchone()[0]
+        return self._linha_para_trabalho(linha, concluidos)
+
+    def listar(self, limite=20):
+        # Mais recentes primeiro, com a contagem de arquivos já processados
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT t.*, (SELECT COUNT(*) FROM predicoes p WHERE p.trabalho = t.id)"
+                " FROM trabalhos t ORDER BY t.criado DESC LIMIT ?",
+                (limite,),
+            ).fetchall()
+        return [self._linha_para_trabalho(linha[:-1], linha[-1]) for linha in linhas]
+
+    def ultimo_concluido(self, hash_zip, versao):
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT id FROM trabalhos WHERE hash_zip = ? AND versao = ? AND estado = 'concluido'"
+                " ORDER BY terminado DESC LIMIT 1",
+                (hash_zip, versao),
+            ).fetchone()
+        return linha[0] if linha else None
+
+    def predicoes(self, id_trabalho):
+        """Predições gravadas até agora, na ordem dos arquivos do ZIP."""
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT indice, caminho, arquivo, rotulo, resultado FROM predicoes"
+                " WHERE trabalho = ? ORDER BY indice",
+                (id_trabalho,),
+            ).fetchall()
+        return [
+            {"indice": indice, "caminho": caminho, "arquivo": arquivo, "rotulo": rotulo, "resultado": json.loads(resultado)}
+            for indice, caminho, arquivo, rotulo, resultado in linhas
+        ]
+
+    def retomar(self, id_trabalho):
+        # Um trabalho com erro volta para a fila; as predições gravadas são mantidas
+        with self._lock:
+            self._conn.execute(
+                "UPDATE trabalhos SET estado = 'na_fila', erro = NULL, dono = NULL WHERE id = ? AND estado = 'erro'",
+                (id_trabalho,),
+            )
+            self._conn.commit()
+        self._acordar.set()
+
+    def remover(self, id_trabalho):
+        # Só trabalhos que não estão rodando
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT caminho_zip, estado FROM trabalhos WHERE id = ?", (id_trabalho,)
+            ).fetchone()
+            if linha is None or linha[1] == "executando":
+                return False
+            self._conn.execute("DELETE FROM predicoes WHERE trabalho = ?", (id_trabalho,))
+            self._conn.execute("DELETE FROM trabalhos WHERE id = ?", (id_trabalho,))
+            self._conn.commit()
+        if os.path.exists(linha[0]):
+            os.remove(linha[0])
+        return True
+
+    def _atualizar(self, id_trabalho, **campos):
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE trabalhos SET {', '.join(f'{c} = ?' for c in campos)} WHERE id = ?",
+                (*campos.values(), id_trabalho),
+            )
+            self._conn.commit()
+
+    def _guardar_predicao(self, id_trabalho, indice, arqinfo, resultado):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO predicoes VALUES (?, ?, ?, ?, ?, ?)",
+                (id_trabalho, indice, arqinfo["caminho"], arqinfo["arquivo"], arqinfo["rotulo"],
+                 json.dumps(resultado, ensure_ascii=False)),
+            )
+            self._conn.commit()
+
+    def _reservar_proximo(self):
+        # O UPDATE condicional garante que duas réplicas não peguem o mesmo trabalho
+        dono = _dono()
+        with self._lock:
+            while True:
+                linha = self._conn.execute(
+                    "SELECT id FROM trabalhos WHERE estado = 'na_fila' ORDER BY criado LIMIT 1"
+                ).fetchone()
+                if linha is None:
+                    return None
+                reservado = self._conn.execute(
+                    "UPDATE trabalhos SET estado = 'executando', dono = ?, iniciado = COALESCE(iniciado, ?)"
+                    " WHERE id = ? AND estado = 'na_fila'",
+                    (dono, time.time(), linha[0]),
+                ).rowcount
+                self._conn.commit()
+                if reservado:
+                    return linha[0]
+
+    def _obter_pool(self):
+        # Só a thread da fila usa o pool, então não precisa de lock
+        if self._pool is not None:
+            try:
+                # Com um worker morto o classificar_lote devolve erro por arquivo, sem levantar:
+                # o pool quebrado só aparece ao submeter, e aí o trabalho seguinte sobe outro
+                self._pool.submit(int).result()
+            except BrokenProcessPool:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+        if self._pool is None:
+            from classificacao_lote import MAX_WORKERS, criar_pool
+
+            self._processos = WORKERS_FILA or max(1, MAX_WORKERS // 2)
+            self._pool = criar_pool(self._processos)
+            atexit.register(self._pool.shutdown, wait=False, cancel_futures=True)
+        return self._pool, self._processos
+
+    def _laco(self):
+        while True:
+            id_trabalho = self._reservar_proximo()
+            if id_trabalho is None:
+                self._acordar.wait(timeout=5)
+                self._acordar.clear()
+                continue
+            try:
+                self._executar(id_trabalho)
+            except Exception as e:
+                self._atualizar(id_trabalho, estado="erro", erro=f"{type(e).__name__}: {e}", terminado=time.time())
+
+    def _executar(self, id_trabalho):
+        from avaliacao import abrir_zip, comparar_saida_antecipada, ler_pdfs_do_zip, listar_membros_pdf_com_rotulo
+        from classificacao_lote import classificar_lote
+        from desempenho import registro
+
+        trabalho = self.obter(id_trabalho)
+        opcoes = trabalho["opcoes"]
+        modelo, cache = self._modelo, self._cache
+        pool, processos = self._obter_pool()
+        with self._lock:
+            # Arquivos que deram erro ficam gravados (aparecem no resultado), mas são tentados de novo
+            feitos = {
+                indice for indice, resultado in self._conn.execute(
+                    "SELECT indice, resultado FROM predicoes WHERE trabalho = ?", (id_trabalho,)
+                ) if "erro" not in json.loads(resultado)
+            }
+        with abrir_zip(trabalho["caminho_zip"]) as zip_ref:
+            arquivos = listar_membros_pdf_com_rotulo(zip_ref)
+            self._atualizar(id_trabalho, total=len(arquivos), versao=cache.versao)
+            # Retomada: só os arquivos sem predição gravada
+            faltam = [(indice, arqinfo) for indice, arqinfo in enumerate(arquivos) if indice not in feitos]
+            if faltam:
+                classificar_lote(
+                    ler_pdfs_do_zip(zip_ref, [arqinfo for _, arqinfo in faltam]),
+                    model=modelo,
+                    max_workers=min(processos, len(faltam)),
+                    total=len(faltam),
+                    cache=cache,
+                    ao_medir=lambda k, evento: registro.registrar(
+                        evento, arquivo=faltam[k][1]["caminho"], origem=self.origem
+                    ),
+                    ao_concluir=lambda k, resultado: self._guardar_predicao(id_trabalho, *faltam[k], resultado),
+                    pool=pool,
+                )
+
+            extras = {}
+            validos = [
+                arquivos[p["indice"]] for p in self.predicoes(id_trabalho) if "erro" not in p["resultado"]
+            ]
+            if opcoes.get("comparar_saida"):
+                extras["comparacao_saida"] = comparar_saida_antecipada(
+                    lambda: ler_pdfs_do_zip(zip_ref, arquivos), arquivos, modelo, opcoes["margem_saida"],
+                    max_workers=min(processos, len(arquivos)), pool=pool
+                )
+            if opcoes.get("verificar_duplicatas"):
+                from duplicatas import assinaturas_dos_pdfs, indice_padrao, verificar_vazamento
+
+                indice = indice_padrao()
+                if indice is not None:
+                    assinaturas = assinaturas_dos_pdfs(ler_pdfs_do_zip(zip_ref, validos), indice)
+                    extras["vazamento"] = verificar_vazamento(assinaturas, indice)
+        terminado = time.time()
+        self._registrar_experimento(trabalho, self.predicoes(id_trabalho), terminado)
+        self._atualizar(
+            id_trabalho, estado="concluido", terminado=terminado, extras=json.dumps(extras, ensure_ascii=False)
+        )
+        # Tudo o que a tela precisa já está no banco; o ZIP não é mais necessário
+        if os.path.exists(trabalho["caminho_zip"]):
+            os.remove(trabalho["caminho_zip"])
+
+    def _registrar_experimento(self, trabalho, predicoes, terminado):
+        # Cada avaliação concluída vira uma rodada do teste real nos relatórios
+        from datetime import datetime
+
+        from registro_experimentos import GRUPO_TESTE_REAL, montar_experimento, registro_padrao
+
+        avaliacao = montar_avaliacao(predicoes)
+        if not avaliacao["y_true"]:
+            return
+        data = datetime.fromtimestamp(terminado).isoformat(timespec="seconds")
+        duracao = terminado - trabalho["iniciado"] if trabalho["iniciado"] else 0.0
+        registro_padrao().registrar(
+            montar_experimento(
+                GRUPO_TESTE_REAL,
+                f"TESTAR MODELO — {trabalho['nome']}",
+                avaliacao["y_true"],
+                avaliacao["y_pred"],
+                {
+                    "data": data,
+                    "versao_modelo": self._cache.versao,
+                    "duracao_s": duracao,
+                    "entrada": trabalho["nome"],
+                    "total_arquivos": len(predicoes),
+                    "erros": len(avaliacao["erros"]),
+                    "docs_por_segundo": len(predicoes) / duracao if duracao else 0.0
+                },
+                f"Avaliação enviada pelo TESTAR MODELO em {data}."
+            ),
+            origem="testar",
+        )
+
+
+def montar_avaliacao(predicoes, extras=None):
+    """Converte as predições de um trabalho no dicionário de avaliação exibido pelo TESTAR MODELO.
+
+    Arquivos com erro ficam de fora das métricas e aparecem em "erros".
+    """
+    avaliacao = {
+        "comparacao_saida": (extras or {}).get("comparacao_saida"),
+        "vazamento": (extras or {}).get("vazamento"),
+        "nomes_arquivos": [],
+        "desc_esperado": [],
+        "desc_predito": [],
+        "tp_oficio_esperado": [],
+        "tp_oficio_predito": [],
+        "y_true": [],
+        "y_pred": [],
+        "probs_bloqueio": [],
+        "erros": [],
+    }
+    for predicao in predicoes:
+        resultado = predicao["resultado"]
+        if "erro" in resultado:
+            avaliacao["erros"].append((predicao["arquivo"], resultado["erro"]))
+            continue
+        esperado = ROTULO_TO_LABEL[predicao["rotulo"]]
+        bloqueio = resultado["tpOficio"] == "03"
+        avaliacao["nomes_arquivos"].append(predicao["arquivo"])
+        avaliacao["desc_esperado"].append(esperado["label"])
+        avaliacao["desc_predito"].append("Bloqueio" if bloqueio else "Não-Bloqueio")
+        avaliacao["tp_oficio_esperado"].append(esperado["tpOficio"])
+        avaliacao["tp_oficio_predito"].append(resultado["tpOficio"])
+        avaliacao["y_true"].append(predicao["rotulo"])
+        avaliacao["y_pred"].append(1 if bloqueio else 0)
+        avaliacao["probs_bloqueio"].append(resultado.get("prob_bloqueio"))
+    return avaliacao